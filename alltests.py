@@ -44,9 +44,18 @@ def main():
 		"rescene.test.test_osohash",
 		"rescene.test.test_rarstream",
 		"rescene.test.test_main",
+		"rescene.test.test_index",
+		"rescene.test.test_parallelcrc",
+		"rescene.test.test_crc32combine",
+		"rescene.test.test_verify",
+		"rescene.test.test_hashcache",
 		"resample.test.test_main",
 		"resample.test.test_ebml",
 		"resample.test.test_mp3",
+		"resample.test.test_matcher",
+		"resample.test.test_m2ts",
+		"resample.test.test_trackbuffer",
+		"resample.test.test_prefetch",
 	)))
 
 	sys.path.append(os.path.join(curdir, "usenet"))
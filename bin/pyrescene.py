@@ -72,6 +72,7 @@ except ImportError:
 	pass
 
 import rescene
+from rescene import hashcache
 from resample.srs import main as srsmain
 from rescene.srr import MessageThread
 from rescene.main import MsgCode, FileNotFound, custom_popen
@@ -1516,6 +1517,9 @@ def main(argv=None):
 					action="store_false", default=True, dest="isdb_hash",
 					help="do not attempt to store ISDb hashes "
 					"(not recommended)")
+	parser.add_option("--no-cache", action="store_true", dest="no_cache",
+					help="do not use or update the cache of file hashes "
+					"in %s" % hashcache.cache_dir())
 
 	parser.add_option("-e", "--eject",
 					action="store_true", dest="eject",
@@ -1557,6 +1561,9 @@ def main(argv=None):
 
 	(options, indirs) = parser.parse_args(args=argv)
 
+	if not options.no_cache:
+		hashcache.enable()
+
 	if options.best_settings:
 		options.compressed = True
 		options.sample_verify = True
@@ -38,49 +38,41 @@ except ImportError:
 	pass
 
 import rescene
-from rescene.rar import RarReader, BlockType, COMPR_STORING
+from rescene.rar import RarReader, BlockType
+from rescene.index import SrrIndex
 
-def check_compression(srr_file):
-	for block in RarReader(srr_file):
-		if block.rawtype == BlockType.RarPackedFile:
-			if block.compression_method != COMPR_STORING:
-				return True
-	return False
+def check_compression(srr):
+	return srr["compression"]
 
-def check_empty(srr_file):
-	for block in RarReader(srr_file):
-		if block.rawtype == BlockType.RarPackedFile:
-			return False
-	return True
+def check_empty(srr):
+	return not srr["archived_files"]
 
-def check_image(srr_file, noproof):
+def check_image(srr, noproof):
 	images = (".jpg", ".png", ".bmp", ".gif", "jpeg")
-	for block in RarReader(srr_file):
-		if (block.rawtype == BlockType.SrrStoredFile and
-			os.path.splitext(block.file_name)[1] in images):
-			if noproof and "proof" in block.file_name.lower():
+	for stored in srr["stored_files"].values():
+		if os.path.splitext(stored.file_name)[1] in images:
+			if noproof and "proof" in stored.file_name.lower():
 				return False
 			return True
 	return False
 
-def check_repack(srr_file):
+def check_repack(srr):
 	tmatch = ("rpk", "repack", "-r.part01.rar", "-r.rar")
-	for block in RarReader(srr_file):
-		if block.rawtype == BlockType.SrrRarFile:
-			matchf = lambda keyword: keyword in block.file_name
-			if any(map(matchf, tmatch)):
-				return True
+	for rar in srr["rar_files"].values():
+		matchf = lambda keyword: keyword in rar.file_name
+		if any(map(matchf, tmatch)):
+			return True
 	return False
 
-def check_nfos(srr_file):
-	for block in RarReader(srr_file):
-		nfo_count = 0
-		if (block.rawtype == BlockType.SrrStoredFile and
-			block.file_name[-4:].lower() == ".nfo"):
+def check_nfos(srr):
+	nfo_count = 0
+	for stored in srr["stored_files"]:
+		if stored[-4:].lower() == ".nfo":
 			nfo_count += 1
 	return False if nfo_count <= 1 else True
 
 def check_duplicates(srr_file):
+	# the index only has unique names: read the blocks themselves
 	found = []
 	for block in RarReader(srr_file):
 		if (block.rawtype == BlockType.SrrStoredFile):
@@ -89,30 +81,24 @@ def check_duplicates(srr_file):
 			found.append(block.file_name)
 	return False
 
-def check_for_possible_nonscene(srr_file):
-	for block in RarReader(srr_file):
-		if (block.rawtype == BlockType.SrrRarFile and
-			block.file_name != block.file_name.lower()):
+def check_for_possible_nonscene(srr):
+	for rar in srr["rar_files"].values():
+		if rar.file_name != rar.file_name.lower():
 			return True
 	return False
 
-def check_availability_stored_files(srr_file):
-	for block in RarReader(srr_file):
-		if block.rawtype == BlockType.SrrStoredFile:
-			return False
-	return True
+def check_availability_stored_files(srr):
+	return not srr["stored_files"]
 
-def check_for_no_ext(srr_file, extension):
-	for block in RarReader(srr_file):
-		if (block.rawtype == BlockType.SrrStoredFile and
-			block.file_name.lower().endswith(extension)):
+def check_for_no_ext(srr, extension):
+	for stored in srr["stored_files"]:
+		if stored.lower().endswith(extension):
 			return False
 	return True
 
-def check_for_ext(srr_file, extension):
-	for block in RarReader(srr_file):
-		if (block.rawtype == BlockType.SrrStoredFile and
-			block.file_name.lower().endswith(extension)):
+def check_for_ext(srr, extension):
+	for stored in srr["stored_files"]:
+		if stored.lower().endswith(extension):
 			return True
 	return False
 
@@ -121,8 +107,12 @@ rar_sizes = 0  # bytes
 def check(srr_file):
 	try:
 		result = False
-		if options.verify or options.multiple:
+		if options.verify:
+			# parse the whole SRR file again
 			info = rescene.info(srr_file)
+		else:
+			info = index.info(srr_file)
+		if options.verify or options.multiple:
 			global rar_sizes
 			rar_sizes += sum([info['rar_files'][f].file_size
 			                  for f in info['rar_files']])
@@ -150,27 +140,27 @@ def check(srr_file):
 				result |= True
 
 		if options.compressed:
-			result |= check_compression(srr_file)
+			result |= check_compression(info)
 		if options.empty:
-			result |= check_empty(srr_file)
+			result |= check_empty(info)
 		if options.image or options.noproof:
-			result |= check_image(srr_file, options.noproof)
+			result |= check_image(info, options.noproof)
 		if options.repack:
-			result |= check_repack(srr_file)
+			result |= check_repack(info)
 		if options.nfos:
-			result |= check_nfos(srr_file)
+			result |= check_nfos(info)
 		if options.duplicates:
 			result |= check_duplicates(srr_file)
 		if options.peer2peer:
-			result |= check_for_possible_nonscene(srr_file)
+			result |= check_for_possible_nonscene(info)
 		if options.nofiles:
-			result |= check_availability_stored_files(srr_file)
+			result |= check_availability_stored_files(info)
 		if options.nosfv:
-			result |= check_for_no_ext(srr_file, ".sfv")
+			result |= check_for_no_ext(info, ".sfv")
 		if options.nonfo:
-			result |= check_for_no_ext(srr_file, ".nfo")
+			result |= check_for_no_ext(info, ".nfo")
 		if options.txt:
-			result |= check_for_ext(srr_file, ".txt")
+			result |= check_for_ext(info, ".txt")
 		if result and options.output_dir:
 			print("Moving %s." % srr_file)
 			srr_name = os.path.basename(srr_file)
@@ -184,14 +174,16 @@ def check(srr_file):
 		print(err)
 
 def main(options, args):
-	for element in args:
-		if os.path.isdir(element):
-			for srr_file in glob.iglob(element + "/*.srr"):
-				check(srr_file)
-		elif os.path.isfile(element) and element.endswith(".srr"):
-			check(element)
-		else:
-			print("WTF are you supplying me?")
+	global index
+	with SrrIndex(options.index or ":memory:") as index:
+		for element in args:
+			if os.path.isdir(element):
+				for srr_file in glob.iglob(element + "/*.srr"):
+					check(srr_file)
+			elif os.path.isfile(element) and element.endswith(".srr"):
+				check(element)
+			else:
+				print("WTF are you supplying me?")
 
 	if rar_sizes:
 		print("%d bytes" % rar_sizes)
@@ -250,6 +242,9 @@ if __name__ == '__main__':
 
 	parser.add_option("-o", dest="output_dir", metavar="DIRECTORY",
 					help="moves the matched SRR files to the given DIRECTORY")
+	parser.add_option("--index", dest="index", metavar="FILE",
+					help="keep the SRR information in this index FILE: "
+					"only new or changed SRRs are parsed again")
 
 	# no arguments given
 	if len(sys.argv) < 2:
@@ -26,7 +26,10 @@
 
 import os
 import sys
+import json
+import time
 import optparse
+import traceback
 
 try:
 	import _preamble
@@ -34,6 +37,11 @@ except ImportError:
 	pass
 
 from resample.srs import main as srsmain
+from rescene.utility import order_by_device, pool_size
+
+EXTENSIONS = (".avi", ".mkv", ".wmv", ".mp4", ".vob", ".m2ts")
+# samples of the same disk processed at the same time
+PER_DISK = 2
 
 def main(options):
 	if not options.input_dir or not options.output_dir:
@@ -45,43 +53,113 @@ def main(options):
 	print("Input: {0}".format(indir))
 	print("Output: {0}".format(outdir))
 
+	tasks = []
+	skipped = []
 	for dirpath, _dirnames, filenames in os.walk(indir):
 		subdirs = os.path.relpath(dirpath, indir)
 		for pfile in filenames:
-			if pfile.lower().endswith(
-					(".avi", ".mkv", ".wmv", ".mp4", ".vob", ".m2ts")):
-				create_srs(dirpath, pfile, outdir, subdirs, options.always_no)
+			if pfile.lower().endswith(EXTENSIONS):
+				dest_dir = os.path.normpath(os.path.join(outdir, subdirs))
+				srs_file = os.path.join(dest_dir,
+				                        pfile.rsplit(".", 1)[0] + ".srs")
+				sample = os.path.join(dirpath, pfile)
+				if options.always_no and os.path.isfile(srs_file):
+					skipped.append(result(sample, srs_file, "skipped"))
+				else:
+					tasks.append((sample, dest_dir, srs_file))
 
-def create_srs(sample_dir, sample_file, output_dir, path, keep):
-	print(sample_dir)
-	dest_dir = os.path.join(output_dir, path)
-	sample = os.path.join(sample_dir, sample_file)
+	tasks, devices = order_by_device(tasks, lambda task: task[0])
+	processes = options.jobs
+	if not processes:
+		processes = pool_size(devices, PER_DISK)
+	print("Samples: {0} ({1} skipped), processes: {2}".format(
+		len(tasks), len(skipped), processes))
 
-	if not os.path.isdir(dest_dir):
-		os.makedirs(dest_dir)
+	start = time.time()
+	results = list(skipped)
+	for count, res in enumerate(create_srs_files(tasks, processes), 1):
+		results.append(res)
+		print("[{0}/{1}] {2:7} {3:8.2f}s {4}".format(count, len(tasks),
+			res["status"], res["seconds"], res["sample"]))
 
-	original_stderr = sys.stderr
-	txt_error_file = os.path.join(dest_dir, sample_file) + ".txt"
-	sys.stderr = open(txt_error_file, "wt")
-	keep_txt = False
+	summary_file = options.summary or os.path.join(outdir, "srs_batch.json")
+	summary_dir = os.path.dirname(os.path.abspath(summary_file))
+	if not os.path.isdir(summary_dir):
+		# no samples were found or the summary goes elsewhere
+		os.makedirs(summary_dir)
+	write_summary(summary_file, results, processes, time.time() - start)
+	print("Summary: {0}".format(summary_file))
+
+def create_srs_files(tasks, processes):
+	"""Creates the SRS files in a process pool. Yields the result of each
+	sample as soon as it is done."""
+	import multiprocessing
+	pool = multiprocessing.Pool(processes)
 	try:
-		overwrite_param = "" if keep else "-y"
-		srsmain([sample, overwrite_param, "-o", dest_dir], True)
-	except ValueError:
-		keep_txt = True
+		for res in pool.imap_unordered(create_srs, tasks):
+			yield res
+	finally:
+		pool.terminate()
+		pool.join()
 
-	sys.stderr.close()
-	if not keep_txt:
+def create_srs(task):
+	"""Runs srs.py for one sample in a worker process. Everything it
+	prints goes to the log file next to the SRS file; the log is only
+	kept when the sample fails."""
+	sample, dest_dir, srs_file = task
+	start = time.time()
+	if not os.path.isdir(dest_dir):
+		try:
+			os.makedirs(dest_dir)
+		except OSError:
+			pass  # created by an other worker in the meantime
+
+	txt_error_file = os.path.join(dest_dir, os.path.basename(sample)) + ".txt"
+	error = None
+	with open(txt_error_file, "wt") as log:
+		# only this worker process writes to these streams
+		original = sys.stdout, sys.stderr
+		sys.stdout = sys.stderr = log
+		try:
+			srsmain([sample, "-y", "-o", dest_dir], True)
+		except ValueError as err:
+			error = str(err).strip() or "failed"
+		except Exception as err:
+			traceback.print_exc()
+			error = "Unexpected Error: %s" % err
+		finally:
+			sys.stdout, sys.stderr = original
+
+	if error is None:
 		os.unlink(txt_error_file)
+		return result(sample, srs_file, "ok", time.time() - start)
+	return result(sample, srs_file, "failed", time.time() - start,
+	              error, txt_error_file)
+
+def result(sample, srs_file, status, seconds=0.0, error=None, log=None):
+	return {"sample": sample, "srs": srs_file, "status": status,
+	        "seconds": round(seconds, 3), "error": error, "log": log}
 
-	sys.stderr = original_stderr
+def write_summary(summary_file, results, processes, seconds):
+	"""Writes the results and timings as JSON."""
+	counts = {}
+	for res in results:
+		counts[res["status"]] = counts.get(res["status"], 0) + 1
+	summary = {
+		"processes": processes,
+		"seconds": round(seconds, 3),
+		"counts": counts,
+		"results": sorted(results, key=lambda res: res["sample"]),
+	}
+	with open(summary_file, "w") as sfile:
+		json.dump(summary, sfile, indent=1, sort_keys=True)
 
 if __name__ == '__main__':
 	parser = optparse.OptionParser(
 		usage="Usage: %prog -i input_directory -o output_directory\n"
 		"This tool creates .srs or .txt files for video files"
 		" found in the input directory.\nOverwrites existing files.",
-		version="%prog 1.2 (2018-11-03)")  # --help, --version
+		version="%prog 1.3 (2026-10-18)")  # --help, --version
 
 	parser.add_option("-i", dest="input_dir", metavar="DIRECTORY",
 	                  help="folder with release folders")
@@ -90,6 +168,14 @@ if __name__ == '__main__':
 	parser.add_option("-n", dest="always_no", default=False,
 	                  action="store_true",
 	                  help="do not overwrite existing SRS files")
+	parser.add_option("-j", dest="jobs", type="int", default=0,
+	                  metavar="N",
+	                  help="number of samples to process at the same time "
+	                  "(default: one per core, at most %d per disk)"
+	                  % PER_DISK)
+	parser.add_option("-s", dest="summary", metavar="FILE",
+	                  help="JSON file with the results and timings "
+	                  "(default: srs_batch.json in the output directory)")
 
 	# no arguments given
 	if len(sys.argv) == 1:
@@ -27,6 +27,8 @@
 # Optimum values possibly depend on speed of Python and cache sizes and
 # characteristics
 FILE_CRC_BUF = 0x10000
+# Packed data of at least this size is hashed in parallel when available
+PARALLEL_CRC_SIZE = 0x4000000
 
 from binascii import crc32
 from rar import (
@@ -68,6 +70,13 @@ import struct
 import io
 import math
 
+try:
+    # hash large packed data in ranges on several threads
+    from rescene.parallelcrc import crc32_range
+    from rescene.crc32combine import crc32_combine
+except ImportError:
+    crc32_range = None
+
 def main():
     # srr => Produce rescene file rather than Rar files
     # srr-rr-full => Do not strip Rar recovery records (older SRR file format). Requires srr and one of the rr options.
@@ -1031,10 +1040,19 @@ class Numbering2(VolNumbering):
         return (VolNumbering.is_interesting(self) or
             self.num - 1 <= 200 and (self.num - 1) % 100 in {0, 99})
 
-def file_crc32(file, size):
+def file_crc32(parser, size):
+    if crc32_range is not None and size >= PARALLEL_CRC_SIZE:
+        # the ranges are read through their own handles: skip the data
+        # here and add it to the volume CRC afterwards
+        pos = parser.file.tell()
+        crc = crc32_range(parser.file.name, pos, size)
+        parser.file.seek(pos + size)
+        parser.vol_crc = crc32_combine(parser.vol_crc, crc, size)
+        return crc
+    
     crc = 0
     while size > 0:
-        chunk = file.read(min(FILE_CRC_BUF, size))
+        chunk = parser.read(min(FILE_CRC_BUF, size))
         if not chunk:
             raise EOFError()
         size -= len(chunk)
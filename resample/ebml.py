@@ -37,6 +37,9 @@ from rescene.rarstream import RarStream
 BE_BYTE = struct.Struct('>B')  # 1 byte
 BE_SHORT = struct.Struct('>H')  # 2 bytes
 
+# Clusters up to this size are read in one call and parsed from memory
+MAX_CLUSTER_BUFFER = 64 * 1024 * 1024
+
 class InvalidDataException(ValueError):
 	pass
 
@@ -73,6 +76,14 @@ def GetEbmlUInt(buff, offset, count):
 
 	return size  # integer size
 
+def GetEbmlUIntValue(buff):
+	"""Value of an unsigned integer element: its contents are 0 to 8
+	big endian bytes without a length descriptor."""
+	value = 0
+	for byte in bytearray(buff):
+		value = (value << 8) + byte
+	return value
+
 def GetEbmlUIntStream(stream):
 	(first_byte,) = BE_BYTE.unpack(stream.read(1))
 	bytes_consumed = GetUIntLength(first_byte)
@@ -154,6 +165,17 @@ def GetBlockFrameLengths(lace_type, data_length, stream):
 
 	return frame_sizes, bytes_consumed
 
+class _BufferReader(object):
+	"""The read() of a stream for the bytes of a buffer from offset on."""
+	def __init__(self, buff, offset):
+		self._buff = buff
+		self.offset = offset
+
+	def read(self, size):
+		data = self._buff[self.offset:self.offset + size]
+		self.offset += len(data)
+		return data
+
 class EbmlReadMode(object):
 	MKV, Sample, SRS = list(range(3))
 	# MKV: when reading before writing
@@ -164,18 +186,21 @@ class EbmlElementType(object):
 	ContentEncodingList, ContentEncoding, Compression, CompressionAlgorithm,
 	CompressionSettings, Attachment, AttachedFileName, AttachedFileData,
 	SeekHead, Seek, SeekID, SeekPosition, SegmentInfo, Title, Void,
-	ReSample, ReSampleFile, ReSampleTrack, Crc32, Unknown) = list(range(33))
+	ReSample, ReSampleFile, ReSampleTrack, Crc32, Cues, CuePoint, CueTime,
+	CueTrackPositions, CueClusterPosition, Unknown) = list(range(38))
 
 # TODO: not really in use. use IDs instead of EbmlElementType?
-EbmlElementTypeName = dict(zip(list(range(33)), ["Ebml", "Segment",
+EbmlElementTypeName = dict(zip(list(range(38)), ["Ebml", "Segment",
 	"TimecodeScale", "Cluster", "Timecode", "BlockGroup", "Block",
 	"AttachmentList", "TrackList", "Track", "TrackNumber", "TrackCodec",
 	"EncodingList", "ContentEncodingList", "ContentEncoding",
 	"Compression", "CompressionAlgorithm", "CompressionSettings",
 	"Attachment", "AttachedFileName", "AttachedFileData",
 	"SeekHead", "Seek", "SeekID", "SeekPosition", 
-	"SegmentInfo", "Title", "Void"
-	"ReSample", "ReSampleFile", "ReSampleTrack", "Crc32", "Unknown"]))
+	"SegmentInfo", "Title", "Void",
+	"ReSample", "ReSampleFile", "ReSampleTrack", "Crc32",
+	"Cues", "CuePoint", "CueTime", "CueTrackPositions", "CueClusterPosition",
+	"Unknown"]))
 
 class EbmlLaceType(object):
 	NONE = 0
@@ -224,6 +249,13 @@ class EbmlID(object):
 	BLOCK = b"\xA1"
 	SIMPLE_BLOCK = b"\xA3"
 
+	# index to find the Cluster for a timecode, child of Segment
+	CUES = b"\x1C\x53\xBB\x6B"
+	CUE_POINT = b"\xBB"
+	CUE_TIME = b"\xB3"
+	CUE_TRACK_POSITIONS = b"\xB7"
+	CUE_CLUSTER_POSITION = b"\xF1"  # relative to the Segment data
+
 	TRACKLIST = b"\x16\x54\xAE\x6B"  # Tracks, Child of Segment
 	TRACK = b"\xAE"  # TrackEntry, Child of Tracks
 	TRACKNUMBER = b"\xD7"  # TrackNumber, Child of TrackEntry
@@ -278,16 +310,28 @@ id_type_mapping = {
 	EbmlID.RESAMPLE: EbmlElementType.ReSample,
 	EbmlID.RESAMPLE_FILE: EbmlElementType.ReSampleFile,
 	EbmlID.RESAMPLE_TRACK: EbmlElementType.ReSampleTrack,
+	EbmlID.CUES: EbmlElementType.Cues,
+	EbmlID.CUE_POINT: EbmlElementType.CuePoint,
+	EbmlID.CUE_TIME: EbmlElementType.CueTime,
+	EbmlID.CUE_TRACK_POSITIONS: EbmlElementType.CueTrackPositions,
+	EbmlID.CUE_CLUSTER_POSITION: EbmlElementType.CueClusterPosition,
 }
 
 class EbmlReader(object):
 	"""Implements a simple Reader class that reads through MKV or 
 	MKV-SRS files one element at a time."""
 	def __init__(self, read_mode, path=None, stream=None,
-			archived_file_name=""):
+			archived_file_name="", buffered=True):
 		assert path or stream
 		self.element_header = b""  # 12 bytes
 
+		# the contents of a Cluster get read at once when moving into it
+		# SRS files have no Block data: the Cluster sizes don't match
+		self.buffered = buffered and read_mode != EbmlReadMode.SRS
+		self._buffer = None
+		self._buffer_start = 0  # file offset of the buffer
+		self._buffer_pos = 0  # offset in the buffer of the next read
+
 		self._ebml_stream = None
 		self.mode = None
 		self.read_done = True
@@ -319,6 +363,15 @@ class EbmlReader(object):
 		assert self.read_done or (self.mode == EbmlReadMode.SRS and
 		       self.element_type == EbmlElementType.Block), "improper state"
 
+		if self._buffer is not None:
+			if self._buffer_pos < len(self._buffer):
+				if self._read_buffered():
+					return True
+				# no complete child of the Cluster: continue on the stream
+				self._ebml_stream.seek(self._buffer_start + self._buffer_pos,
+				                       os.SEEK_SET)
+			self._buffer = None
+
 		element_start_position = self._ebml_stream.tell()
 
 		# too little data (+2: 1B element ID + 1B data size)
@@ -436,9 +489,77 @@ class EbmlReader(object):
 
 		return True
 
+	def _read_buffered(self):
+		"""Same as read() for the next child of the buffered Cluster.
+		Returns False when it does not fit completely in the buffer."""
+		buff = self._buffer
+		pos = self._buffer_pos
+
+		id_length = GetUIntLength(BE_BYTE.unpack_from(buff, pos)[0])
+		if not id_length or pos + id_length >= len(buff):
+			return False
+		size_length = GetUIntLength(
+			BE_BYTE.unpack_from(buff, pos + id_length)[0])
+		header_end = pos + id_length + size_length
+		if not size_length or header_end > len(buff):
+			return False
+		element_length = GetEbmlUInt(buff, pos + id_length, size_length)
+		if header_end + element_length > len(buff):
+			return False
+
+		element_type = id_type_mapping.get(buff[pos:pos + id_length],
+		                                   EbmlElementType.Unknown)
+		if element_type != EbmlElementType.Block:
+			element = EbmlElement()
+		else:
+			# track number, time code (2 bytes) and flags (1 byte)
+			track_length = GetUIntLength(
+				BE_BYTE.unpack_from(buff, header_end)[0])
+			flags_pos = header_end + track_length + 2
+			if not track_length or flags_pos >= header_end + element_length:
+				return False
+			lace_type = (BE_BYTE.unpack_from(buff, flags_pos)[0] &
+			             EbmlLaceType.EBML)
+			data_length = element_length - track_length - 3
+			lacing = _BufferReader(buff, flags_pos + 1)
+			try:
+				frame_sizes, bytes_consumed = GetBlockFrameLengths(
+					lace_type, data_length, lacing)
+			except (struct.error, AssertionError):
+				return False
+			block_header_length = track_length + 3 + bytes_consumed
+
+			element = BlockElement()
+			element.track_number = GetEbmlUInt(buff, header_end, track_length)
+			(element.timecode,) = BE_SHORT.unpack_from(
+				buff, header_end + track_length)
+			element.frame_lengths = frame_sizes
+			element.raw_block_header = buff[
+				header_end:header_end + block_header_length]
+			element_length -= block_header_length
+			header_end += block_header_length
+
+		self.element_header = buff[pos:pos + id_length + size_length]
+		self.element_type = element_type
+		element.raw_header = self.element_header
+		element.element_start_pos = self._buffer_start + pos
+		element.length = element_length
+		self.current_element = element
+		self.read_done = False
+		self._buffer_pos = header_end
+		return True
+
 	def read_contents(self):
 		# if readReady is set, we've already read or skipped it.
 		# back up and read again?
+		if self._buffer is not None:
+			if self.read_done:
+				self._buffer_pos -= self.current_element.length
+			self.read_done = True
+			start = self._buffer_pos
+			self._buffer_pos += self.current_element.length
+			return self._buffer[start:self._buffer_pos]
+
 		if self.read_done:
 			self._ebml_stream.seek(-self.current_element.length, os.SEEK_CUR)
 
@@ -453,15 +574,39 @@ class EbmlReader(object):
 	def skip_contents(self):
 		if not self.read_done:
 			self.read_done = True
-			if (self.mode != EbmlReadMode.SRS or
+			if self._buffer is not None:
+				self._buffer_pos += self.current_element.length
+			elif (self.mode != EbmlReadMode.SRS or
 				self.element_type != EbmlElementType.Block):
 				self._ebml_stream.seek(self.current_element.length, os.SEEK_CUR)
 
 	def move_to_child(self):
+		if self._buffer is not None:
+			if self.read_done:
+				self._buffer_pos -= self.current_element.length
+			self.read_done = True
+			return
 		if self.read_done:
 			self._ebml_stream.seek(-self.current_element.length, os.SEEK_CUR)
 		self.read_done = True
 
+		# read a whole Cluster at once instead of a few bytes at a time
+		element = self.current_element
+		if (self.buffered and self.element_type == EbmlElementType.Cluster
+		    and element.length <= MAX_CLUSTER_BUFFER):
+			start = element.element_start_pos + len(element.raw_header)
+			if start + element.length <= self._file_length:
+				self._buffer = self._ebml_stream.read(element.length)
+				self._buffer_start = start
+				self._buffer_pos = 0
+
+	def seek(self, position):
+		"""Continues reading with the element that starts at position.
+		e.g. a Cluster position from the Cues of the file"""
+		self._buffer = None
+		self._ebml_stream.seek(position, os.SEEK_SET)
+		self.read_done = True
+
 	def close(self):
 		try:  # close the file/stream
 			self._ebml_stream.close()
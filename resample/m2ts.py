@@ -26,7 +26,6 @@
 
 """Read MPEG2-Transport Stream packets. Not used for SRS files."""
 
-import os
 import struct
 
 from rescene.utility import is_rar, _DEBUG
@@ -38,6 +37,8 @@ S_SHORT = struct.Struct('>H')  # unsigned short: 2 bytes
 PACKET_SIZE = 192
 HEADER_SIZE = 8  # TP_extra_header + transport stream header
 PAYLOAD_SIZE = PACKET_SIZE - HEADER_SIZE
+# packets read from the file at once: 4 MiB
+BUFFER_PACKETS = 4 * 1024 * 1024 // PACKET_SIZE
 
 class InvalidDataException(ValueError):
 	pass
@@ -69,6 +70,38 @@ class Packet(object):
 		        self.start_pos, self.adaptation_field,
 		        self.continuity_counter, self.pid))
 
+class PacketWindow(object):
+	"""Consecutive transport stream packets that were read at once.
+	Packet i starts at start_pos + i * PACKET_SIZE in the file."""
+	def __init__(self, start_pos, data):
+		self.start_pos = start_pos
+		self.data = data  # whole packets: headers and payloads
+		self.count = len(data) // PACKET_SIZE
+		# the 13 bit PID is in byte 6 and 7 of each header
+		high = bytearray(data[5::PACKET_SIZE])
+		low = bytearray(data[6::PACKET_SIZE])
+		self.pids = [((h & 0x1F) << 8) | l for h, l in zip(high, low)]
+
+	def indices(self, pids):
+		"""The numbers of the packets of the given streams."""
+		return [i for i, pid in enumerate(self.pids) if pid in pids]
+
+	def payload(self, i):
+		"""Transport stream packet payload of packet i. (no 8B header)"""
+		offset = i * PACKET_SIZE
+		return self.data[offset + HEADER_SIZE:offset + PACKET_SIZE]
+
+	def packet(self, i):
+		"""Same Packet object M2tsReader.read() creates."""
+		offset = i * PACKET_SIZE
+		packet = Packet(self.start_pos + offset)
+		packet.raw_header = self.data[offset:offset + HEADER_SIZE]
+		(byte8,) = S_BYTE.unpack_from(packet.raw_header, 7)
+		packet.adaptation_field = (byte8 & 0x30) >> 4
+		packet.continuity_counter = (byte8 & 0xF)
+		packet.pid = self.pids[i]
+		return packet
+
 class M2tsReader(object):
 	"""Implements a simple Reader class that reads M2TS files."""
 	def __init__(self, read_mode=M2tsReadMode.M2ts, path=None, stream=None,
@@ -89,21 +122,33 @@ class M2tsReader(object):
 		self.current_packet = None
 		self.current_offset = 0
 
+		# file data is read BUFFER_PACKETS at a time
+		self._buffer = b""
+		self._buffer_start = 0  # file offset of the buffer
+
 		if self._file_length < 192:
 			raise InvalidDataException("File too small")
 
 		# faster reconstructing when match_offset is provided
 		if match_offset >= 8 and match_offset < self._file_length:
 			# use lowest muliple of 192 < offset as a starting point
-			start = match_offset // PACKET_SIZE
-			self._stream.seek(start)
+			start = match_offset // PACKET_SIZE * PACKET_SIZE
 			self.current_offset = start
 		elif match_offset >= self._file_length:
 			msg = "Invalid match offset for video: {0}".format(match_offset)
 			raise InvalidMatchOffsetException(msg)
-		else:
-			# no useful matching offset against the main movie file
-			self._stream.seek(0)
+
+	def _read_at(self, offset, size):
+		"""Returns the data at offset from the buffer: only the end of the
+		file can make it shorter than size."""
+		start = offset - self._buffer_start
+		if start < 0 or start + size > len(self._buffer):
+			self._stream.seek(offset)
+			self._buffer = self._stream.read(
+				max(size, BUFFER_PACKETS * PACKET_SIZE))
+			self._buffer_start = offset
+			start = 0
+		return self._buffer[start:start + size]
 
 	def read(self):
 		# read() is invalid at this time: read_contents() or
@@ -111,9 +156,8 @@ class M2tsReader(object):
 		assert self.read_done or self.mode == M2tsReadMode.SRS
 
 		self.read_done = False
-		self._stream.seek(self.current_offset)
 		# TP_extra_header (4 Bytes) + MPEG-2 transport stream header (4 B)
-		header = self._stream.read(HEADER_SIZE)
+		header = self._read_at(self.current_offset, HEADER_SIZE)
 
 		if not len(header):
 			return False
@@ -154,19 +198,30 @@ class M2tsReader(object):
 	def read_contents(self):
 		"""Reads the transport stream packet payload. (no 8B header)"""
 		buff = b""
-		if self.read_done:
-			self._stream.seek(-PAYLOAD_SIZE, os.SEEK_CUR)
 		self.read_done = True
 		if self.mode != M2tsReadMode.SRS:
-			buff = self._stream.read(PAYLOAD_SIZE)
+			buff = self._read_at(self.current_packet.start_pos + HEADER_SIZE,
+			                     PAYLOAD_SIZE)
 		return buff
 
 	def skip_contents(self):
 		"""Skips over the payload data to the next packet."""
-		if not self.read_done:
-			self.read_done = True
-			if self.mode != M2tsReadMode.SRS:
-				self._stream.seek(PAYLOAD_SIZE, os.SEEK_CUR)
+		self.read_done = True
+
+	def read_window(self):
+		"""Reads the next complete packets at once: as much as the buffer
+		holds. Returns a PacketWindow or None when none are left.
+		read() continues after the last packet of the window."""
+		assert self.read_done and self.mode == M2tsReadMode.M2ts
+		self._read_at(self.current_offset, PACKET_SIZE)
+		start = self.current_offset - self._buffer_start
+		count = (len(self._buffer) - start) // PACKET_SIZE
+		if not count:
+			return None
+		window = PacketWindow(self.current_offset,
+		                      self._buffer[start:start + count * PACKET_SIZE])
+		self.current_offset += count * PACKET_SIZE
+		return window
 
 	def close(self):
 		try:  # close the file/stream
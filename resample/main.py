@@ -32,9 +32,12 @@ import os
 import sys
 import logging
 import unittest
-import tempfile
 import collections
+import copy
 
+from array import array
+from bisect import bisect_left, bisect_right
+from multiprocessing.pool import ThreadPool
 from os.path import basename
 from struct import Struct
 from zlib import crc32
@@ -50,7 +53,7 @@ from rescene.utility import _DEBUG
 from rescene.utility import FileType
 
 from resample.ebml import EbmlReader, EbmlReadMode, EbmlElementType
-from resample.ebml import GetEbmlUInt, MakeEbmlUInt, EbmlID
+from resample.ebml import GetEbmlUInt, GetEbmlUIntValue, MakeEbmlUInt, EbmlID
 from resample.riff import RiffReader, RiffReadMode, RiffChunkType
 from resample.riff import InvalidMatchOffsetException
 from resample.mov import MovReader, MovReadMode
@@ -64,7 +67,10 @@ from resample.flac import FlacReader
 from resample.mp3 import Mp3Reader
 from resample.mp3 import decode_id3_size
 from resample.stream import StreamReader
-from resample.m2ts import M2tsReader, M2tsReadMode
+from resample.m2ts import M2tsReader, M2tsReadMode, PACKET_SIZE
+from resample.matcher import find_start, extend_match, SignatureFinder
+from resample.trackbuffer import TrackBuffer
+from resample.prefetch import PrefetchReader
 
 logger = logging.getLogger(__name__)
 if not _DEBUG:
@@ -97,6 +103,17 @@ BE_LONGLONG = Struct('>Q')
 SIG_SIZE = 256
 STREAM_VS_SUBTITLE = 1000000
 
+# searching an MKV file near the Cues entry of the sample's first Cluster:
+# amount of Cue points read at once and how many windows around it to try
+# before reading the whole file
+MKV_CUE_WINDOW = 8
+MKV_CUE_WINDOWS = 16
+
+# MP4 tracks copied from the main file at the same time
+MP4_EXTRACT_THREADS = 4
+# largest piece of track data that is read at once
+COPY_SIZE = 8 * 1024 * 1024
+
 MARKER_STREAM_SRS = b"STRM\x08\x00\x00\x00"  # VOB, MPEG, M2TS, ... SRS
 MARKER_M2TS_SRS = b"M2TS\x08\x00\x00\x00"  # M2TS SRS (not in use)
 
@@ -560,12 +577,21 @@ class ReSample(object):
 	
 	def __init__(self):
 		self.cut_data = {}  # track number -> list of other possible offsets
+		# MKV: Timecode of the first Cluster of the sample
+		self.first_timecode = None
 	
 	def msg_not_enough_signature_data(self, track):
 		msg = "Not enough unique data for track {0}".format(track.track_number)
 		print("WARNING: " + msg)
 		logger.warn(msg)
 
+	def find_extract_sample_streams(self, tracks, movie):
+		"""Locates the sample streams in the main file. Formats that support
+		it copy the track data in the same pass. Returns (tracks, attachments)
+		with attachments None when extract_sample_streams() is still needed.
+		"""
+		return self.find_sample_streams(tracks, movie), None
+
 def sample_class_factory(file_type):
 	"""Choose the right class based on the sample's file type."""
 	if file_type == FileType.AVI:
@@ -599,6 +625,9 @@ class AviReSample(ReSample):
 		return avi_find_sample_streams(self, *args, **kwargs)
 	def extract_sample_streams(self, *args, **kwargs):
 		return avi_extract_sample_streams(self, *args, **kwargs)
+	def find_extract_sample_streams(self, tracks, movie):
+		return find_extract_single_pass(self, avi_find_sample_streams,
+		                                tracks, movie)
 	def rebuild_sample(self, *args, **kwargs):
 		return avi_rebuild_sample(self, *args, **kwargs)
 
@@ -616,6 +645,9 @@ class MkvReSample(ReSample):
 		return mkv_find_sample_streams(self, *args, **kwargs)
 	def extract_sample_streams(self, *args, **kwargs):
 		return mkv_extract_sample_streams(self, *args, **kwargs)
+	def find_extract_sample_streams(self, tracks, movie):
+		return find_extract_single_pass(self, mkv_find_sample_streams,
+		                                tracks, movie)
 	def rebuild_sample(self, *args, **kwargs):
 		return mkv_rebuild_sample(self, *args, **kwargs)
 
@@ -783,12 +815,20 @@ def mkv_load_srs(self, infile):
 		elif er.element_type == EbmlElementType.ReSampleTrack:
 			track = TrackData(er.read_contents())
 			tracks[track.track_number] = track
-		elif (er.element_type == EbmlElementType.Cluster or
-			er.element_type == EbmlElementType.AttachmentList):
-				# if we get to either of these elements,
-				# we've passed the interesting part of the file, so bail out
-				er.skip_contents()
-				done = True
+		elif er.element_type == EbmlElementType.Cluster:
+			# only the Timecode of the first Cluster is still of use:
+			# it tells where in the main file the sample was cut from
+			er.move_to_child()
+		elif er.element_type == EbmlElementType.Timecode:
+			elm_content = er.read_contents()
+			self.first_timecode = GetEbmlUIntValue(elm_content)
+			done = True
+		elif er.element_type in (EbmlElementType.Block,
+		                         EbmlElementType.AttachmentList):
+			# if we get to either of these elements,
+			# we've passed the interesting part of the file, so bail out
+			er.skip_contents()
+			done = True
 		else:
 			er.skip_contents()
 	er.close()
@@ -896,7 +936,8 @@ def avi_profile_sample(self, avi_data):  # FileData object
 
 	avi_data.crc32 = 0x0  # start value crc
 
-	rr = RiffReader(RiffReadMode.Sample, avi_data.name)
+	rr = RiffReader(RiffReadMode.Sample,
+	                stream=PrefetchReader(avi_data.name))
 	while rr.read():
 		assert not rr.read_done
 		c = rr.current_chunk
@@ -1001,7 +1042,8 @@ def mkv_profile_sample(self, mkv_data):  # FileData object
 
 	mkv_data.crc32 = 0x0  # start value crc
 
-	er = EbmlReader(EbmlReadMode.Sample, mkv_data.name)
+	er = EbmlReader(EbmlReadMode.Sample,
+	                stream=PrefetchReader(mkv_data.name))
 	while er.read():
 		assert not er.read_done
 		e = er.current_element
@@ -1027,7 +1069,11 @@ def mkv_profile_sample(self, mkv_data):  # FileData object
 		elif etype in (EbmlElementType.TimecodeScale, EbmlElementType.Timecode):
 			# (same as else)
 			other_length += er.current_element.length
-			mkv_data.crc32 = crc32(er.read_contents(), mkv_data.crc32)
+			elm_content = er.read_contents()
+			mkv_data.crc32 = crc32(elm_content, mkv_data.crc32)
+			if (etype == EbmlElementType.Timecode and
+			    self.first_timecode is None):
+				self.first_timecode = GetEbmlUIntValue(elm_content)
 		elif etype == EbmlElementType.Cluster:
 			# simple progress indicator since this can take a while
 			# (cluster is good because they're about 1mb each)
@@ -1586,7 +1632,7 @@ def flac_profile_sample(self, flac_data):  # FileData object
 	flac_data.crc32 = 0x0  # start value crc
 	meta_length = 0
 
-	fr = FlacReader(flac_data.name)
+	fr = FlacReader(stream=PrefetchReader(flac_data.name))
 	while fr.read():
 		assert not fr.read_done
 		e = fr.current_block
@@ -1668,7 +1714,7 @@ def mp3_profile_sample(self, mp3_data):  # FileData object
 	mp3_data.crc32 = 0x0  # start value crc
 	meta_length = 0
 
-	mr = Mp3Reader(mp3_data.name)
+	mr = Mp3Reader(stream=PrefetchReader(mp3_data.name))
 	for block in mr.read():
 		if block.type in ("MP3", "fLaC"):  # main MP3 data
 			read = 0
@@ -2135,7 +2181,9 @@ def m2ts_create_srs(self, tracks, sample_data, sample, srs, big_file):
 		streamf.seek(headers_size, os.SEEK_SET)
 		streamf.write(S_LONG.pack(headers_end - headers_size + 4))
 
-def avi_find_sample_streams(self, tracks, main_avi_file):
+def avi_find_sample_streams(self, tracks, main_avi_file, attachments=None):
+	"""With an attachments dictionary, the track data is extracted in the
+	same pass (see find_extract_sample_streams)."""
 	rr = RiffReader(RiffReadMode.AVI, main_avi_file,
 		archived_file_name=self.archived_file_name)
 	block_count = 0
@@ -2146,13 +2194,13 @@ def avi_find_sample_streams(self, tracks, main_avi_file):
 			rr.move_to_child()
 		else:  # normal chunk
 			tracks, block_count, done = _avi_normal_chunk_find(tracks, rr,
-			                                      block_count, done)
+			                    block_count, done, attachments is not None)
 	remove_spinner()
 
 	rr.close()
 	return tracks
 
-def _avi_normal_chunk_find(tracks, rr, block_count, done):
+def _avi_normal_chunk_find(tracks, rr, block_count, done, extract=False):
 	# contains the stream data
 	if rr.chunk_type == RiffChunkType.Movi:
 		block_count += 1
@@ -2173,21 +2221,22 @@ def _avi_normal_chunk_find(tracks, rr, block_count, done):
 			# we obviously don't want to try to match the data
 			if track.signature_bytes:
 				if (0 < len(track.check_bytes) < len(track.signature_bytes)):
-					lcb = min(len(track.signature_bytes),
-								rr.current_chunk.length +
-								len(track.check_bytes))
-					check_bytes = track.check_bytes
-					check_bytes += rr.read_contents()[:lcb -
-					                                  len(track.check_bytes)]
+					chunk_bytes = rr.read_contents()
+					check_bytes = extend_match(track.signature_bytes,
+						track.check_bytes, chunk_bytes)
 
 					# track found!
-					if track.signature_bytes.startswith(check_bytes):
+					if check_bytes is not None:
 						track.check_bytes = check_bytes
+						if extract:
+							_avi_chunk_extract(rr, track, data=chunk_bytes)
 					else:
 						# It was only a partial match. Start over.
 						track.check_bytes = b""
 						track.match_offset = 0
 						track.match_length = 0
+						if extract:
+							discard_track_file(track)
 
 				# this is a bit weird, but if we had a false positive match
 				# going and discovered it above, we check this frame again
@@ -2196,26 +2245,21 @@ def _avi_normal_chunk_find(tracks, rr, block_count, done):
 				# but it does in MKV, so just in case...)
 				if not track.check_bytes:
 					chunk_bytes = rr.read_contents()
+					found_pos = find_start(track.signature_bytes, chunk_bytes)
 
-					search_byte = track.signature_bytes[0]
-					found_pos = chunk_bytes.find(search_byte, 0)
-
-					while found_pos > -1:
-						lcb = min(len(track.signature_bytes),
-									len(chunk_bytes) - found_pos)
-						check_bytes = chunk_bytes[found_pos:found_pos + lcb]
-
-						# track found!
-						if track.signature_bytes.startswith(check_bytes):
-							track.check_bytes = check_bytes
-							track.match_offset = (
-							                rr.current_chunk.chunk_start_pos
-							                + len(rr.current_chunk.raw_header)
-							                + found_pos)
-							track.match_length = min(track.data_length,
-							                     len(chunk_bytes) - found_pos)
-							break
-						found_pos = chunk_bytes.find(search_byte, found_pos + 1)
+					# track found!
+					if found_pos > -1:
+						track.check_bytes = chunk_bytes[found_pos:found_pos +
+						                          len(track.signature_bytes)]
+						track.match_offset = (
+						                rr.current_chunk.chunk_start_pos
+						                + len(rr.current_chunk.raw_header)
+						                + found_pos)
+						track.match_length = min(track.data_length,
+						                     len(chunk_bytes) - found_pos)
+						if extract:
+							track.track_file = TrackBuffer()
+							_avi_chunk_extract(rr, track, found_pos, chunk_bytes)
 			else:
 				track.match_length = min(track.data_length
 				                         - track.match_length,
@@ -2225,6 +2269,8 @@ def _avi_normal_chunk_find(tracks, rr, block_count, done):
 		elif track.match_length < track.data_length:
 			track.match_length += min(track.data_length - track.match_length,
 			                          rr.current_chunk.length)
+			if extract:
+				_avi_chunk_extract(rr, track)
 
 			track_done = True
 			for track in tracks.values():
@@ -2238,16 +2284,71 @@ def _avi_normal_chunk_find(tracks, rr, block_count, done):
 
 	return tracks, block_count, done
 
-def mkv_find_sample_streams(self, tracks, main_mkv_file):
+def mkv_find_sample_streams(self, tracks, main_mkv_file, attachments=None):
+	"""With an attachments dictionary, the track data and attachments are
+	extracted in the same pass (see find_extract_sample_streams)."""
 	er = EbmlReader(EbmlReadMode.MKV, main_mkv_file,
 		archived_file_name=self.archived_file_name)
+	tracks_main = {}  # contains TrackData objects; main mkv info
+
+	if not self.cut_data:  # x265 bug: all other offsets must be collected
+		windows = _mkv_cue_windows(self, tracks, er)
+	else:
+		windows = []
+	if windows:
+		# the track list and compression settings precede the Clusters
+		er.seek(0)
+		_mkv_find_walk(self, tracks, er, tracks_main, end=0,
+		               attachments=attachments)
+		initial = dict((track_number, (t.match_offset, t.match_length,
+		                               t.check_bytes))
+		               for track_number, t in tracks.items())
+		for start, end in windows:
+			er.seek(start)
+			if not er.read() or er.element_type != EbmlElementType.Cluster:
+				break  # the Cues do not point to Clusters
+			er.seek(start)
+			if _mkv_find_walk(self, tracks, er, tracks_main, end,
+			                  attachments=attachments):
+				remove_spinner()
+				er.close()
+				return tracks
+		logger.info("Sample not found near its Cues entry: reading the "
+		            "whole main file.")
+		discard_track_files(tracks)
+		for track_number in list(tracks.keys()):
+			if track_number not in initial:
+				del tracks[track_number]
+			else:
+				t = tracks[track_number]
+				(t.match_offset, t.match_length,
+				 t.check_bytes) = initial[track_number]
+		tracks_main = {}
+
+	# full linear scan from the start of the file
+	er.seek(0)
+	_mkv_find_walk(self, tracks, er, tracks_main, attachments=attachments)
+	remove_spinner()
+
+	er.close()
+	return tracks
+
+def _mkv_find_walk(self, tracks, er, tracks_main, end=None,
+                   attachments=None, block_find=None):
+	"""Reads the main MKV file from the current position of the reader
+	until all tracks are located. With end set, it stops at the first
+	Cluster that starts at or after it, unless a track is still being
+	matched there. Returns whether all tracks were located.
+	attachments: dictionary to extract the attachments and track data to
+	block_find: function(er, done) that replaces _mkv_block_find"""
 	cluster_count = 0
 	done = False
 	current_track_nb = 0
+	current_attachment = None
 	header_stripping = False
-	tracks_main = {}  # contains TrackData objects; main mkv info
+	extract = attachments is not None
 
-	while er.read() and not done:
+	while not done and er.read():
 		if er.element_type in (
 				EbmlElementType.Segment,
 				EbmlElementType.BlockGroup,
@@ -2258,14 +2359,31 @@ def mkv_find_sample_streams(self, tracks, main_mkv_file):
 				EbmlElementType.Compression):
 			er.move_to_child()
 		elif er.element_type == EbmlElementType.Cluster:
+			if (end is not None and
+			    er.current_element.element_start_pos >= end and
+			    not any(t.check_bytes and t.match_length < t.data_length
+			            for t in tracks.values())):
+				er.skip_contents()
+				break
 			# simple progress indicator since this can take a while
 			# (cluster is good because they're about 1mb each)
 			cluster_count += 1
 			show_spinner(cluster_count)
 			er.move_to_child()
+		elif er.element_type == EbmlElementType.Block and block_find:
+			done = block_find(er, done)
 		elif er.element_type == EbmlElementType.Block:
 			# tracks and tracks_main get modified
-			done = _mkv_block_find(self, tracks, er, done, tracks_main)
+			done = _mkv_block_find(self, tracks, er, done, tracks_main,
+			                       extract)
+		elif extract and er.element_type in (
+				EbmlElementType.AttachmentList,
+				EbmlElementType.Attachment):
+			er.move_to_child()
+		elif extract and er.element_type == EbmlElementType.AttachedFileName:
+			current_attachment = _mkv_attachment_name(er, attachments)
+		elif extract and er.element_type == EbmlElementType.AttachedFileData:
+			_mkv_attachment_extract(er, attachments[current_attachment])
 		elif er.element_type == EbmlElementType.TrackNumber:
 			elm_content = er.read_contents()
 			current_track_nb = GetEbmlUInt(elm_content, 0, len(elm_content))
@@ -2290,12 +2408,106 @@ def mkv_find_sample_streams(self, tracks, main_mkv_file):
 		else:
 			er.skip_contents()
 
-	remove_spinner()
+	return done
 
-	er.close()
-	return tracks
+def _mkv_cue_windows(self, tracks, er):
+	"""Ranges of the main MKV file to search, nearest to where the sample
+	was cut from first: [(start, end), ...] with end None for the rest of
+	the file. Empty when it can't be estimated with the Cues."""
+	clusters = mkv_read_cues(er)
+	if not clusters:
+		return []
+	positions = [position for _time, position in clusters]
+
+	# match offsets of some tracks can still be in the SRS file
+	offsets = [t.match_offset for t in tracks.values() if t.match_offset]
+	if offsets:
+		center = bisect_right(positions, min(offsets)) - 1
+	elif self.first_timecode:
+		# the times increase along with the Cluster positions
+		center = bisect_right([time for time, _position in clusters],
+		                      self.first_timecode) - 1
+	else:  # a sample from the start of the movie or timecodes were reset
+		return []
+	# the first block of the sample can be before the Cue point
+	center = max(0, center - 1)
+
+	def window(first):
+		last = first + MKV_CUE_WINDOW
+		return (positions[max(0, first)],
+		        positions[last] if last < len(positions) else None)
+	# alternately the next window after and before the estimate
+	firsts = [center]
+	for distance in range(MKV_CUE_WINDOW, len(positions) + MKV_CUE_WINDOW,
+	                      MKV_CUE_WINDOW):
+		firsts.extend(first for first in (center + distance, center - distance)
+		              if -MKV_CUE_WINDOW < first < len(positions))
+	return [window(first) for first in firsts[:MKV_CUE_WINDOWS]]
+
+def mkv_read_cues(er):
+	"""Reads the Cues of an MKV file using the SeekHead or the Cues
+	before the first Cluster. Returns the [(cue time, cluster position)]
+	list sorted on the absolute position of the Clusters.
+	Empty when the file has no (reachable) Cues."""
+	segment_data_start = None
+	cues_position = None
+	seek_id = seek_position = None
+
+	er.seek(0)
+	while cues_position is None and er.read():
+		etype = er.element_type
+		if etype == EbmlElementType.Segment:
+			segment_data_start = (er.current_element.element_start_pos +
+			                      len(er.current_element.raw_header))
+			er.move_to_child()
+		elif etype == EbmlElementType.SeekHead:
+			er.move_to_child()
+		elif etype == EbmlElementType.Seek:
+			seek_id = seek_position = None
+			er.move_to_child()
+		elif etype in (EbmlElementType.SeekID, EbmlElementType.SeekPosition):
+			if etype == EbmlElementType.SeekID:
+				seek_id = er.read_contents()
+			else:
+				seek_position = GetEbmlUIntValue(er.read_contents())
+			if seek_id == EbmlID.CUES and seek_position is not None:
+				cues_position = segment_data_start + seek_position
+		elif etype == EbmlElementType.Cues:
+			cues_position = er.current_element.element_start_pos
+			er.skip_contents()
+		elif etype == EbmlElementType.Cluster:
+			break
+		else:
+			er.skip_contents()
+	if cues_position is None:
+		return []
+
+	er.seek(cues_position)
+	if not er.read() or er.element_type != EbmlElementType.Cues:
+		return []
+	cues_end = (cues_position + len(er.current_element.raw_header) +
+	            er.current_element.length)
+	er.move_to_child()
+
+	clusters = {}
+	cue_time = 0
+	while er.read() and er.current_element.element_start_pos < cues_end:
+		etype = er.element_type
+		if etype in (EbmlElementType.CuePoint,
+		             EbmlElementType.CueTrackPositions):
+			er.move_to_child()
+		elif etype == EbmlElementType.CueTime:
+			cue_time = GetEbmlUIntValue(er.read_contents())
+		elif etype == EbmlElementType.CueClusterPosition:
+			position = segment_data_start + GetEbmlUIntValue(
+				er.read_contents())
+			# multiple tracks can have a Cue point for the same Cluster
+			clusters[position] = min(cue_time, clusters.get(position, cue_time))
+		else:
+			er.skip_contents()
+	return [(clusters[position], position) for position in sorted(clusters)]
 
-def _mkv_block_find(self, tracks, er, done, tracks_main):
+def _mkv_block_find(self, tracks, er, done, tracks_main, extract=False):
 	# grab track or create new track
 	track_number = er.current_element.track_number
 	if track_number not in tracks:
@@ -2331,48 +2543,57 @@ def _mkv_block_find(self, tracks, er, done, tracks_main):
 			flength = (er.current_element.frame_lengths[i] +
 			           len(sforsample) - len(sformain))
 			# see if a false positive match was detected
+			frame = buff[offset + len(sformain):
+			             offset + len(sformain) + flength - len(sforsample)]
 			if (0 < len(track.check_bytes) < len(track.signature_bytes)):
-				lcb = min(len(track.signature_bytes),
-				          flength + len(track.check_bytes))
-				check_bytes = track.check_bytes  # from sample
-				check_bytes += sforsample  # stored settings from main video
-				check_bytes += buff[offset + len(sformain):
-									offset + len(sformain) + lcb -
-									len(track.check_bytes) - len(sforsample)]
-
-				if track.signature_bytes.startswith(check_bytes):
+				# from sample + stored settings from main video
+				check_bytes = extend_match(track.signature_bytes,
+					track.check_bytes + sforsample, frame)
+
+				if check_bytes is not None:
 					track.check_bytes = check_bytes
 				else:
 					# It was only a partial match. Start over.
 					track.check_bytes = b""
 					track.match_offset = 0
 					track.match_length = 0
+					if extract:
+						discard_track_file(track)
 			# this is a bit weird, but if we had a false positive match going
 			# and discovered it above, we check this frame again
 			# to see if it's the start of a new match
 			# (rare problem, but it can happen with subtitles especially)
 
 			if not track.check_bytes:  # always entered upon start too
-				lcb = min(len(track.signature_bytes), flength)
-				check_bytes = sforsample
-				check_bytes += buff[offset + len(sformain):
-				                    offset + len(sformain) + lcb - len(sforsample)]
-				if track.signature_bytes.startswith(check_bytes):
+				check_bytes = extend_match(track.signature_bytes,
+				                           sforsample, frame)
+				if check_bytes is not None:
 					track.check_bytes = check_bytes
 					track.match_offset = (er.current_element.element_start_pos
 					                      + len(er.current_element.raw_header)
 					                      + len(er.current_element.raw_block_header)
 					                      + offset)
 					track.match_length = min(track.data_length, flength)
+					if extract:
+						track.track_file = TrackBuffer()
+						_mkv_frame_extract(er, buff, offset, i, track, track2)
 			else:
 				track.match_length += min(track.data_length -
 				                          track.match_length, flength)
+				if extract:
+					_mkv_frame_extract(er, buff, offset, i, track, track2)
 			offset += er.current_element.frame_lengths[i]
 	elif track.match_length < track.data_length:
 		track.match_length += min(track.data_length - track.match_length,
 		                          er.current_element.length)
 		
-		if srs_cut_bug:
+		if extract:
+			buff = er.read_contents()
+			offset = 0
+			for i in range(len(er.current_element.frame_lengths)):
+				_mkv_frame_extract(er, buff, offset, i, track, track2)
+				offset += er.current_element.frame_lengths[i]
+		elif srs_cut_bug:
 			_extra_offsets_x265_bug(self, er, track, sforsample, sformain)
 		else:
 			er.skip_contents()
@@ -2399,27 +2620,23 @@ def _extra_offsets_x265_bug(self, er, track, sforsample, sformain):
 	for i in range(len(er.current_element.frame_lengths)):
 		flength = (er.current_element.frame_lengths[i] +
 				   len(sforsample) - len(sformain))
+		frame = buff[offset + len(sformain):
+		             offset + len(sformain) + flength - len(sforsample)]
 		# see if a false positive match was detected
 		if (0 < len(track.check_bytes_bug) < len(track.signature_bytes)):
-			lcb = min(len(track.signature_bytes),
-					  flength + len(track.check_bytes_bug))
-			check_bytes = track.check_bytes_bug  # from sample
-			check_bytes += sforsample  # stored settings from main video
-			check_bytes += buff[offset + len(sformain):
-								offset + len(sformain) + lcb -
-								len(track.check_bytes_bug) - len(sforsample)]
-
-			if track.signature_bytes.startswith(check_bytes):
+			# from sample + stored settings from main video
+			check_bytes = extend_match(track.signature_bytes,
+				track.check_bytes_bug + sforsample, frame)
+
+			if check_bytes is not None:
 				track.check_bytes_bug = check_bytes
 			else:  # partial match, start over
 				track.check_bytes_bug = b""
 
 		if not track.check_bytes_bug:
-			lcb = min(len(track.signature_bytes), flength)
-			check_bytes = sforsample
-			check_bytes += buff[offset + len(sformain):
-								offset + len(sformain) + lcb - len(sforsample)]
-			if track.signature_bytes.startswith(check_bytes):
+			check_bytes = extend_match(track.signature_bytes,
+			                           sforsample, frame)
+			if check_bytes is not None:
 				track.check_bytes_bug = check_bytes
 				match_offset = (er.current_element.element_start_pos
 					+ len(er.current_element.raw_header)
@@ -2435,25 +2652,13 @@ def mp4_find_sample_stream(track, mtrack, main_mp4_file):
 	mtrack = mp4_add_track_stream(mtrack)
 	# open stream here so we open and close the mp4 file just once
 	mtrack.trackstream.stream = open_main(main_mp4_file)
-
-	data = mtrack.trackstream.read(len(track.signature_bytes))
-# 	from binascii import hexlify
-# 	print(hexlify(data).decode('ascii'))
-# 	print(mtrack.trackstream.current_offset())
-# 	print(hexlify(track.signature_bytes).decode('ascii'))
-	if data == track.signature_bytes:
-		track.match_offset = mtrack.trackstream.current_offset()
-	next_chunk = True
-
-	# walk through the stream one sample at the time
-	while data != track.signature_bytes and next_chunk:
-		next_chunk = next(mtrack.trackstream)
-		data = mtrack.trackstream.read(len(track.signature_bytes))
-		if data == track.signature_bytes:
-			# this indicates that we have the track found
-			track.match_offset = mtrack.trackstream.current_offset()
-
-	mtrack.trackstream.stream.close()
+	try:
+		match_offset = mtrack.trackstream.find_sample(track.signature_bytes)
+	finally:
+		mtrack.trackstream.stream.close()
+	if match_offset is not None:
+		# this indicates that we have the track found
+		track.match_offset = match_offset
 	return track
 
 def mp4_add_track_stream(track):
@@ -2493,9 +2698,12 @@ class TrackStream(object):
 		self._current_offset = 0  # chunk + sample offset
 		self._current_chunk = None
 		self._current_sample = 0  # of the current chunk
+		self._chunk_offsets = None  # for seeking: in order of the chunks
+		self._chunks_sorted = True
 
 	def add_chunk(self, chunk):
 		self.chunks.append(chunk)
+		self._chunk_offsets = None
 
 	def current_offset(self):
 		return self._current_offset
@@ -2503,43 +2711,102 @@ class TrackStream(object):
 	def seek(self, offset):
 		"""The offset must be the beginning of a sample."""
 		self._current_offset = offset
-		for chunk in self.chunks:
-			if chunk.chunk_offset <= offset:
-				self._current_chunk = chunk
+		if self._chunk_offsets is None:
+			offsets = _uint_array(chunk.chunk_offset for chunk in self.chunks)
+			self._chunks_sorted = all(a <= b for a, b in
+			                          zip(offsets, offsets[1:]))
+			self._chunk_offsets = offsets
+		if self._chunks_sorted:
+			# last chunk that starts before the offset
+			index = bisect_right(self._chunk_offsets, offset) - 1
+			if index >= 0:
+				self._current_chunk = self.chunks[index]
+		else:  # interleaved in an unusual way
+			for chunk in self.chunks:
+				if chunk.chunk_offset <= offset:
+					self._current_chunk = chunk
 		assert self._current_chunk
 		# Will raise InvalidMatchOffset when not on start of a sample
 		self._current_sample = self._current_chunk.get_sample_nb(offset)
 
 	def read(self, amount):
 		"""amount: max amount to read"""
+		return b"".join(self.iter_read(amount))
+
+	def iter_read(self, amount, piece_size=COPY_SIZE):
+		"""Yields the data read() returns in pieces of at most piece_size.
+		The current position does not change."""
 		if self._current_chunk == None:  # bootstrap
 			self._current_chunk = self.chunks[0]
 			self._current_offset = self._current_chunk.chunk_offset
 
 		# what we can read from the current chunk
-		lb = self._current_chunk.bytes_left_in_chunk(self._current_sample)
-		if lb > amount:
-			# if we can read all from the same chunk
-			self.stream.seek(self._current_offset, os.SEEK_SET)
-			data = self.stream.read(amount)
-			return data
-		else:
+		chunk = self._current_chunk
+		left = chunk.bytes_left_in_chunk(self._current_sample)
+		self.stream.seek(self._current_offset, os.SEEK_SET)
+		while amount > 0:
+			size = min(amount, left)
+			while size > 0:
+				data = self.stream.read(min(size, piece_size))
+				if not data:
+					break
+				yield data
+				size -= len(data)
+				amount -= len(data)
+
 			# we need to grab extra data from the next chunk(s)
-			self.stream.seek(self._current_offset, os.SEEK_SET)
-			firstb = self.stream.read(lb)
-
-			next_chunk = self._current_chunk
-			while len(firstb) < amount:
-				next_chunk = next_chunk.next_chunk
-				if not next_chunk:
-					# at the end of the stream, so return what we have
-					return firstb
-
-				bl = next_chunk.bytes_left_in_chunk(0)
-				self.stream.seek(next_chunk.chunk_offset)
-				bytes_read = self.stream.read(min(amount - len(firstb), bl))
-				firstb += bytes_read
-			return firstb
+			chunk = chunk.next_chunk
+			if not chunk:
+				# at the end of the stream, so return what we have
+				return
+			left = chunk.bytes_left_in_chunk(0)
+			self.stream.seek(chunk.chunk_offset, os.SEEK_SET)
+
+	def find_sample(self, signature):
+		"""Returns the offset of the first sample where the track data
+		starts with the signature or None. Each chunk is read once and
+		only the sample starts where the signature occurs are checked."""
+		if not signature:
+			return None
+		prefix = signature[:64]
+		for chunk in self.chunks:
+			size = chunk.bytes_left_in_chunk(0)
+			if not size:
+				continue
+			self.stream.seek(chunk.chunk_offset, os.SEEK_SET)
+			data = self.stream.read(size)
+			starts = chunk.sample_starts
+			count = min(chunk.samples_in_chunk, len(chunk.samples))
+
+			candidates = []
+			found = data.find(prefix)
+			while found > -1:
+				nb = bisect_left(starts, found, 0, count)
+				if nb < count and starts[nb] == found:
+					candidates.append(nb)
+				found = data.find(prefix, found + 1)
+			# the prefix can continue in the next chunk
+			first_short = bisect_right(starts, len(data) - len(prefix), 0, count)
+			candidates.extend(nb for nb in range(first_short, count)
+			                  if prefix.startswith(data[starts[nb]:]))
+
+			for nb in sorted(set(candidates)):
+				if data.startswith(signature, starts[nb]):
+					return chunk.chunk_offset + starts[nb]
+				if len(data) - starts[nb] < len(signature):
+					# compare with the data of the next chunks
+					self._current_chunk = chunk
+					self._current_sample = nb
+					self._current_offset = chunk.chunk_offset + starts[nb]
+					if self.read(len(signature)) == signature:
+						return self._current_offset
+		return None
+
+	def copy_to(self, output, amount):
+		"""Writes the next amount bytes of the track to output
+		without holding them in memory at once."""
+		for data in self.iter_read(amount):
+			output.write(data)
 
 	def __next__(self):
 		# are there still samples left in the chunk?
@@ -2570,32 +2837,77 @@ class TrackChunk(object):
 		self.next_chunk = None
 		self.samples = []
 
+	@property
+	def samples(self):
+		"""Sizes of the samples in the chunk."""
+		return self._samples
+
+	@samples.setter
+	def samples(self, sizes):
+		self._samples = sizes
+		# start of each sample relative to the chunk and the chunk size
+		self.sample_starts = _prefix_sums(sizes)
+
 	def bytes_left_in_chunk(self, sample_number):
-		return sum(self.samples[sample_number:self.samples_in_chunk])
+		end = min(self.samples_in_chunk, len(self._samples))
+		return (self.sample_starts[end] -
+		        self.sample_starts[min(sample_number, end)])
 
 	def bytes_consumed(self, sample_number):
-		amount = 0
-		for i in range(sample_number):
-			amount += self.samples[i]
-		return amount
+		if sample_number > len(self._samples):
+			raise IndexError("sample number out of range")
+		return self.sample_starts[sample_number]
 
 	def get_sample_nb(self, offset):
-		sample_sum = 0
-		count = 0
-		for sample in self.samples:
-			if offset <= self.chunk_offset + sample_sum:
-				if offset != self.chunk_offset + sample_sum:
-					raise InvalidMatchOffset
-				assert self.chunk_offset + sample_sum == offset
-				return count
-			count += 1
-			sample_sum += sample
-		return count
+		count = len(self._samples)
+		nb = bisect_left(self.sample_starts, offset - self.chunk_offset,
+		                 0, count)
+		if nb < count and self.chunk_offset + self.sample_starts[nb] != offset:
+			raise InvalidMatchOffset
+		return nb
+
+def _uint_array(values):
+	"""Compact list of unsigned integers such as file offsets."""
+	try:
+		return array("Q", values)
+	except ValueError:  # Python < 3.3 has no unsigned long long arrays
+		return list(values)
+
+def _prefix_sums(sizes):
+	"""[0, sizes[0], sizes[0] + sizes[1], ...]"""
+	def running_total():
+		total = 0
+		yield total
+		for size in sizes:
+			total += size
+			yield total
+	return _uint_array(running_total())
+
+# profile_mp4() results of main files: finding and extracting both need it.
+# The cached tracks are never handed out: callers modify their tracks.
+_main_mp4_profiles = odict()
+
+def _profile_main_mp4(main_mp4_file, archived_file_name):
+	"""profile_mp4() of a main movie file, only done once per process
+	for the same path, size and modification time of the file.
+	Returns new track objects for each call. The sample tables are shared:
+	they are only read after profiling."""
+	stat = os.stat(main_mp4_file)
+	key = (os.path.abspath(main_mp4_file), stat.st_size, stat.st_mtime,
+	       archived_file_name)
+	mtracks = _main_mp4_profiles.get(key)
+	if mtracks is None:
+		mtracks = profile_mp4(FileData(file_name=main_mp4_file),
+		                      calculate_crc32=False,
+		                      archived_file_name=archived_file_name)
+		_main_mp4_profiles[key] = mtracks
+		while len(_main_mp4_profiles) > 4:
+			_main_mp4_profiles.popitem(last=False)
+	return odict((track_nb, copy.copy(mtrack))
+	             for track_nb, mtrack in mtracks.items())
 
 def mp4_find_sample_streams(self, tracks, main_mp4_file):
-	mtracks = profile_mp4(FileData(file_name=main_mp4_file),
-	                      calculate_crc32=False,
-	                      archived_file_name=self.archived_file_name)
+	mtracks = _profile_main_mp4(main_mp4_file, self.archived_file_name)
 
 	# check for each movie track if it contains the sample data
 	for mtrack in mtracks.values():
@@ -2656,16 +2968,13 @@ def wmv_find_sample_streams(self, tracks, main_wmv_file):
 							if (0 <
 							    len(track.check_bytes)
 							    < len(track.signature_bytes)):
-								lcb = min(len(track.signature_bytes),
-											payload.data_length +
-											len(track.check_bytes))
-								check_bytes = track.check_bytes
-								check_bytes += payload.data[:lcb -
-								                        len(track.check_bytes)]
+								check_bytes = extend_match(
+									track.signature_bytes,
+									track.check_bytes,
+									payload.data[:payload.data_length])
 
 								# track found!
-								if track.signature_bytes.startswith(
-								    check_bytes):
+								if check_bytes is not None:
 									track.check_bytes = check_bytes
 								else:
 									# It was only a partial match. Start over.
@@ -2680,31 +2989,21 @@ def wmv_find_sample_streams(self, tracks, main_wmv_file):
 						# but it does in MKV, so just in case...)
 						if not track.check_bytes:
 							payload_bytes = payload.data
-
-							search_byte = track.signature_bytes[0]
-							found_pos = payload_bytes.find(search_byte, 0)
-
-							while found_pos > -1:
-								lcb = min(len(track.signature_bytes),
-											len(payload_bytes) - found_pos)
-								check_bytes = payload_bytes[found_pos:
-								                          found_pos + lcb]
-
-								# track found!
-								if track.signature_bytes.startswith(
-								    check_bytes):
-									track.check_bytes = check_bytes
-									track.match_offset = (
-									    packet.data_file_offset +
-									    prev_payloads_size +
-									    payload.header_size +
-									    found_pos)
-									track.match_length = min(
-									    track.data_length,
-									    len(payload_bytes) - found_pos)
-									break
-								found_pos = payload_bytes.find(search_byte,
-								                             found_pos + 1)
+							found_pos = find_start(track.signature_bytes,
+							                       payload_bytes)
+
+							# track found!
+							if found_pos > -1:
+								track.check_bytes = payload_bytes[found_pos:
+								    found_pos + len(track.signature_bytes)]
+								track.match_offset = (
+								    packet.data_file_offset +
+								    prev_payloads_size +
+								    payload.header_size +
+								    found_pos)
+								track.match_length = min(
+								    track.data_length,
+								    len(payload_bytes) - found_pos)
 						else:
 							track.match_length = min(track.data_length
 							                         - track.match_length,
@@ -2803,16 +3102,16 @@ def mp3_find_sample_streams(self, tracks, main_mp3_file):
 def mp3_match_signature(track, block, mr):
 	boffset = 0
 	batchsize = 0x10000
+	finder = SignatureFinder(track.signature_bytes)
 
-	while boffset <= block.size:
+	while boffset < block.size:
 		size = min(block.size - boffset, batchsize)
-		data = mr.read_part(size, boffset)
-		found_offset = data.find(track.signature_bytes)
+		found_offset = finder.feed(mr.read_part(size, boffset))
 		if found_offset > -1:
-			track.match_offset = boffset + found_offset
+			track.match_offset = found_offset
 			track.match_length = min(track.data_length, block.size)
 			break
-		boffset += (batchsize - SIG_SIZE + 1)
+		boffset += size
 	return track
 
 def stream_find_sample_streams(self, tracks, main_file):
@@ -2826,24 +3125,20 @@ def stream_find_sample_streams(self, tracks, main_file):
 		ramount = 0x10000  # read each time 64KiB
 
 		# search for a match
+		finder = SignatureFinder(track.signature_bytes)
 		x = stream.read(ramount)
-		p = b""  # previous read
 		count = 0
 		while x:
 			show_spinner(count)
-			if p:
-				match = (p + x).find(track.signature_bytes, ramount - sig_size)
-			else:
-				match = x.find(track.signature_bytes)
+			match = finder.feed(x)
 
 			if match > -1:
 				track.check_bytes = track.signature_bytes
-				track.match_offset = stream.tell() - len(x) - len(p) + match
+				track.match_offset = match
 				track.match_length = sig_size
 				tracks[1] = track
 				break
 
-			p = x
 			x = stream.read(ramount)
 			count += 1
 		else:
@@ -2863,78 +3158,92 @@ def m2ts_find_sample_streams(self, tracks, main_m2ts_file):
 	source_packet_count = 0
 	done = False
 
-	while mr.read() and not done:
-		assert not mr.read_done
-		# spinner after each aligned unit
-		source_packet_count += 1
-		pskip = 64
-		if source_packet_count % pskip == 0:
-			show_spinner(source_packet_count // pskip)
+	# only the packets of streams with a signature need a closer look
+	window = mr.read_window()
+	while window and not done:
+		for pid in set(window.pids):
+			if pid not in tracks:
+				tracks[pid] = TrackData()
+				tracks[pid].track_number = pid
+		wanted = set(track_number for track_number, track in tracks.items()
+		             if track.signature_bytes)
+		for i in window.indices(wanted):
+			done = _m2ts_packet_find(tracks, tracks[window.pids[i]],
+			                         window.start_pos + i * PACKET_SIZE,
+			                         window.payload(i))
+			if done:
+				break
 
+		# spinner after each 64 packets
+		source_packet_count += window.count
+		show_spinner(source_packet_count // 64)
+		window = mr.read_window()
+
+	# an incomplete packet at the end of the file
+	while not done and mr.read():
 		packet = mr.current_packet
-		track_number = packet.pid
-		try:
-			track = tracks[track_number]
-		except KeyError:
-			tracks[track_number] = TrackData()
-			tracks[track_number].track_number = track_number
+		if packet.pid not in tracks:
+			tracks[packet.pid] = TrackData()
+			tracks[packet.pid].track_number = packet.pid
+		track = tracks[packet.pid]
+		if track.signature_bytes:
+			done = _m2ts_packet_find(tracks, track, packet.start_pos,
+			                         mr.read_contents())
+		mr.skip_contents()
+	remove_spinner()
 
-		# it's possible the sample didn't require
-		# or contain data for all tracks in the main file
-		# if that happens, we obviously don't want to try to match the data
-		# - a track we need to match -and-
-		#   - no location with match found yet -or-
-		#   - whole length of the signature not matched yet
-		if track.signature_bytes and (track.match_offset == 0 or
-			(len(track.check_bytes) < len(track.signature_bytes))):
-			# assume that the data always starts at the start of a packet
-			buff = mr.read_contents()
+	mr.close()
+	return tracks
 
-			# see if a false positive match was detected
-			if 0 < len(track.check_bytes) < len(track.signature_bytes):
-				check_bytes = (
-					track.check_bytes + buff)[:len(track.signature_bytes)]
+def _m2ts_packet_find(tracks, track, start_pos, buff):
+	"""Matches the payload of a packet of a stream with a signature.
+	Returns whether all tracks are located."""
+	# it's possible the sample didn't require
+	# or contain data for all tracks in the main file
+	# if that happens, we obviously don't want to try to match the data
+	# - a track we need to match -and-
+	#   - no location with match found yet -or-
+	#   - whole length of the signature not matched yet
+	if (track.match_offset == 0 or
+		(len(track.check_bytes) < len(track.signature_bytes))):
+		# assume that the data always starts at the start of a packet
 
-				if track.signature_bytes.startswith(check_bytes):
-					track.check_bytes = check_bytes
-				else:
-					# It was only a partial match: start over.
-					track.check_bytes = b""
-					track.match_offset = 0
-					track.match_length = 0
-					if _DEBUG:
-						print("Partial match detected")
-				# this is a bit weird, but if we had a false positive match going
-				# and discovered it above, we check this packet again
-				# to see if it's the start of a new match
-				# (behavior copied from mkv. also for m2ts?)
-
-			if not track.check_bytes:
-				if track.signature_bytes.startswith(buff):
-					track.check_bytes = buff
-					track.match_offset = packet.start_pos + 8
-					track.match_length = min(
-						track.data_length, packet.payload_size)
+		# see if a false positive match was detected
+		if 0 < len(track.check_bytes) < len(track.signature_bytes):
+			check_bytes = extend_match(track.signature_bytes,
+			                           track.check_bytes, buff)
+
+			if check_bytes is not None:
+				track.check_bytes = check_bytes
 			else:
-				track.match_length += min(packet.payload_size,
-					track.data_length - track.match_length)
-		elif track.match_length < track.data_length:
-			track.match_length += min(track.data_length - track.match_length,
-						  packet.payload_size)
-			if track.match_length >= track.data_length:
-				tracks_done = True
-				for track in tracks.values():
-					if track.match_length < track.data_length:
-						tracks_done = False
-						break
-				done = tracks_done
-			mr.skip_contents()
-		else:
-			mr.skip_contents()
-		assert mr.read_done
-	remove_spinner()
+				# It was only a partial match: start over.
+				track.check_bytes = b""
+				track.match_offset = 0
+				track.match_length = 0
+				if _DEBUG:
+					print("Partial match detected")
+			# this is a bit weird, but if we had a false positive match going
+			# and discovered it above, we check this packet again
+			# to see if it's the start of a new match
+			# (behavior copied from mkv. also for m2ts?)
 
-	return tracks
+		if not track.check_bytes:
+			if track.signature_bytes.startswith(buff):
+				track.check_bytes = buff
+				track.match_offset = start_pos + 8
+				track.match_length = min(track.data_length, len(buff))
+		else:
+			track.match_length += min(len(buff),
+				track.data_length - track.match_length)
+	elif track.match_length < track.data_length:
+		track.match_length += min(track.data_length - track.match_length,
+					  len(buff))
+		if track.match_length >= track.data_length:
+			for track in tracks.values():
+				if track.match_length < track.data_length:
+					return False
+			return True
+	return False
 
 def m2ts_extract_sample_streams(self, tracks, main_file):
 	start_offset = 2 ** 63  # long.MaxValue + 1
@@ -2952,46 +3261,66 @@ def m2ts_extract_sample_streams(self, tracks, main_file):
 	source_packet_count = 0
 	done = False
 
-	while mr.read() and not done:
+	window = mr.read_window()
+	while window and not done:
+		for pid in set(window.pids):
+			if pid not in tracks:
+				tracks[pid] = TrackData()
+				tracks[pid].track_number = pid
+		# streams that still need data
+		wanted = set(track_number for track_number, track in tracks.items()
+		             if track.track_file is None or
+		             track.track_file.tell() < track.data_length)
+		for i in window.indices(wanted):
+			track = tracks[window.pids[i]]
+			packet_start = window.start_pos + i * PACKET_SIZE
+			done = _m2ts_packet_extract(tracks, track, packet_start,
+			                            window.payload(i))
+			if done:
+				break
+
 		# spinner after each aligned unit
-		source_packet_count += 1
-		if source_packet_count % 32 == 0:
-			show_spinner(source_packet_count // 32)
+		source_packet_count += window.count
+		show_spinner(source_packet_count // 32)
+		window = mr.read_window()
 
+	# an incomplete packet at the end of the file
+	while not done and mr.read():
 		packet = mr.current_packet
-		track_number = packet.pid
-		if track_number not in tracks:
-			tracks[track_number] = TrackData()
-			tracks[track_number].track_number = track_number
-		track = tracks[track_number]
-
-		# test if located on a chunk with the required data
-		if (packet.start_pos + 192 > track.match_offset):
-			if track.track_file == None:
-				track.track_file = tempfile.TemporaryFile()
-
-			previously_read = track.track_file.tell()
-			if previously_read < track.data_length:
-				# read in data to temporary file track (whole packets)
-				track.track_file.write(packet.read_contents())
-
-			if previously_read + 192 >= track.data_length:
-				# check for tracks completion
-				tracks_done = True
-				for track_data in tracks.values():
-					if (track_data.track_file == None or
-					track_data.track_file.tell() < track_data.data_length):
-						tracks_done = False
-						break
-				done = tracks_done
-		else:
-			mr.skip_contents()
+		if packet.pid not in tracks:
+			tracks[packet.pid] = TrackData()
+			tracks[packet.pid].track_number = packet.pid
+		done = _m2ts_packet_extract(tracks, tracks[packet.pid],
+		                            packet.start_pos, mr.read_contents())
 
 	remove_spinner()
 
 	mr.close()
 	return tracks, {}  # attachments
 
+def _m2ts_packet_extract(tracks, track, packet_start, payload):
+	"""Writes the payload of a packet to the temporary file of its track.
+	Returns whether all tracks are complete."""
+	# test if located on a chunk with the required data
+	if packet_start + PACKET_SIZE <= track.match_offset:
+		return False
+	if track.track_file == None:
+		track.track_file = TrackBuffer()
+
+	previously_read = track.track_file.tell()
+	if previously_read < track.data_length:
+		# read in data to temporary file track (whole packets)
+		track.track_file.write(payload)
+
+	if previously_read + PACKET_SIZE >= track.data_length:
+		# check for tracks completion
+		for track_data in tracks.values():
+			if (track_data.track_file == None or
+			track_data.track_file.tell() < track_data.data_length):
+				return False
+		return True
+	return False
+
 def avi_extract_sample_streams(self, tracks, movie):
 	# search for first match offset (possibly skipping some parsing)
 	start_offset = 2 ** 63  # long.MaxValue + 1
@@ -3037,22 +3366,17 @@ def _avi_normal_chunk_extract(tracks, rr, block_count, done):
 		len(rr.current_chunk.raw_header) +
 		rr.current_chunk.length > track.match_offset):
 			if track.track_file == None:
-				track.track_file = tempfile.TemporaryFile()
-
-			if track.track_file.tell() < track.data_length:
-				# read in data to temporary file track
-				if (rr.current_chunk.chunk_start_pos +
-				len(rr.current_chunk.raw_header) >= track.match_offset):
-					# read contents starting from the beginning of the chunk
-					track.track_file.write(
-					    rr.read_contents()[:rr.current_chunk.length])
-				else:
-					# read contents starting from offset in the chunk
-					chunk_offset = (track.match_offset -
-					                (rr.current_chunk.chunk_start_pos +
-					                len(rr.current_chunk.raw_header)))
-					track.track_file.write(rr.read_contents()[chunk_offset:
-					                       rr.current_chunk.length])
+				track.track_file = TrackBuffer()
+
+			if (rr.current_chunk.chunk_start_pos +
+			len(rr.current_chunk.raw_header) >= track.match_offset):
+				# read contents starting from the beginning of the chunk
+				_avi_chunk_extract(rr, track)
+			else:
+				# read contents starting from offset in the chunk
+				_avi_chunk_extract(rr, track, track.match_offset -
+				                   (rr.current_chunk.chunk_start_pos +
+				                   len(rr.current_chunk.raw_header)))
 
 			# check for tracks completion
 			tracks_done = True
@@ -3068,6 +3392,15 @@ def _avi_normal_chunk_extract(tracks, rr, block_count, done):
 
 	return tracks, block_count, done
 
+def _avi_chunk_extract(rr, track, chunk_offset=0, data=None):
+	"""Writes the contents of the current chunk from chunk_offset on
+	to the track file. data: the contents when they are already read"""
+	if track.track_file.tell() < track.data_length:
+		if data is None:
+			data = rr.read_contents()
+		# read in data to temporary file track
+		track.track_file.write(data[chunk_offset:rr.current_chunk.length])
+
 def mkv_extract_sample_streams(self, tracks, movie):
 	er = EbmlReader(EbmlReadMode.MKV, movie,
 		archived_file_name=self.archived_file_name)
@@ -3140,20 +3473,9 @@ def mkv_extract_sample_streams(self, tracks, movie):
 			if header_stripping:
 				tracks_main[current_track_nb].compression_settings = elm_content
 		elif er.element_type == EbmlElementType.AttachedFileName:
-			current_attachment = er.read_contents()
-			if current_attachment not in attachments:
-				att = AttachmentData(current_attachment)
-				attachments[current_attachment] = att
+			current_attachment = _mkv_attachment_name(er, attachments)
 		elif er.element_type == EbmlElementType.AttachedFileData:
-			attachment = attachments[current_attachment]
-			attachment.size = er.current_element.length
-
-			# in extract mode,
-			# extract all attachments in case we need them later
-			if attachment.attachment_file == None:
-				attachment.attachment_file = tempfile.TemporaryFile()
-				attachment.attachment_file.write(er.read_contents())
-				attachment.attachment_file.seek(0)
+			_mkv_attachment_extract(er, attachments[current_attachment])
 		else:
 			er.skip_contents()
 
@@ -3162,6 +3484,25 @@ def mkv_extract_sample_streams(self, tracks, movie):
 	er.close()
 	return tracks, attachments
 
+def _mkv_attachment_name(er, attachments):
+	current_attachment = er.read_contents()
+	if current_attachment not in attachments:
+		att = AttachmentData(current_attachment)
+		attachments[current_attachment] = att
+	return current_attachment
+
+def _mkv_attachment_extract(er, attachment):
+	attachment.size = er.current_element.length
+
+	# in extract mode,
+	# extract all attachments in case we need them later
+	if attachment.attachment_file == None:
+		attachment.attachment_file = TrackBuffer()
+		attachment.attachment_file.write(er.read_contents())
+		attachment.attachment_file.seek(0)
+	else:
+		er.skip_contents()
+
 def _mkv_block_extract(tracks, tracks_main, er, done):
 	# grab the current track for main mkv and .srs meta data
 	try:
@@ -3173,49 +3514,20 @@ def _mkv_block_extract(tracks, tracks_main, er, done):
 		return done
 	track_main = tracks_main[er.current_element.track_number]
 
-	# grab compression settings
-	sforsample = b""  # settings for the sample tracks
-	sformain = b""  # settings for main tracks
-	if track.compression_settings:
-		sformain = track.compression_settings
-	if track_main.compression_settings:
-		sforsample = track_main.compression_settings
-	header_stripping_both_files = sformain and sforsample
-
 	if (er.current_element.element_start_pos +
 		len(er.current_element.raw_header) +
 		len(er.current_element.raw_block_header) +
 		er.current_element.length > track.match_offset):
 		if track.track_file == None:
-			track.track_file = tempfile.TemporaryFile()
+			track.track_file = TrackBuffer()
 		buff = er.read_contents()
 		offset = 0
 		for i in range(len(er.current_element.frame_lengths)):
 			if (er.current_element.element_start_pos +
 			len(er.current_element.raw_header) +
 			len(er.current_element.raw_block_header) +
-			offset >= track.match_offset and
-			track.track_file.tell() < track.data_length):
-				if header_stripping_both_files:
-					if sforsample == sformain:
-						# no removed header to be added
-						track.track_file.write(buff[offset:offset + 
-							er.current_element.frame_lengths[i]])
-					elif len(sforsample) < len(sformain):
-						# more stripped in sample
-						cut = len(sformain) - len(sforsample) 
-						track.track_file.write(buff[offset + cut:offset + 
-							er.current_element.frame_lengths[i]])
-					elif len(sforsample) > len(sformain):
-						# more stripped in main (weird, but possible in theory)
-						add = len(sforsample) - len(sformain)
-						track.track_file.write(sforsample[-add:])
-						track.track_file.write(buff[offset:offset + 
-							er.current_element.frame_lengths[i]])
-				else:
-					track.track_file.write(sforsample)
-					track.track_file.write(buff[offset + len(sformain):offset +
-					   er.current_element.frame_lengths[i]])
+			offset >= track.match_offset):
+				_mkv_frame_extract(er, buff, offset, i, track, track_main)
 			offset += er.current_element.frame_lengths[i]
 
 		tracks_done = True
@@ -3230,14 +3542,58 @@ def _mkv_block_extract(tracks, tracks_main, er, done):
 
 	return done
 
-def mp4_extract_sample_streams(self, tracks, main_mp4_file):
-	mtracks = profile_mp4(FileData(file_name=main_mp4_file),
-	                      calculate_crc32=False,
-	                      archived_file_name=self.archived_file_name)
+def _mkv_frame_extract(er, buff, offset, i, track, track_main):
+	"""Writes frame i of the current block, starting at offset in the
+	block contents buff, to the track file."""
+	if track.track_file.tell() >= track.data_length:
+		return
 
-	for track_nb, track in tracks.items():
-		mtrack = mtracks[track_nb]
-		track = mp4_extract_sample_stream(track, mtrack, main_mp4_file)
+	# grab compression settings
+	sforsample = b""  # settings for the sample tracks
+	sformain = b""  # settings for main tracks
+	if track.compression_settings:
+		sformain = track.compression_settings
+	if track_main.compression_settings:
+		sforsample = track_main.compression_settings
+	header_stripping_both_files = sformain and sforsample
+
+	frame_end = offset + er.current_element.frame_lengths[i]
+	if header_stripping_both_files:
+		if sforsample == sformain:
+			# no removed header to be added
+			track.track_file.write(buff[offset:frame_end])
+		elif len(sforsample) < len(sformain):
+			# more stripped in sample
+			cut = len(sformain) - len(sforsample)
+			track.track_file.write(buff[offset + cut:frame_end])
+		elif len(sforsample) > len(sformain):
+			# more stripped in main (weird, but possible in theory)
+			add = len(sforsample) - len(sformain)
+			track.track_file.write(sforsample[-add:])
+			track.track_file.write(buff[offset:frame_end])
+	else:
+		track.track_file.write(sforsample)
+		track.track_file.write(buff[offset + len(sformain):frame_end])
+
+def mp4_extract_sample_streams(self, tracks, main_mp4_file):
+	mtracks = _profile_main_mp4(main_mp4_file, self.archived_file_name)
+
+	# the tracks are independent: each one reads with its own file handle
+	def extract(track_nb):
+		return mp4_extract_sample_stream(tracks[track_nb], mtracks[track_nb],
+		                                 main_mp4_file)
+	track_numbers = list(tracks.keys())
+	jobs = min(MP4_EXTRACT_THREADS, len(track_numbers))
+	if jobs > 1:
+		pool = ThreadPool(jobs)
+		try:
+			extracted = pool.map(extract, track_numbers)
+		finally:
+			pool.close()
+			pool.join()
+	else:
+		extracted = [extract(track_nb) for track_nb in track_numbers]
+	for track_nb, track in zip(track_numbers, extracted):
 		tracks[track_nb] = track
 
 	return tracks, {}  # attachments
@@ -3250,14 +3606,14 @@ def open_main(big_file):
 
 def mp4_extract_sample_stream(track, mtrack, main_mp4_file):
 	"""Can throw InvalidMatchOffset"""
-	track.track_file = tempfile.TemporaryFile()
+	track.track_file = TrackBuffer()
 	mtrack = mp4_add_track_stream(mtrack)
 	mtrack.trackstream.stream = open_main(main_mp4_file)
-
-	mtrack.trackstream.seek(track.match_offset)
-	track.track_file.write(mtrack.trackstream.read(track.data_length))
-
-	mtrack.trackstream.stream.close()
+	try:
+		mtrack.trackstream.seek(track.match_offset)
+		mtrack.trackstream.copy_to(track.track_file, track.data_length)
+	finally:
+		mtrack.trackstream.stream.close()
 	return track
 
 def wmv_extract_sample_streams(self, tracks, main_wmv_file):
@@ -3312,7 +3668,7 @@ def wmv_extract_sample_streams(self, tracks, main_wmv_file):
 						+ payload.header_size
 						+ payload.data_length >= track.match_offset):
 						if track.track_file == None:
-							track.track_file = tempfile.TemporaryFile()
+							track.track_file = TrackBuffer()
 
 						# check if we grabbed enough data
 						if track.track_file.tell() < track.data_length:
@@ -3357,7 +3713,7 @@ def flac_extract_sample_streams(self, tracks, main_flac_file):
 	while fr.read():
 		if fr.current_block.is_frame_data():
 			track = tracks[1]
-			track.track_file = tempfile.TemporaryFile()
+			track.track_file = TrackBuffer()
 			track.track_file.write(fr.read_contents())
 			tracks[1] = track
 		fr.skip_contents()
@@ -3370,7 +3726,7 @@ def mp3_extract_sample_streams(self, tracks, main_mp3_file):
 	for block in mr.read():
 		if block.type in ("MP3", "fLaC"):
 			track = tracks[1]
-			track.track_file = tempfile.TemporaryFile()
+			track.track_file = TrackBuffer()
 			# offset is always zero for now (no sample support)
 			# (start offset must match in mp3_find_sample_streams)
 			offset = track.match_offset - block.start_pos
@@ -3390,7 +3746,7 @@ def stream_extract_sample_streams(self, tracks, main_file):
 
 	try:
 		track = tracks[1]
-		track.track_file = tempfile.TemporaryFile()
+		track.track_file = TrackBuffer()
 		stream.seek(track.match_offset)
 		assert stream.read(len(track.signature_bytes)) == track.signature_bytes
 		stream.seek(track.match_offset)
@@ -3430,7 +3786,7 @@ def avi_rebuild_sample(self, srs_data, tracks, attachments, srs, out_file):
 						show_spinner(block_count)
 
 					track = tracks[rr.current_chunk.stream_number]
-					buff = track.track_file.read(rr.current_chunk.length)
+					buff = track.track_file.view(rr.current_chunk.length)
 					sample.write(buff)
 					crc = crc32(buff, crc) & 0xFFFFFFFF
 					rr.skip_contents()
@@ -3467,6 +3823,151 @@ def reset_file_positions(tracks):
 		#   System.NullReferenceException
 		# 18XGirls.12.08.29.Christel.And.Laura.XXX.INTERNAL.1080p.WMV-KTR
 
+def discard_track_file(track):
+	if track.track_file:
+		track.track_file.close()
+	track.track_file = None
+
+def discard_track_files(tracks):
+	for track in tracks.values():
+		discard_track_file(track)
+
+def find_extract_single_pass(self, find_function, tracks, movie):
+	"""Copies the track data while the find function searches the main
+	file. The data of a track is dropped again when its match turns out
+	to be a false positive. When a track ends up incomplete, all data is
+	dropped and (tracks, None) is returned: extract the normal way."""
+	if self.cut_data:  # all other possible offsets must be collected first
+		return find_function(self, tracks, movie), None
+
+	attachments = {}
+	tracks = find_function(self, tracks, movie, attachments)
+	if not _single_pass_complete(tracks):
+		for attachment in attachments.values():
+			if attachment.attachment_file:
+				attachment.attachment_file.close()
+		return tracks, None
+	return tracks, attachments
+
+def _single_pass_complete(tracks):
+	"""Checks the track data copied during the search. Drops it when
+	a track is incomplete."""
+	if any(track.signature_bytes and (track.track_file is None or
+	       track.track_file.tell() < track.data_length)
+	       for track in tracks.values()):
+		logger.info("Track data incomplete after the search: "
+		            "extracting it separately.")
+		discard_track_files(tracks)
+		return False
+
+	for track in tracks.values():
+		if track.track_file is None:  # the extract functions create them all
+			track.track_file = TrackBuffer()
+	return True
+
+class SharedContents(object):
+	"""Lets the find functions of several samples look at the current
+	element or chunk of the same reader. The contents are read at most
+	once; finish() skips them when no sample needed them."""
+	def __init__(self, reader):
+		self._reader = reader
+		self._contents = None
+
+	def __getattr__(self, name):
+		return getattr(self._reader, name)
+
+	def read_contents(self):
+		if self._contents is None:
+			self._contents = self._reader.read_contents()
+		return self._contents
+
+	def skip_contents(self):
+		pass
+
+	def finish(self):
+		if self._contents is None:
+			self._reader.skip_contents()
+
+def find_extract_batch(jobs, main_file):
+	"""Locates and extracts the tracks of several samples cut from the
+	same main file. An AVI or MKV main file is read only once for all of
+	them together. The other formats and samples with x265 cut data are
+	handled one by one.
+	jobs: [(ReSample object of the main file, tracks of the SRS file)]
+	Returns [(tracks, attachments)] like find_extract_sample_streams()."""
+	results = [None] * len(jobs)
+	shared = []
+	for i, (movi, tracks) in enumerate(jobs):
+		if movi.file_type in (FileType.AVI, FileType.MKV) and not movi.cut_data:
+			shared.append(i)
+		else:
+			results[i] = movi.find_extract_sample_streams(tracks, main_file)
+	if not shared:
+		return results
+
+	shared_jobs = [jobs[i] for i in shared]
+	if jobs[shared[0]][0].file_type == FileType.AVI:
+		attachments = {}
+		_avi_find_shared(shared_jobs, main_file)
+	else:
+		attachments = _mkv_find_shared(shared_jobs, main_file)
+	for i, (_movi, tracks) in zip(shared, shared_jobs):
+		if _single_pass_complete(tracks):
+			results[i] = (tracks, attachments)
+		else:
+			results[i] = (tracks, None)
+	if all(results[i][1] is None for i in shared):
+		for attachment in attachments.values():
+			if attachment.attachment_file:
+				attachment.attachment_file.close()
+	return results
+
+def _avi_find_shared(jobs, main_avi_file):
+	rr = RiffReader(RiffReadMode.AVI, main_avi_file,
+		archived_file_name=jobs[0][0].archived_file_name)
+	block_count = 0
+	done = [False] * len(jobs)
+
+	while rr.read() and not all(done):
+		if rr.chunk_type == RiffChunkType.List:
+			rr.move_to_child()
+		else:  # normal chunk
+			contents = SharedContents(rr)
+			count = block_count
+			for i, (_movi, tracks) in enumerate(jobs):
+				if not done[i]:
+					_tracks, count, done[i] = _avi_normal_chunk_find(
+						tracks, contents, block_count, done[i], True)
+			block_count = count
+			contents.finish()
+	remove_spinner()
+
+	rr.close()
+
+def _mkv_find_shared(jobs, main_mkv_file):
+	"""Returns the attachments the samples share."""
+	er = EbmlReader(EbmlReadMode.MKV, main_mkv_file,
+		archived_file_name=jobs[0][0].archived_file_name)
+	tracks_main = {}  # contains TrackData objects; main mkv info
+	attachments = {}
+	done = [False] * len(jobs)
+
+	def block_find(er, _done):
+		contents = SharedContents(er)
+		for i, (movi, tracks) in enumerate(jobs):
+			if not done[i]:
+				done[i] = _mkv_block_find(movi, tracks, contents, False,
+				                          tracks_main, True)
+		contents.finish()
+		return all(done)
+
+	_mkv_find_walk(None, {}, er, tracks_main, attachments=attachments,
+	               block_find=block_find)
+	remove_spinner()
+
+	er.close()
+	return attachments
+
 def mkv_rebuild_sample(self, srs_data, tracks, attachments, srs, out_file):
 	crc = 0  # Crc32.StartValue
 	er = EbmlReader(EbmlReadMode.SRS, path=srs)
@@ -3506,7 +4007,8 @@ def mkv_rebuild_sample(self, srs_data, tracks, attachments, srs, out_file):
 			elif er.element_type == EbmlElementType.AttachedFileData:
 				attachment = attachments[current_attachment]
 				# restore data from extracted attachments
-				buff = attachment.attachment_file.read()
+				attachment.attachment_file.seek(0)
+				buff = attachment.attachment_file.view()
 				sample.write(buff)
 				crc = crc32(buff, crc) & 0xFFFFFFFF
 				if srs_data.flags & FileData.ATTACHMENTS_REMOVED != 0:
@@ -3516,7 +4018,7 @@ def mkv_rebuild_sample(self, srs_data, tracks, attachments, srs, out_file):
 			elif er.element_type == EbmlElementType.Block:
 				track = tracks[er.current_element.track_number]
 				# restore data from extracted tracks
-				buff = track.track_file.read(er.current_element.length)
+				buff = track.track_file.view(er.current_element.length)
 				rbh = er.current_element.raw_block_header
 				sample.write(rbh)
 				crc = crc32(rbh, crc) & 0xFFFFFFFF
@@ -3563,7 +4065,7 @@ def mp4_rebuild_sample(self, srs_data, tracks, attachments, srs, out_file):
 				# order the interleaved chunks
 				for (chunk, track_nb) in order_chunks(tracks):
 					track = tracks[track_nb]
-					buff = track.track_file.read(sum(chunk.samples))
+					buff = track.track_file.view(sum(chunk.samples))
 					# write all the stream data
 					sample.write(buff)
 					crc = crc32(buff, crc) & 0xFFFFFFFF
@@ -3724,7 +4226,7 @@ def wmv_rebuild_sample(self, srs_data, tracks, attachments, srs, out_file):
 						assert payload.header_size == len(payload.header_data)
 
 						# 2) payload data
-						buff = track.track_file.read(payload.data_length)
+						buff = track.track_file.view(payload.data_length)
 						sample.write(buff)
 						crc = crc32(buff, crc) & 0xFFFFFFFF
 
@@ -3781,9 +4283,9 @@ def flac_rebuild_sample(self, srs_data, tracks, attachments, srs, out_file):
 				flac.write(data)
 				if fr.current_block.is_last_block():
 					track = tracks[1]
-					crc = crc32(track.track_file.read(), crc)
-					track.track_file.seek(0)
-					flac.write(track.track_file.read())
+					data = track.track_file.view()
+					crc = crc32(data, crc)
+					flac.write(data)
 
 			assert fr.read_done
 	fr.close()
@@ -3807,9 +4309,9 @@ def mp3_rebuild_sample(self, srs_data, tracks, attachments, srs, out_file):
 				if not main_data_written:
 					# we are on an SRS block and no sound data is written yet
 					track = tracks[1]
-					crc = crc32(track.track_file.read(), crc)
-					track.track_file.seek(0)
-					mp3.write(track.track_file.read())
+					data = track.track_file.view()
+					crc = crc32(data, crc)
+					mp3.write(data)
 					main_data_written = True
 			else:
 				data = mr.read_contents()
@@ -3826,7 +4328,7 @@ def stream_rebuild_sample(self, srs_data, tracks, attachments, srs, out_file):
 	with open(out_file, "wb") as stream:
 		track = tracks[1]
 		track.track_file.seek(0)
-		data = track.track_file.read()
+		data = track.track_file.view()
 		crc = crc32(data, crc)
 		stream.write(data)
 
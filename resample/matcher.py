@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2026 pyReScene
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+"""Searching the signature of a sample track in the main file.
+
+The container data of a main file arrives one chunk, block or packet at
+a time. A signature can start anywhere in it and continue in the next
+pieces. The matched part so far is kept in the check_bytes of a track.
+
+The search itself is done by bytes.find() in C. Only the last
+len(signature) - 1 positions of a piece, where the signature can't be
+complete, are compared one by one."""
+
+def find_start(signature, data):
+	"""Returns the first offset in data where the signature starts:
+	the whole signature is there, or data ends with a first part of it.
+	Returns -1 when the signature does not start in data."""
+	found = data.find(signature)
+	if found > -1:
+		return found
+
+	# a match can only be cut off in the last len(signature) - 1 bytes
+	first = signature[0:1]
+	found = data.find(first, max(0, len(data) - len(signature) + 1))
+	while found > -1:
+		if signature.startswith(data[found:]):
+			return found
+		found = data.find(first, found + 1)
+	return -1
+
+def extend_match(signature, check_bytes, data):
+	"""Continues a partial match with the data that follows it.
+	Returns the new check_bytes (at most the length of the signature)
+	or None when the data does not continue the signature."""
+	check_bytes = check_bytes + data[:len(signature) - len(check_bytes)]
+	if signature.startswith(check_bytes):
+		return check_bytes
+	return None
+
+class SignatureFinder(object):
+	"""Finds the first complete occurrence of a signature in a stream
+	that is fed in consecutive pieces. Only the last len(signature) - 1
+	bytes are kept between pieces; the pieces are never concatenated."""
+	def __init__(self, signature, position=0):
+		self.signature = signature
+		self.position = position  # stream offset of the next piece
+		self._tail = b""
+
+	def feed(self, data):
+		"""Returns the stream offset of the signature or -1."""
+		keep = len(self.signature) - 1
+		if self._tail:
+			boundary = self._tail + data[:keep]
+			found = boundary.find(self.signature)
+			if found > -1:
+				return self.position - len(self._tail) + found
+		found = data.find(self.signature)
+		if found > -1:
+			return self.position + found
+
+		if keep <= 0:
+			self._tail = b""
+		elif len(data) >= keep:
+			self._tail = bytes(data[-keep:])
+		else:
+			self._tail = (self._tail + data)[-keep:]
+		self.position += len(data)
+		return -1
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2026 pyReScene
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+"""Read-ahead for the sequential reading of samples.
+
+PrefetchReader is a read-only file object. A background thread reads the
+next blocks of the file while the caller parses and hashes the current
+one. The container readers accept it as their stream argument:
+
+	rr = RiffReader(RiffReadMode.Sample, stream=PrefetchReader(path))
+
+Seeking within or just ahead of the fetched blocks costs nothing. Any
+other seek makes the thread start over at the new position."""
+
+import os
+import threading
+
+try:
+	import queue
+except ImportError:  # Python 2
+	import Queue as queue
+
+from rescene.utility import is_rar
+from rescene.rarstream import RarStream
+
+BLOCK_SIZE = 4 * 1024 * 1024
+DEPTH = 4  # number of blocks read ahead
+
+class PrefetchReader(object):
+	def __init__(self, path=None, stream=None, archived_file_name="",
+	             block_size=BLOCK_SIZE, depth=DEPTH):
+		assert path or stream
+		if path:
+			if is_rar(path):
+				self._stream = RarStream(path, archived_file_name)
+			else:
+				self._stream = open(path, 'rb')
+		else:
+			self._stream = stream
+		self._stream.seek(0, os.SEEK_END)
+		self._size = self._stream.tell()
+		self._block_size = block_size
+		self._depth = depth
+
+		self._pos = 0
+		self._block = b""
+		self._block_start = 0
+		self._next_start = 0  # file offset of the next block in the queue
+		self._queue = None
+		self._stop = None
+		self._thread = None
+		self.closed = False
+
+	def read(self, size=-1):
+		if size is None or size < 0:
+			size = self._size - self._pos
+		pieces = []
+		while size > 0 and self._pos < self._size:
+			offset = self._pos - self._block_start
+			if 0 <= offset < len(self._block):
+				piece = self._block[offset:offset + size]
+				pieces.append(piece)
+				self._pos += len(piece)
+				size -= len(piece)
+			elif not self._next_block():
+				break  # the file got shorter
+		return b"".join(pieces)
+
+	def seek(self, offset, whence=os.SEEK_SET):
+		if whence == os.SEEK_CUR:
+			offset += self._pos
+		elif whence == os.SEEK_END:
+			offset += self._size
+		if offset < 0:
+			raise IOError("Negative seek position %d." % offset)
+		self._pos = offset
+		return self._pos
+
+	def tell(self):
+		return self._pos
+
+	def close(self):
+		self._stop_thread()
+		self._stream.close()
+		self._block = b""
+		self.closed = True
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+	def _next_block(self):
+		"""Takes the block with the current position from the queue.
+		Returns False at the end of the file."""
+		if (self._thread is None or self._pos < self._next_start or
+		    self._pos >= self._next_start + self._block_size * self._depth):
+			# not in the blocks that are being fetched: start over
+			self._start_thread(self._pos)
+		while True:
+			block = self._queue.get()
+			if isinstance(block, Exception):
+				self._thread.join()
+				self._thread = None
+				raise block
+			if not block:
+				return False
+			self._block = block
+			self._block_start = self._next_start
+			self._next_start += len(block)
+			if self._pos < self._next_start:
+				return True
+
+	def _start_thread(self, position):
+		self._stop_thread()
+		self._block = b""
+		self._block_start = self._next_start = position
+		self._queue = queue.Queue(self._depth)
+		self._stop = threading.Event()
+		self._thread = threading.Thread(target=self._fetch,
+			args=(position, self._queue, self._stop))
+		self._thread.daemon = True
+		self._thread.start()
+
+	def _stop_thread(self):
+		if self._thread is None:
+			return
+		self._stop.set()
+		# a full queue blocks the thread
+		try:
+			while True:
+				self._queue.get_nowait()
+		except queue.Empty:
+			pass
+		self._thread.join()
+		self._thread = None
+
+	def _fetch(self, position, blocks, stop):
+		"""Runs on the background thread: the only one using the stream
+		while it is alive."""
+		try:
+			self._stream.seek(position)
+			block = True
+			while block and not stop.is_set():
+				block = self._stream.read(self._block_size)
+				while not stop.is_set():
+					try:
+						blocks.put(block, timeout=0.1)
+						break
+					except queue.Full:
+						pass
+		except Exception as err:
+			blocks.put(err)
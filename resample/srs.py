@@ -33,12 +33,13 @@ import time
 import traceback
 
 import resample
-from resample import file_type_info, fpcalc
+from resample import file_type_info, fpcalc, trackbuffer
 from resample.main import InvalidMatchOffset, InvalidPathValue
 from rescene.utility import FileType
 from rescene.utility import sep, is_rar
 from rescene.utility import raw_input, unicode
 from rescene.utility import create_temp_file_name, replace_result
+from rescene import hashcache
 
 _DEBUG = bool(os.environ.get("RESCENE_DEBUG"))  # leave empty for False
 
@@ -65,7 +66,10 @@ def setup_cli_parser():
 	"To recreate a sample, pass in the SRS file and the full movie file\n"
 	"or the first file of a RAR set containing the full movie.\n"
 	"	ex: srs sample.srs full.mkv\n"
-	"	or: srs sample.srs full.rar\n"),
+	"	or: srs sample.srs full.rar\n"
+	"To recreate several samples of the same main file at once,\n"
+	"pass in all SRS files before the main file.\n"
+	"	ex: srs sample.srs extras.srs full.mkv\n"),
 	version="%prog " + resample.__version__)  # --help, --version
 
 	creation = optparse.OptionGroup(parser, "Creation options")
@@ -117,9 +121,28 @@ def setup_cli_parser():
 				action="store_true", default=False,
 				help="Keep samples that reconstructed, but failed CRC check. "
 				"Not applicable for music to prevent data loss.")
+	output.add_option("--memory", dest="memory_budget", type="int",
+				metavar="MB", default=None,
+				help="Keep at most this many MB of extracted track data in "
+				"memory before it goes to temporary files (default: %d)."
+				% (trackbuffer.MEMORY_BUDGET // (1024 * 1024)))
+	output.add_option("--scratch", dest="scratch_dir", metavar="DIRECTORY",
+				help="Directory for the temporary files of extracted tracks "
+				"that don't fit in memory.")
+	output.add_option("--no-cache", dest="no_cache",
+				action="store_true", default=False,
+				help="Do not use or update the cache of file hashes in %s."
+				% hashcache.cache_dir())
 
 	return parser
 
+def not_located(track, file_type):
+	"""Whether the search in the main file did not find the track."""
+	if file_type in (FileType.MP3, FileType.STREAM):
+		# 0 is a legal match offset for MP3 and STREAM
+		return track.match_offset == -1
+	return bool(track.signature_bytes) and track.match_offset == 0
+
 def verify_main(sample, tracks, options, pexit):
 	main_file_info = file_type_info(options.check)
 	if main_file_info.file_type != sample.file_type:
@@ -140,11 +163,7 @@ def verify_main(sample, tracks, options, pexit):
 	tracks = sample.find_sample_streams(tracks, options.check)
 
 	for track in list(tracks.values()):
-		if ((track.signature_bytes and track.match_offset == 0 and
-				sample.file_type not in (FileType.MP3, FileType.STREAM)) or
-			(track.match_offset == -1 and
-				sample.file_type in (FileType.MP3, FileType.STREAM))):
-			# 0 is a legal match offset for MP3 and STREAM
+		if not_located(track, sample.file_type):
 			msg = ("\nUnable to locate track signature for"
 			       " track %s. Aborting.\n" % track.track_number)
 			pexit(3, msg, False)
@@ -154,6 +173,146 @@ def verify_main(sample, tracks, options, pexit):
 	print("Check Complete. All tracks located.")
 	return tracks
 
+def single_argv(srs, movie, options):
+	"""Arguments to reconstruct one sample with the batch options."""
+	argv = [srs, movie]
+	if options.output_dir:
+		argv.extend(["-o", options.output_dir])
+	if options.always_yes:
+		argv.append("-y")
+	if options.no_stored_match_offset:
+		argv.append("-m")
+	if options.keep_reconstruction_failure:
+		argv.append("-k")
+	if options.memory_budget is not None:
+		argv.extend(["--memory", str(options.memory_budget)])
+	if options.scratch_dir:
+		argv.extend(["--scratch", options.scratch_dir])
+	return argv
+
+def reconstruct_batch(srs_files, movie, options):
+	"""Recreates the samples of several SRS files from the same main file.
+	The samples that must be located are searched for together: an AVI or
+	MKV main file is read only once for all of them.
+	Returns the names of the samples that failed."""
+	t0 = time.time()
+	main_file_info = file_type_info(movie)
+	movie_type = main_file_info.file_type
+	if movie_type == FileType.Unknown:
+		movie_type = FileType.STREAM
+
+	out_folder = options.output_dir or "."
+	if not os.path.exists(out_folder):
+		os.makedirs(out_folder)
+
+	jobs = []
+	failed = []
+	for srs in srs_files:
+		sample = resample.sample_class_factory(file_type_info(srs).file_type)
+		if sample.file_type in (FileType.FLAC, FileType.MP3):
+			# music has its own rules for replacing the main file
+			try:
+				main(single_argv(srs, movie, options), no_exit=True)
+			except ValueError:
+				failed.append(os.path.basename(srs))
+			continue
+
+		v = Variables()
+		v.srs = srs
+		v.sample = sample
+		v.srs_data, v.tracks = sample.load_srs(srs)
+		if len(sample.cut_data):
+			# can need several attempts with other offsets
+			try:
+				main(single_argv(srs, movie, options), no_exit=True)
+			except ValueError:
+				failed.append(v.srs_data.name)
+			continue
+		v.movi = resample.sample_class_factory(movie_type)
+		v.movi.archived_file_name = main_file_info.archived_file
+		v.movi.first_timecode = sample.first_timecode
+		v.attachments = None
+		v.shared = False  # attachments of the batch search
+		jobs.append(v)
+
+	# 1) Find the sample streams of all samples together
+	locate = [v for v in jobs if options.no_stored_match_offset or
+	          any(t.match_offset == 0 for t in v.tracks.values())]
+	if locate:
+		results = resample.find_extract_batch(
+			[(v.movi, v.tracks) for v in locate], movie)
+		for v, (tracks, attachments) in zip(locate, results):
+			v.tracks = tracks
+			v.attachments = attachments
+			v.shared = attachments is not None
+		print("Track Location Complete...    "
+		      "Elapsed Time: {0:.2f}s".format(time.time() - t0))
+
+	try:
+		for v in jobs:
+			name = v.srs_data.name
+			if v.attachments is None:
+				if v in locate and any(not_located(t, v.sample.file_type)
+				                       for t in v.tracks.values()):
+					print("Unable to locate the track signatures of %s."
+					      % name)
+					failed.append(name)
+					continue
+				# 2) Extract the sample streams one sample at a time
+				v.tracks, v.attachments = v.movi.extract_sample_streams(
+					v.tracks, movie)
+
+			try:
+				# 3) Check for failure
+				if any(t.signature_bytes and (t.track_file == None or
+				       t.track_file.tell() < t.data_length)
+				       for t in v.tracks.values()):
+					print("Unable to extract the correct amount of data "
+					      "for %s." % name)
+					failed.append(name)
+					continue
+
+				result_file = os.path.join(out_folder, name)
+				if not can_overwrite(result_file, options.always_yes):
+					print("Skipped: %s" % name)
+					continue
+
+				# 4) Recreate the sample
+				out_file = create_temp_file_name(result_file)
+				sfile = v.sample.rebuild_sample(v.srs_data, v.tracks,
+				                                v.attachments, v.srs, out_file)
+			finally:
+				# 5) Close and delete the temporary files
+				for track in v.tracks.values():
+					if track.track_file:
+						track.track_file.close()
+				# the attachments of the batch search are shared by
+				# all samples: they are closed after the last one
+				if not v.shared:
+					for attachment in v.attachments.values():
+						attachment.attachment_file.close()
+
+			if sfile.crc32 == v.srs_data.crc32:
+				replace_result(out_file, result_file)
+				print("Successfully rebuilt sample: %s" % name)
+			else:
+				replace_result(out_file, result_file)
+				if not options.keep_reconstruction_failure:
+					os.unlink(result_file)
+				print("Rebuild failed for sample: %s" % name)
+				failed.append(name)
+	finally:
+		shared = dict((id(v.attachments), v.attachments) for v in jobs
+		              if v.shared)
+		for attachments in shared.values():
+			for attachment in attachments.values():
+				if attachment.attachment_file:
+					attachment.attachment_file.close()
+
+	print("Batch Complete...             "
+	      "Elapsed Time: {0:.2f}s".format(time.time() - t0))
+	return failed
+
 def find_best_educated_guesses(tracks, cut_data):
 	"""cut_data: dict(track_number, [other, possible, offsets])
 	Suggests the best matches in track.olist. These are the offsets close to
@@ -192,6 +351,13 @@ def find_best_educated_guesses(tracks, cut_data):
 		if not len(tracks[track_id].olist):
 			tracks[track_id].olist.append(tracks[track_id].match_offset)
 
+def remember_crc32(path, crc):
+	"""Stores the CRC32 calculated while profiling or rebuilding a sample
+	in the hash cache, so the sample isn't read again to verify it."""
+	cache = hashcache.active()
+	if cache is not None:
+		cache.store(os.stat(path), crc)
+
 def main(argv=None, no_exit=False):
 	"""
 	no_exit: used when this function is called from an other Python program
@@ -225,6 +391,18 @@ def main(argv=None, no_exit=False):
 		(options.parent_directory and options.srs_parent_directory)):
 		pexit(1, "Make up your mind with the d's...\n")
 
+	if options.memory_budget is not None and options.memory_budget < 0:
+		pexit(1, "The memory budget can't be negative.\n")
+	if options.scratch_dir and not os.path.isdir(options.scratch_dir):
+		pexit(1, "Scratch directory does not exist.\n")
+	trackbuffer.configure(
+		memory_budget=(None if options.memory_budget is None
+		               else options.memory_budget * 1024 * 1024),
+		scratch_dir=options.scratch_dir)
+	# a calling program decides about the cache itself
+	if not options.no_cache and not no_exit:
+		hashcache.enable()
+
 	try:
 		ftype_arg0 = ""
 
@@ -334,6 +512,7 @@ def main(argv=None, no_exit=False):
 				tracks, attachments = sample.profile_sample(sample_file_data)
 			except resample.IncompleteSample as err:
 				pexit(2, str(err), False)
+			remember_crc32(sample_file, sample_file_data.crc32)
 
 			if not len(tracks):
 				pexit(2, "No A/V data was found. "
@@ -411,6 +590,14 @@ def main(argv=None, no_exit=False):
 					except AttributeError:
 						pass  # SRS without fingerprint information
 
+		# reconstructing several samples from the same main file
+		elif len(args) > 2 and all(arg.lower().endswith(".srs")
+		                           for arg in args[:-1]):
+			failed = reconstruct_batch(args[:-1], args[-1], options)
+			if failed:
+				pexit(5, "\nRebuild failed for %d of %d samples.\n" %
+				      (len(failed), len(args) - 1), False)
+
 		# reconstructing sample
 		elif len(args) == 2 and args0.lower().endswith(".srs"):
 			# reconstruct sample
@@ -437,6 +624,7 @@ def main(argv=None, no_exit=False):
 
 			# 1) Read in the SRS file
 			srs_data, tracks = sample.load_srs(srs)
+			movi.first_timecode = sample.first_timecode
 
 			t1 = time.time()
 			total = t1 - t0
@@ -451,9 +639,12 @@ def main(argv=None, no_exit=False):
 
 			# 2) Find the sample streams in the main movie file
 			# always do this search for music files
+			# (AVI and MKV extract the found streams in the same pass)
+			attachments = None
 			if (is_music or not skip_location or
 			    options.no_stored_match_offset or len(sample.cut_data)):
-				tracks = movi.find_sample_streams(tracks, movie)
+				tracks, attachments = movi.find_extract_sample_streams(
+					tracks, movie)
 
 				t1 = time.time()
 				total = t1 - t0
@@ -461,18 +652,15 @@ def main(argv=None, no_exit=False):
 				      "Elapsed Time: {0:.2f}s".format(total))
 
 				for track in tracks.values():
-					if ((track.signature_bytes and track.match_offset == 0 and
-							sample.file_type != FileType.MP3 and
-							sample.file_type != FileType.STREAM) or
-						(track.match_offset == -1 and sample.file_type in
-							(FileType.MP3, FileType.STREAM))):
-						# 0 is a legal match offset for MP3 and STREAM
+					if not_located(track, sample.file_type):
 						msg = ("\nUnable to locate track signature for track"
 						       " %s. Aborting.\n" % track.track_number)
 						pexit(3, msg, False)
 
 			# 3) Extract those sample streams to memory
-			tracks, attachments = movi.extract_sample_streams(tracks, movie)
+			if attachments is None:
+				tracks, attachments = movi.extract_sample_streams(tracks,
+				                                                  movie)
 			t1 = time.time()
 			total = t1 - t0
 			print("Track Extraction Complete...  "
@@ -585,6 +773,7 @@ def main(argv=None, no_exit=False):
 
 			if sfile.crc32 == srs_data.crc32:
 				replace_result(out_file, result_file)
+				remember_crc32(result_file, sfile.crc32)
 				print("\nSuccessfully rebuilt sample: %s" % srs_data.name)
 			else:
 				# TODO: try again with the correct interleaving for LOL samples
@@ -650,7 +839,7 @@ def main(argv=None, no_exit=False):
 		if fault.endswith("Aborting"):
 			pexit(2, "Corruption detected: %s\n" % fault)
 		else:
-			exit(2, "Corruption detected: %s. Aborting.\n" % fault)
+			pexit(2, "Corruption detected: %s. Aborting.\n" % fault)
 	except fpcalc.ExecutableNotFound as err:
 		pexit(3, str(err))
 	except AttributeError as err:
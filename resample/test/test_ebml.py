@@ -29,7 +29,9 @@ import io
 import os
 
 from resample.ebml import (GetUIntLength, GetEbmlElementID, GetEbmlUIntStream,
-                           GetEbmlUInt)
+                           GetEbmlUInt, GetEbmlUIntValue, MakeEbmlUInt)
+from resample.ebml import (EbmlReader, EbmlReadMode, EbmlElementType, EbmlID,
+                           BlockElement)
 
 class TestHelperFunctions(unittest.TestCase):
 	def test_get_uint_length(self):
@@ -71,5 +73,64 @@ class TestHelperFunctions(unittest.TestCase):
 		stream.seek(0, os.SEEK_SET)
 		self.assertEqual((1230420, 3), GetEbmlUIntStream(stream))
 
+	def test_get_ebml_uint_value(self):
+		self.assertEqual(0, GetEbmlUIntValue(b""))
+		self.assertEqual(0xFFEE, GetEbmlUIntValue(b"\xFF\xEE"))
+
+def element(eid, data):
+	return eid + bytes(MakeEbmlUInt(len(data))) + data
+
+class TestEbmlReader(unittest.TestCase):
+	def setUp(self):
+		e = element
+		xiph_laced = (b"\x82\x00\x05\x82\x02" + b"\xFF\x05\x03" +
+		              b"\x11" * 260 + b"\x22" * 3 + b"\x23" * 4)
+		ebml_laced = (b"\x81\x00\x06\x86\x02" + b"\x84\x5F\xFD" +
+		              b"\x33" * 4 + b"\x44" * 2 + b"\x55" * 7)
+		cluster = e(EbmlID.CLUSTER, e(EbmlID.TIMECODE, b"\x03\xE8") +
+			e(EbmlID.SIMPLE_BLOCK, b"\x81\x00\x01\x80" + b"\x66" * 100) +
+			e(EbmlID.SIMPLE_BLOCK, xiph_laced) +
+			e(EbmlID.BLOCK_GROUP, e(EbmlID.BLOCK, ebml_laced)))
+		self.mkv = (element(EbmlID.EBML, b"\x42\x82\x88matroska") +
+			element(EbmlID.SEGMENT, cluster + cluster))
+
+	def elements(self, buffered, reread=False):
+		er = EbmlReader(EbmlReadMode.MKV, stream=io.BytesIO(self.mkv),
+		                buffered=buffered)
+		result = []
+		while er.read():
+			e = er.current_element
+			result.append((er.element_type, e.element_start_pos, e.length,
+			               e.raw_header))
+			if isinstance(e, BlockElement):
+				result.append((e.track_number, e.timecode, e.frame_lengths,
+				               e.raw_block_header))
+			if er.element_type in (EbmlElementType.Segment,
+			                       EbmlElementType.Cluster,
+			                       EbmlElementType.BlockGroup):
+				if reread:
+					result.append(er.read_contents())
+				er.move_to_child()
+			else:
+				result.append(er.read_contents())
+				if reread:
+					result.append(er.read_contents())
+		return result
+
+	def test_buffered_cluster(self):
+		"""The Clusters read at once give the same elements."""
+		for reread in (False, True):
+			elements = self.elements(False, reread)
+			self.assertEqual(elements, self.elements(True, reread))
+		self.assertTrue((2, 5, [260, 3, 4],
+		                 b"\x82\x00\x05\x82\x02\xFF\x05\x03") in elements)
+		self.assertTrue((1, 6, [4, 2, 7],
+		                 b"\x81\x00\x06\x86\x02\x84\x5F\xFD") in elements)
+
+	def test_cluster_beyond_file(self):
+		"""An incomplete Cluster is read as before."""
+		self.mkv = self.mkv[:-10]
+		self.assertEqual(self.elements(False), self.elements(True))
+
 if __name__ == "__main__":
 	unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2026 pyReScene
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+import io
+import random
+import struct
+import unittest
+
+from resample import m2ts
+from resample.m2ts import M2tsReader, PACKET_SIZE, PAYLOAD_SIZE
+
+def m2ts_data(pids, seed=0):
+	"""Transport stream packets with the given PIDs and random payloads."""
+	rand = random.Random(seed)
+	data = b""
+	for counter, pid in enumerate(pids):
+		header = struct.pack(">LBHB", counter, 0x47, 0x4000 | pid,
+		                     0x10 | (counter & 0xF))
+		data += header + bytes(bytearray(
+			rand.randrange(256) for _ in range(PAYLOAD_SIZE)))
+	return data
+
+class TestM2tsReader(unittest.TestCase):
+	def setUp(self):
+		self.pids = [0x1011, 0x1100, 0x1011, 0, 0x1FFF, 0x1100] * 50
+		self.data = m2ts_data(self.pids)
+		self.buffer_packets = m2ts.BUFFER_PACKETS
+		m2ts.BUFFER_PACKETS = 32  # multiple windows
+
+	def tearDown(self):
+		m2ts.BUFFER_PACKETS = self.buffer_packets
+
+	def packets(self, data):
+		mr = M2tsReader(stream=io.BytesIO(data))
+		result = []
+		while mr.read():
+			result.append((mr.current_packet.start_pos, mr.current_packet.pid,
+			               mr.current_packet.raw_header, mr.read_contents()))
+		return result
+
+	def test_read(self):
+		packets = self.packets(self.data)
+		self.assertEqual(self.pids, [pid for _pos, pid, _h, _p in packets])
+		for pos, _pid, header, payload in packets:
+			self.assertEqual(self.data[pos:pos + PACKET_SIZE], header + payload)
+
+	def test_read_window(self):
+		mr = M2tsReader(stream=io.BytesIO(self.data))
+		windows = []
+		window = mr.read_window()
+		while window:
+			windows.append(window)
+			window = mr.read_window()
+		self.assertEqual(len(self.pids) // 32 + 1, len(windows))
+		self.assertEqual(self.pids, sum((w.pids for w in windows), []))
+
+		packets = self.packets(self.data)
+		window = windows[1]
+		for i in range(window.count):
+			packet = window.packet(i)
+			pos, pid, header, payload = packets[32 + i]
+			self.assertEqual((pos, pid, header), (packet.start_pos,
+			                 packet.pid, packet.raw_header))
+			self.assertEqual(payload, window.payload(i))
+		self.assertEqual([0, 4, 6, 10], window.indices(set([0x1011]))[:4])
+		self.assertFalse(mr.read())
+
+	def test_incomplete_packet(self):
+		"""read() returns the last packet that read_window() leaves."""
+		mr = M2tsReader(stream=io.BytesIO(self.data[:-100]))
+		count = 0
+		window = mr.read_window()
+		while window:
+			count += window.count
+			window = mr.read_window()
+		self.assertEqual(len(self.pids) - 1, count)
+		self.assertTrue(mr.read())
+		self.assertEqual(PAYLOAD_SIZE - 100, len(mr.read_contents()))
+		self.assertFalse(mr.read())
+
+if __name__ == "__main__":
+	unittest.main()
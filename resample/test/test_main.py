@@ -32,11 +32,18 @@ import shutil
 import os.path
 import struct
 import sys
+import io
+import logging
+import zlib
 from os import SEEK_CUR
 
 from resample.main import file_type_info, stsc, sample_class_factory
 from resample.main import profile_wmv, FileData
+from resample.main import TrackData, mkv_read_cues, TrackStream, TrackChunk
+from resample.main import InvalidMatchOffset, find_extract_batch
+from resample.ebml import EbmlID, EbmlReader, EbmlReadMode, MakeEbmlUInt
 from resample import asf
+import resample.main
 import resample.srs
 import rescene
 from rescene.utility import FileType
@@ -209,6 +216,63 @@ class TestMp4CreateSrs(TempDirTest):
 		msg = msg.format(size, len(data))
 		self.assertTrue(size < len(data) / 2, msg)
 
+class TestMp4MainProfile(TempDirTest):
+	"""The profile of a main MP4 file is cached, its tracks are not."""
+	def runTest(self):
+		samples = [struct.pack(">L", i) * 25 for i in range(100)]
+		mdat_start = 8 + 8  # after the empty ftyp atom and the mdat header
+		data = serialize_atoms((
+			(b"ftyp", b""),
+			(b"mdat", b"".join(samples)),
+			(b"moov", (
+				(b"trak", (
+					(b"tkhd", struct.pack(">LLLL", 0, 0, 0, 1)),
+					(b"mdia", (
+						(b"minf", (
+							(b"stbl", (
+								(b"stsc", struct.pack(">LL LLL",
+								                      0, 1, 1, 1, 1)),
+								(b"stsz", struct.pack(">LLL", 0, 100, 100)),
+								(b"stco", struct.pack(">LL", 0, 100) +
+									b"".join(struct.pack(">L",
+									mdat_start + 100 * i)
+									for i in range(100))),
+							)),
+						)),
+					)),
+				)),
+			)),
+		))
+		main = os.path.join(self.dir, "main.mp4")
+		with open(main, "wb") as f:
+			f.write(data)
+
+		found = []
+		for first in (30, 60):
+			track = TrackData()
+			track.track_number = 1
+			track.data_length = 500
+			track.signature_bytes = samples[first]
+			sample = sample_class_factory(FileType.MP4)
+			tracks = sample.find_sample_streams({1: track}, main)
+			self.assertEqual(mdat_start + 100 * first, tracks[1].match_offset)
+			found.append(tracks[1].main_track)
+
+			tracks, _attachments = sample.extract_sample_streams(tracks, main)
+			tracks[1].track_file.seek(0)
+			self.assertEqual(b"".join(samples[first:first + 5]),
+			                 tracks[1].track_file.read())
+			tracks[1].track_file.close()
+
+		self.assertFalse(found[0] is found[1])
+		cached = [mtrack for mtracks in
+		          resample.main._main_mp4_profiles.values()
+		          for mtrack in mtracks.values()]
+		self.assertTrue(cached)
+		for mtrack in cached:
+			self.assertFalse(hasattr(mtrack, "trackstream"))
+			self.assertFalse(any(mtrack is m for m in found))
+
 def serialize_atoms(atoms):
 	abuffer = bytearray()
 	for atom in atoms:
@@ -250,5 +314,373 @@ class TestLoad(TempDirTest):
 		self.assertEqual(917376, tracks[1].data_length)
 		self.assertFalse(tracks[1].match_offset)
 
+class TestTrackStream(unittest.TestCase):
+	def setUp(self):
+		self.data = bytes(bytearray(range(256))) * 4
+		# chunks at offset 10 and 500 with samples of 100 and 60 bytes
+		self.ts = TrackStream()
+		first = TrackChunk(10, 2, None)
+		first.samples = [40, 60]
+		second = TrackChunk(500, 1, first)
+		second.samples = [60]
+		first.next_chunk = second
+		self.ts.add_chunk(first)
+		self.ts.add_chunk(second)
+		self.ts.stream = io.BytesIO(self.data)
+
+	def test_read(self):
+		self.ts.seek(50)
+		self.assertEqual(self.data[50:110] + self.data[500:540],
+		                 self.ts.read(100))
+		self.assertEqual(self.data[50:110] + self.data[500:560],
+		                 self.ts.read(1000))
+
+	def test_copy_to(self):
+		"""The track data is copied in pieces."""
+		self.ts.seek(10)
+		self.assertEqual([self.data[10:40], self.data[40:70],
+		                  self.data[70:100], self.data[100:110],
+		                  self.data[500:530]],
+		                 list(self.ts.iter_read(130, piece_size=30)))
+		output = io.BytesIO()
+		self.ts.copy_to(output, 160)
+		self.assertEqual(self.data[10:110] + self.data[500:560],
+		                 output.getvalue())
+
+	def test_sample_tables(self):
+		first = self.ts.chunks[0]
+		self.assertEqual([0, 40, 100], list(first.sample_starts))
+		self.assertEqual(60, first.bytes_left_in_chunk(1))
+		self.assertEqual(40, first.bytes_consumed(1))
+		self.assertEqual(1, first.get_sample_nb(50))
+		self.assertEqual(2, first.get_sample_nb(110))
+		self.assertRaises(InvalidMatchOffset, first.get_sample_nb, 30)
+		self.ts.seek(500)
+		self.assertTrue(self.ts.chunks[1] is self.ts._current_chunk)
+
+	def test_find_sample(self):
+		self.assertEqual(50, self.ts.find_sample(self.data[50:60]))
+		# continues in the next chunk
+		self.assertEqual(50, self.ts.find_sample(self.data[50:110] +
+		                                         self.data[500:510]))
+		# not at the start of a sample
+		self.assertEqual(None, self.ts.find_sample(self.data[51:60]))
+		self.assertEqual(None, self.ts.find_sample(self.data[50:111]))
+
+class MkvTest(TempDirTest):
+	def element(self, eid, data):
+		return eid + bytes(MakeEbmlUInt(len(data))) + data
+
+	def create_mkv(self, clusters=300, indices=None, name="main.mkv",
+	               attachment=None):
+		"""Every Cluster has one 64 byte block for track 1 and a Cue point.
+		The timecode of Cluster i is 1000 * i. The block of a Cluster is
+		its index repeated, unless other indices are given.
+		attachment: (file name, data) of a file attached after the Tracks"""
+		e = self.element
+		tracks = e(EbmlID.TRACKLIST, e(EbmlID.TRACK,
+			e(EbmlID.TRACKNUMBER, b"\x01") + e(EbmlID.TRACKCODEC, b"V_TEST")))
+		if attachment:
+			tracks += e(EbmlID.ATTACHMENT_LIST, e(EbmlID.ATTACHMENT,
+				e(EbmlID.ATTACHED_FILE_NAME, attachment[0]) +
+				e(EbmlID.ATTACHED_FILE_DATA, attachment[1])))
+		if indices is None:
+			indices = range(clusters)
+		self.blocks = [struct.pack(">Q", i) * 8 for i in indices]
+		cluster_data = b""
+		cue_points = []
+		seek_head_size = len(e(EbmlID.SEEK_HEAD, e(EbmlID.SEEK,
+			e(EbmlID.SEEK_ID, EbmlID.CUES) + e(EbmlID.SEEK_POSITION, b"\0" * 8))))
+		self.cluster_positions = []
+		for i, block in enumerate(self.blocks):
+			position = seek_head_size + len(tracks) + len(cluster_data)
+			self.cluster_positions.append(position)
+			cue_points.append(e(EbmlID.CUE_POINT,
+				e(EbmlID.CUE_TIME, struct.pack(">L", 1000 * i)) +
+				e(EbmlID.CUE_TRACK_POSITIONS, e(b"\xF7", b"\x01") +
+				e(EbmlID.CUE_CLUSTER_POSITION, struct.pack(">Q", position)))))
+			cluster_data += e(EbmlID.CLUSTER,
+				e(EbmlID.TIMECODE, struct.pack(">L", 1000 * i)) +
+				e(EbmlID.SIMPLE_BLOCK, b"\x81\x00\x00\x80" + block))
+		cues_position = seek_head_size + len(tracks) + len(cluster_data)
+		seek_head = e(EbmlID.SEEK_HEAD, e(EbmlID.SEEK,
+			e(EbmlID.SEEK_ID, EbmlID.CUES) +
+			e(EbmlID.SEEK_POSITION, struct.pack(">Q", cues_position))))
+		segment = (seek_head + tracks + cluster_data +
+		           e(EbmlID.CUES, b"".join(cue_points)))
+		ebml_header = e(EbmlID.EBML, e(b"\x42\x82", b"matroska"))
+		self.segment_data_start = (len(ebml_header) +
+			len(EbmlID.SEGMENT) + len(MakeEbmlUInt(len(segment))))
+		mkv = os.path.join(self.dir, name)
+		with open(mkv, "wb") as mkv_file:
+			mkv_file.write(ebml_header + e(EbmlID.SEGMENT, segment))
+		return mkv
+
+class TestMkvCues(MkvTest):
+	"""Locating a sample in an MKV file with the help of its Cues."""
+
+	def find(self, mkv, first_cluster, first_timecode):
+		track = TrackData()
+		track.track_number = 1
+		track.signature_bytes = self.blocks[first_cluster]
+		track.data_length = 3 * 64
+		sample = sample_class_factory(FileType.MKV)
+		sample.first_timecode = first_timecode
+		return sample.find_sample_streams({1: track}, mkv)[1]
+
+	def match_offset(self, cluster):
+		# Cluster header 4 + 1, Timecode 1 + 1 + 4, SimpleBlock 1 + 1 + 4
+		return self.segment_data_start + self.cluster_positions[cluster] + 17
+
+	def test_read_cues(self):
+		mkv = self.create_mkv(clusters=20)
+		er = EbmlReader(EbmlReadMode.MKV, mkv)
+		clusters = mkv_read_cues(er)
+		er.close()
+		self.assertEqual([(1000 * i, self.segment_data_start + position)
+		                  for i, position in enumerate(self.cluster_positions)],
+		                 clusters)
+
+	def test_find_with_cues(self):
+		mkv = self.create_mkv()
+		# the Blocks that are read and the messages about a full scan
+		blocks_read = []
+		block_find = resample.main._mkv_block_find
+		def record_block_find(self, tracks, er, *args):
+			blocks_read.append(er.current_element.element_start_pos)
+			return block_find(self, tracks, er, *args)
+		messages = []
+		class Handler(logging.Handler):
+			def emit(self, record):
+				messages.append(record.getMessage())
+		handler = Handler()
+		resample.main._mkv_block_find = record_block_find
+		resample.main.logger.addHandler(handler)
+		resample.main.logger.setLevel(logging.INFO)
+		try:
+			for first_cluster, first_timecode, window in (
+					(150, 150000, 149), (151, 150500, 149),
+					# the track data runs past the end of the file: the
+					# window before the Cue point is tried as well
+					(299, 299000, 290),
+					(0, 0, None),  # no estimate: read from the start
+					(20, 280000, None)):  # bad estimate: read everything
+				del blocks_read[:]
+				del messages[:]
+				track = self.find(mkv, first_cluster, first_timecode)
+				self.assertEqual(self.match_offset(first_cluster),
+				                 track.match_offset)
+				self.assertEqual(track.data_length, track.match_length)
+				self.assertEqual(self.blocks[first_cluster], track.check_bytes)
+				# Cluster header 4 + 1 and Timecode 1 + 1 + 4 precede a Block
+				first_cluster_read = min(blocks_read) - 11
+				if window is None:
+					self.assertEqual(self.segment_data_start +
+						self.cluster_positions[0], first_cluster_read)
+					continue
+				# the Clusters before the window around the Cue point
+				# of the first Cluster of the sample are not read
+				self.assertEqual([], messages)
+				self.assertEqual(self.segment_data_start +
+					self.cluster_positions[window], first_cluster_read)
+			self.assertEqual(1, len(messages))
+		finally:
+			resample.main._mkv_block_find = block_find
+			resample.main.logger.removeHandler(handler)
+			resample.main.logger.setLevel(logging.NOTSET)
+
+class TestMkvSinglePass(MkvTest):
+	"""The track data is copied while the sample is searched for."""
+	def load_srs(self, sample):
+		actualstdout = sys.stdout
+		sys.stdout = open(os.devnull, "w")
+		try:
+			resample.srs.main([sample, "-y", "-o", self.dir], no_exit=True)
+		finally:
+			sys.stdout.close()
+			sys.stdout = actualstdout
+		srs = os.path.splitext(sample)[0] + ".srs"
+		return srs, sample_class_factory(FileType.MKV).load_srs(srs)
+
+	def runTest(self):
+		sample = self.create_mkv(indices=range(60, 80), name="sample.mkv")
+		srs, (srs_data, tracks) = self.load_srs(sample)
+		# the signature of the sample starts in Cluster 60 first,
+		# but the data of Cluster 63 does not follow
+		main = self.create_mkv(
+			indices=list(range(60)) + [60, 61, 62, 0] + list(range(60, 100)))
+
+		movi = sample_class_factory(FileType.MKV)
+		tracks[1].match_offset = 0
+		tracks, attachments = movi.find_extract_sample_streams(tracks, main)
+		self.assertEqual({}, attachments)
+		self.assertEqual(self.match_offset(64), tracks[1].match_offset)
+		tracks[1].track_file.seek(0)
+		self.assertEqual(b"".join(self.blocks[64:84]),
+		                 tracks[1].track_file.read())
+
+		out_file = os.path.join(self.dir, "rebuilt.mkv")
+		sample_file = sample_class_factory(FileType.MKV)
+		sample_file.load_srs(srs)
+		rebuilt = sample_file.rebuild_sample(srs_data, tracks, attachments,
+		                                     srs, out_file)
+		tracks[1].track_file.close()
+		self.assertEqual(srs_data.crc32, rebuilt.crc32)
+
+	def match_offset(self, cluster):
+		return self.segment_data_start + self.cluster_positions[cluster] + 17
+
+class TestMkvBatch(TestMkvSinglePass):
+	"""Several samples are searched for in one pass over the main file."""
+	def runTest(self):
+		ranges = ((10, 30), (60, 80), (150, 190), (75, 95))
+		all_tracks = []
+		for i, (first, end) in enumerate(ranges):
+			sample = self.create_mkv(indices=range(first, end),
+			                         name="sample%d.mkv" % i)
+			_srs, (_srs_data, tracks) = self.load_srs(sample)
+			tracks[1].match_offset = 0
+			all_tracks.append(tracks)
+		main = self.create_mkv(clusters=200)
+
+		jobs = [(sample_class_factory(FileType.MKV), tracks)
+		        for tracks in all_tracks]
+		results = find_extract_batch(jobs, main)
+		for (first, end), (tracks, attachments) in zip(ranges, results):
+			self.assertEqual({}, attachments)
+			self.assertEqual(self.match_offset(first), tracks[1].match_offset)
+			tracks[1].track_file.seek(0)
+			self.assertEqual(b"".join(self.blocks[first:end]),
+			                 tracks[1].track_file.read())
+			tracks[1].track_file.close()
+
+class TestAviSinglePass(TempDirTest):
+	"""The AVI track data is copied while the sample is searched for."""
+	def block(self, index):
+		# the end of a chunk never matches the start of another one
+		return b"\xAA" + struct.pack(">Q", index) * 7 + b"\x55" * 7
+
+	def create_avi(self, indices):
+		"""A movi list with a 64 byte video chunk for each index."""
+		self.blocks = [self.block(i) for i in indices]
+		chunks = b"".join(b"01dc" + struct.pack("<L", len(block)) + block
+		                  for block in self.blocks)
+		movi = b"LIST" + struct.pack("<L", len(chunks) + 4) + b"movi" + chunks
+		self.movi_start = 12 + 12  # RIFF and LIST headers
+		avi = os.path.join(self.dir, "main.avi")
+		with open(avi, "wb") as avi_file:
+			avi_file.write(b"RIFF" + struct.pack("<L", len(movi) + 4) +
+			               b"AVI " + movi)
+		return avi
+
+	def sample_tracks(self):
+		track = TrackData()
+		track.track_number = 1
+		track.data_length = 20 * 64
+		track.signature_bytes = b"".join(self.expected[:4])
+		return {1: track}
+
+	def runTest(self):
+		self.expected = [self.block(i) for i in range(60, 80)]
+		# the signature of the sample starts in chunk 60 first,
+		# but the data of chunk 63 does not follow
+		main = self.create_avi(
+			list(range(60)) + [60, 61, 62, 0] + list(range(60, 100)))
+		match_offset = self.movi_start + 64 * 72 + 8
+
+		discarded = []
+		discard_track_file = resample.main.discard_track_file
+		def record_discard(track):
+			discarded.append(track.track_file.tell())
+			discard_track_file(track)
+		resample.main.discard_track_file = record_discard
+		try:
+			movi = sample_class_factory(FileType.AVI)
+			tracks, attachments = movi.find_extract_sample_streams(
+				self.sample_tracks(), main)
+		finally:
+			resample.main.discard_track_file = discard_track_file
+		self.assertEqual({}, attachments)
+		# the data of chunks 60, 61 and 62 was copied and dropped again
+		self.assertEqual([3 * 64], discarded)
+		self.assertEqual(match_offset, tracks[1].match_offset)
+		tracks[1].track_file.seek(0)
+		single_pass = tracks[1].track_file.read()
+		tracks[1].track_file.close()
+		self.assertEqual(b"".join(self.expected), single_pass)
+
+		# the same data as searching and extracting separately
+		movi = sample_class_factory(FileType.AVI)
+		tracks = movi.find_sample_streams(self.sample_tracks(), main)
+		self.assertEqual(match_offset, tracks[1].match_offset)
+		tracks, _attachments = movi.extract_sample_streams(tracks, main)
+		tracks[1].track_file.seek(0)
+		self.assertEqual(single_pass, tracks[1].track_file.read())
+		tracks[1].track_file.close()
+
+class TestMkvBatchRebuild(TestMkvSinglePass):
+	"""srs a.srs b.srs main.mkv: the samples share the attachments."""
+	def runTest(self):
+		attachment = (b"font.ttf", b"attached font data" * 50)
+		ranges = ((10, 30), (60, 80))
+		srs_files = []
+		crcs = []
+		for i, (first, end) in enumerate(ranges):
+			sample = self.create_mkv(indices=range(first, end),
+				name="sample%d.mkv" % i, attachment=attachment)
+			srs, (srs_data, _tracks) = self.load_srs(sample)
+			srs_files.append(srs)
+			crcs.append(srs_data.crc32)
+			os.unlink(sample)
+		main = self.create_mkv(clusters=100, attachment=attachment)
+
+		out = os.path.join(self.dir, "out")
+		actualstdout = sys.stdout
+		sys.stdout = open(os.devnull, "w")
+		try:
+			resample.srs.main(srs_files + [main, "-m", "-y", "-o", out],
+			                  no_exit=True)
+		finally:
+			sys.stdout.close()
+			sys.stdout = actualstdout
+		for i, crc in enumerate(crcs):
+			rebuilt = os.path.join(out, "sample%d.mkv" % i)
+			with open(rebuilt, "rb") as sample:
+				self.assertEqual(crc, zlib.crc32(sample.read()) & 0xFFFFFFFF)
+
+class TestStreamBatch(TempDirTest):
+	"""srs a.srs b.srs main.vob: a stream sample found at offset 0."""
+	def runTest(self):
+		data = b"".join(struct.pack(">I", i) * 4 for i in range(20000))
+		srs_files = []
+		crcs = []
+		for i, (start, end) in enumerate(((0, 30000), (100000, 140000))):
+			sample = os.path.join(self.dir, "sample%d.vob" % i)
+			with open(sample, "wb") as vob:
+				vob.write(data[start:end])
+			crcs.append(zlib.crc32(data[start:end]) & 0xFFFFFFFF)
+			self.run_srs([sample, "-y", "-o", self.dir])
+			srs_files.append(os.path.splitext(sample)[0] + ".srs")
+			os.unlink(sample)
+		main = os.path.join(self.dir, "main.vob")
+		with open(main, "wb") as vob:
+			vob.write(data)
+
+		out = os.path.join(self.dir, "out")
+		self.run_srs(srs_files + [main, "-m", "-y", "-o", out])
+		for i, crc in enumerate(crcs):
+			rebuilt = os.path.join(out, "sample%d.vob" % i)
+			with open(rebuilt, "rb") as sample:
+				self.assertEqual(crc, zlib.crc32(sample.read()) & 0xFFFFFFFF)
+
+	def run_srs(self, argv):
+		actualstdout = sys.stdout
+		sys.stdout = open(os.devnull, "w")
+		try:
+			resample.srs.main(argv, no_exit=True)
+		finally:
+			sys.stdout.close()
+			sys.stdout = actualstdout
+
 if __name__ == "__main__":
 	unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2026 pyReScene
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+import random
+import unittest
+
+from resample.matcher import find_start, extend_match, SignatureFinder
+
+def naive_find_start(signature, data):
+	"""The byte by byte search the matcher replaces."""
+	for pos in range(len(data)):
+		if signature.startswith(data[pos:pos + len(signature)]):
+			return pos
+	return -1
+
+class TestMatcher(unittest.TestCase):
+	def test_find_start(self):
+		sig = b"abcab"
+		self.assertEqual(find_start(sig, b"xxabcabxx"), 2)
+		self.assertEqual(find_start(sig, b"xxabcxabca"), 6)  # cut off
+		self.assertEqual(find_start(sig, b"xxabcxabcb"), -1)
+		self.assertEqual(find_start(sig, b""), -1)
+
+		# few different bytes: many candidate positions
+		rand = random.Random(5)
+		for _ in range(500):
+			sig = bytes(bytearray(rand.randint(0, 1) for _ in range(6)))
+			data = bytes(bytearray(rand.randint(0, 1)
+			                       for _ in range(rand.randint(0, 20))))
+			self.assertEqual(find_start(sig, data),
+			                 naive_find_start(sig, data), (sig, data))
+
+	def test_extend_match(self):
+		self.assertEqual(extend_match(b"abcdef", b"ab", b"cd"), b"abcd")
+		self.assertEqual(extend_match(b"abcdef", b"ab", b"cdefgh"), b"abcdef")
+		self.assertEqual(extend_match(b"abcdef", b"ab", b"x"), None)
+		self.assertEqual(extend_match(b"abcdef", b"", b""), b"")
+
+	def test_signature_finder(self):
+		rand = random.Random(7)
+		for _ in range(200):
+			sig = bytes(bytearray(rand.randint(0, 2) for _ in range(5)))
+			data = bytes(bytearray(rand.randint(0, 2) for _ in range(60)))
+			finder = SignatureFinder(sig, position=100)
+			pos = 0
+			result = -1
+			while pos < len(data) and result == -1:
+				size = rand.randint(1, 7)
+				result = finder.feed(data[pos:pos + size])
+				pos += size
+			expected = data.find(sig)
+			self.assertEqual(result, expected + 100 if expected > -1 else -1)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2026 pyReScene
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+import io
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from resample.prefetch import PrefetchReader
+from resample.mp3 import Mp3Reader
+
+class TestPrefetchReader(unittest.TestCase):
+	def setUp(self):
+		self.dir = tempfile.mkdtemp(prefix="pyReScene-")
+		rand = random.Random(0)
+		self.data = bytes(bytearray(rand.randrange(256)
+		                            for _ in range(20000)))
+		self.path = os.path.join(self.dir, "data.bin")
+		with open(self.path, "wb") as data_file:
+			data_file.write(self.data)
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def test_sequential(self):
+		with PrefetchReader(self.path, block_size=1000, depth=2) as pr:
+			self.assertEqual(20000, pr.seek(0, os.SEEK_END))
+			pr.seek(0)
+			pieces = []
+			piece = pr.read(777)
+			while piece:
+				pieces.append(piece)
+				piece = pr.read(777)
+			self.assertEqual(self.data, b"".join(pieces))
+			self.assertEqual(b"", pr.read())
+
+	def test_seek(self):
+		"""Random reads and seeks give the same as an in-memory file."""
+		rand = random.Random(1)
+		for block_size in (7, 100, 3000, 50000):
+			pr = PrefetchReader(self.path, block_size=block_size, depth=2)
+			ref = io.BytesIO(self.data)
+			for _ in range(100):
+				if rand.random() < 0.6:
+					size = rand.choice((-1, 0, 1, 10, 2500, 30000))
+					self.assertEqual(ref.read(size), pr.read(size))
+				else:
+					whence = rand.choice((os.SEEK_SET, os.SEEK_CUR,
+					                      os.SEEK_END))
+					offset = rand.randrange(-25000, 25000)
+					if offset + (0, ref.tell(), len(self.data))[whence] < 0:
+						self.assertRaises(IOError, pr.seek, offset, whence)
+						continue
+					self.assertEqual(ref.seek(offset, whence),
+					                 pr.seek(offset, whence))
+				self.assertEqual(ref.tell(), pr.tell())
+			pr.close()
+
+	def test_reader_stream(self):
+		frame = b"\xff\xfb\x90\x64" + bytes(bytearray(range(256))) * 2
+		with open(self.path, "wb") as mp3:
+			mp3.write(frame[:417] * 100 + b"TAG" + b"a" * 125)
+
+		def blocks(mr):
+			try:
+				return [(block.type, block.start_pos, block.size)
+				        for block in mr.read()]
+			finally:
+				mr.close()
+		self.assertEqual(blocks(Mp3Reader(self.path)), blocks(Mp3Reader(
+			stream=PrefetchReader(self.path, block_size=1000))))
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2026 pyReScene
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+import shutil
+import tempfile
+import unittest
+from zlib import crc32
+
+from resample import trackbuffer
+from resample.trackbuffer import TrackBuffer
+
+class TestTrackBuffer(unittest.TestCase):
+	def setUp(self):
+		self.settings = dict(trackbuffer._settings)
+		self.scratch = tempfile.mkdtemp(prefix="pyReScene-")
+		trackbuffer.configure(memory_budget=100, scratch_dir=self.scratch)
+		self.buffers = []
+
+	def tearDown(self):
+		for buff in self.buffers:
+			buff.close()
+		trackbuffer._settings.update(self.settings)
+		shutil.rmtree(self.scratch)
+
+	def new_buffer(self):
+		buff = TrackBuffer()
+		self.buffers.append(buff)
+		return buff
+
+	def test_in_memory(self):
+		used = trackbuffer.memory_in_use()
+		tb = self.new_buffer()
+		self.assertTrue(tb)  # tested for existence like the temporary file
+		tb.write(b"0123456789")
+		tb.write(b"abc")
+		self.assertEqual(13, tb.tell())
+		self.assertEqual(13, tb.size)
+		self.assertFalse(tb.spilled)
+		self.assertEqual(used + 13, trackbuffer.memory_in_use())
+
+		tb.seek(0)
+		self.assertEqual(b"0123", tb.read(4))
+		view = tb.view(6)
+		self.assertTrue(isinstance(view, memoryview))
+		self.assertEqual(b"456789", view.tobytes())
+		self.assertEqual(crc32(b"456789"), crc32(view))
+		self.assertEqual(b"abc", tb.read())
+		self.assertEqual(b"", tb.read(5))
+		self.assertEqual(b"", tb.view(5).tobytes())
+
+		# writing is still possible while a view exists
+		tb.write(b"def")
+		self.assertEqual(b"456789", view.tobytes())
+		tb.seek(-3, 2)
+		self.assertEqual(b"def", tb.read())
+
+		tb.close()
+		self.assertEqual(used, trackbuffer.memory_in_use())
+
+	def test_spill(self):
+		used = trackbuffer.memory_in_use()
+		first = self.new_buffer()
+		first.write(b"a" * 60)
+		second = self.new_buffer()
+		second.write(b"b" * 30)
+		self.assertFalse(second.spilled)
+		second.write(b"c" * 30)  # over the budget of both buffers together
+		self.assertTrue(second.spilled)
+		self.assertFalse(first.spilled)
+		self.assertEqual(used + 60, trackbuffer.memory_in_use())
+		self.assertEqual(60, second.tell())
+		self.assertEqual(60, second.size)
+
+		second.write(b"d" * 10)
+		second.seek(0)
+		self.assertEqual(b"b" * 30 + b"c" * 30, second.read(60))
+		self.assertEqual(b"d" * 10, second.view(100))
+
+		first.close()
+		second.close()
+		self.assertEqual(used, trackbuffer.memory_in_use())
+
+	def test_seek_past_end(self):
+		tb = self.new_buffer()
+		tb.write(b"ab")
+		tb.seek(4)
+		tb.write(b"cd")
+		tb.seek(0)
+		self.assertEqual(b"ab\x00\x00cd", tb.read())
+		self.assertRaises(ValueError, tb.seek, -1)
+
+	def test_configure(self):
+		self.assertRaises(ValueError, trackbuffer.configure, -1)
+		trackbuffer.configure(memory_budget=0)
+		tb = self.new_buffer()
+		tb.write(b"data")
+		self.assertTrue(tb.spilled)
+		tb.seek(0)
+		self.assertEqual(b"data", tb.read())
+
+if __name__ == "__main__":
+	unittest.main()
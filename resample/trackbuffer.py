@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2026 pyReScene
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+"""Buffers for the extracted track data of a sample.
+
+The data of each track is written completely before the sample is rebuilt.
+It stays in memory as long as all buffers together fit in the memory
+budget. A buffer that no longer fits is moved to a temporary file in the
+scratch directory and continues there.
+
+	configure(memory_budget=256 * 1024 * 1024, scratch_dir="/mnt/scratch")
+"""
+
+import tempfile
+import threading
+
+# bytes of track data all buffers together keep in memory
+MEMORY_BUDGET = 512 * 1024 * 1024
+
+_settings = {
+	"memory_budget": MEMORY_BUDGET,
+	"scratch_dir": None,  # None: the default directory of tempfile
+}
+_lock = threading.Lock()  # MP4 tracks are extracted in parallel
+_in_memory = [0]
+
+def configure(memory_budget=None, scratch_dir=None):
+	"""Changes the memory budget and the directory for spilled buffers.
+	Arguments that are None stay the same. Existing buffers keep their
+	memory; a lower budget only has effect on new writes."""
+	if memory_budget is not None:
+		if memory_budget < 0:
+			raise ValueError("The memory budget can't be negative.")
+		_settings["memory_budget"] = memory_budget
+	if scratch_dir is not None:
+		_settings["scratch_dir"] = scratch_dir
+
+def memory_in_use():
+	"""Returns the number of bytes all buffers keep in memory."""
+	return _in_memory[0]
+
+def _reserve(amount):
+	with _lock:
+		if _in_memory[0] + amount > _settings["memory_budget"]:
+			return False
+		_in_memory[0] += amount
+		return True
+
+def _release(amount):
+	with _lock:
+		_in_memory[0] -= amount
+
+class TrackBuffer(object):
+	"""File-like object for the data of one track or attachment.
+	Supports write(), read(), seek(), tell() and close() like the
+	temporary file it replaces. view() returns the next bytes without
+	copying them while the buffer is still in memory."""
+	def __init__(self):
+		self._data = bytearray()
+		self._file = None
+		self._pos = 0
+		self.closed = False
+
+	@property
+	def spilled(self):
+		"""True when the data is stored in a temporary file."""
+		return self._file is not None
+
+	@property
+	def size(self):
+		if self._file is not None:
+			current = self._file.tell()
+			self._file.seek(0, 2)
+			size = self._file.tell()
+			self._file.seek(current)
+			return size
+		return len(self._data)
+
+	def write(self, data):
+		if self._file is not None:
+			return self._file.write(data)
+		grow = self._pos + len(data) - len(self._data)
+		if grow > 0 and not _reserve(grow):
+			self._spill()
+			return self._file.write(data)
+		try:
+			self._put(data)
+		except BufferError:
+			# a view of the old contents is still in use
+			self._data = bytearray(self._data)
+			self._put(data)
+		return len(data)
+
+	def _put(self, data):
+		if self._pos > len(self._data):
+			# write after a seek past the end: fill the gap like a file
+			self._data.extend(b"\x00" * (self._pos - len(self._data)))
+		self._data[self._pos:self._pos + len(data)] = data
+		self._pos += len(data)
+
+	def read(self, size=-1):
+		if self._file is not None:
+			return self._file.read(size)
+		if size is None or size < 0:
+			end = len(self._data)
+		else:
+			end = min(self._pos + size, len(self._data))
+		data = bytes(self._data[self._pos:end])
+		self._pos = max(self._pos, end)
+		return data
+
+	def view(self, size=-1):
+		"""Like read(), but returns a memoryview on the buffered data.
+		The view is only valid until the next write() to this buffer."""
+		if self._file is not None:
+			return self._file.read(size)
+		if size is None or size < 0:
+			end = len(self._data)
+		else:
+			end = min(self._pos + size, len(self._data))
+		data = memoryview(self._data)[self._pos:end]
+		self._pos = max(self._pos, end)
+		return data
+
+	def seek(self, offset, whence=0):
+		if self._file is not None:
+			return self._file.seek(offset, whence)
+		if whence == 1:
+			offset += self._pos
+		elif whence == 2:
+			offset += len(self._data)
+		if offset < 0:
+			raise ValueError("Negative seek position %d." % offset)
+		self._pos = offset
+		return self._pos
+
+	def tell(self):
+		if self._file is not None:
+			return self._file.tell()
+		return self._pos
+
+	def close(self):
+		if self._file is not None:
+			self._file.close()
+			self._file = None
+		elif self._data is not None:
+			_release(len(self._data))
+		self._data = None
+		self.closed = True
+
+	def __del__(self):
+		if not getattr(self, "closed", True):
+			self.close()
+
+	def _spill(self):
+		"""Moves the data from memory to a temporary file."""
+		self._file = tempfile.TemporaryFile(dir=_settings["scratch_dir"])
+		self._file.write(self._data)
+		self._file.seek(self._pos)
+		_release(len(self._data))
+		self._data = None
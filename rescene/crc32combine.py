@@ -29,6 +29,7 @@
 
 import os
 import ctypes
+import threading
 from ctypes import util
 
 try:
@@ -37,9 +38,14 @@ except ImportError:
 	# not used within rescene, but the scripts
 	_DEBUG = True
 
+_loaded = {}  # zlib library found by crc32_combine_function()
+
 def crc32_combine_function():
 	"""Returns function to zlib when possible.
-	Fallback to Python implementation."""
+	Fallback to Python implementation.
+	The library is only searched and loaded the first time."""
+	if "function" in _loaded:
+		return _loaded["function"]
 	if os.name == 'nt':
 		libpath = util.find_library('zlib1')
 		if not libpath:
@@ -51,85 +57,115 @@ def crc32_combine_function():
 	else:
 		libpath = util.find_library('z')
 
+	function = crc32_combine
 	if libpath:
 		if _DEBUG:
 			print(libpath)
 		try:
 			zlib = ctypes.cdll.LoadLibrary(libpath)
-			return zlib.crc32_combine
+			function = zlib.crc32_combine
 		except OSError:
 			# OSError: [WinError 193] %1 is not a valid Win32 application
 			# on C:\Program Files\Intel\WiFi\bin\zlib1.dll
 			msg = ("The DLL found at %s cannot be used. Make sure a good file "
-				"can be found in the PATH! Falling back to slow Python code")
+				"can be found in the PATH! Falling back to Python code")
 			print(msg % libpath)
-			return crc32_combine
 	else:
-		print("zlib not found in PATH: slow Python implementation used")
-		return crc32_combine
+		print("zlib not found in PATH: Python implementation used")
+	_loaded["function"] = function
+	return function
 
 def crc32_combine_ctypes(crc1, crc2, len2):
 	"""Loads the C library and calls the function."""
-	if os.name == 'nt':
-		libpath = util.find_library('zlib1')
-	else:
-		libpath = util.find_library('z')
-
-	if libpath:
-		zlib = ctypes.cdll.LoadLibrary(libpath)
-		return zlib.crc32_combine(crc1, crc2, len2)
+	if "ctypes" not in _loaded:
+		if os.name == 'nt':
+			libpath = util.find_library('zlib1')
+		else:
+			libpath = util.find_library('z')
+		_loaded["ctypes"] = libpath and ctypes.cdll.LoadLibrary(libpath)
+
+	if _loaded["ctypes"]:
+		return _loaded["ctypes"].crc32_combine(crc1, crc2, len2)
 	else:
 		raise RuntimeError("zlib not found")
 
+# _operators[k] applies 2**k zero bytes to a CRC: the GF(2) matrix as
+# four 256 entry tables, one for each byte of the CRC it is applied to
+_operators = []
+_matrices = []
+_operators_lock = threading.Lock()
+
+def _matrix_times(matrix, vector):
+	number_sum = 0
+	matrix_index = 0
+	while vector != 0:
+		if vector & 1:
+			number_sum ^= matrix[matrix_index]
+		vector = vector >> 1 & 0x7FFFFFFF
+		matrix_index += 1
+	return number_sum
+
+def _matrix_square(matrix):
+	return [_matrix_times(matrix, matrix[n]) for n in range(0, 32)]
+
+def _byte_tables(matrix):
+	"""The column for the lowest set bit of each byte value is added to
+	the entry for the value without that bit."""
+	tables = []
+	for shift in (0, 8, 16, 24):
+		table = [0] * 256
+		for value in range(1, 256):
+			low = value & -value
+			table[value] = (table[value ^ low] ^
+			                matrix[shift + low.bit_length() - 1])
+		tables.append(table)
+	return tables
+
+def _zero_operator(power):
+	"""Returns the tables of the operator for 2**power zero bytes."""
+	if len(_operators) > power:
+		return _operators[power]
+	with _operators_lock:
+		while len(_operators) <= power:
+			if not _matrices:
+				# operator for one zero bit: CRC-32 polynomial, 1, 2, 4, ...
+				matrix = [0xedb88320] + [1 << i for i in range(0, 31)]
+				for _ in range(3):  # one zero byte is eight zero bits
+					matrix = _matrix_square(matrix)
+			else:
+				matrix = _matrix_square(_matrices[-1])
+			_matrices.append(matrix)
+			_operators.append(_byte_tables(matrix))
+	return _operators[power]
+
+def _apply_zeros(crc, length):
+	"""Returns the CRC after length zero bytes have been appended."""
+	power = 0
+	while length:
+		if length & 1:
+			t0, t1, t2, t3 = _zero_operator(power)
+			crc = (t0[crc & 0xFF] ^ t1[crc >> 8 & 0xFF] ^
+			       t2[crc >> 16 & 0xFF] ^ t3[crc >> 24 & 0xFF])
+		length >>= 1
+		power += 1
+	return crc
+
 def crc32_combine(crc1, crc2, len2):
 	"""Explanation algorithm: http://stackoverflow.com/a/23126768/654160
 	crc32(crc32(0, seq1, len1), seq2, len2) == crc32_combine(
-        crc32(0, seq1, len1), crc32(0, seq2, len2), len2)"""
+        crc32(0, seq1, len1), crc32(0, seq2, len2), len2)
+	The zero operators for the powers of two of len2 are cached tables."""
 	# degenerate case (also disallow negative lengths)
 	if len2 <= 0:
 		return crc1
-
-	# put operator for one zero bit in odd
-	# CRC-32 polynomial, 1, 2, 4, 8, ..., 1073741824
-	odd = [0xedb88320] + [1 << i for i in range(0, 31)]
-	even = [0] * 32
-
-	def matrix_times(matrix, vector):
-		number_sum = 0
-		matrix_index = 0
-		while vector != 0:
-			if vector & 1:
-				number_sum ^= matrix[matrix_index]
-			vector = vector >> 1 & 0x7FFFFFFF
-			matrix_index += 1
-		return number_sum
-
-	# put operator for two zero bits in even - gf2_matrix_square(even, odd)
-	even[:] = [matrix_times(odd, odd[n]) for n in range(0, 32)]
-
-	# put operator for four zero bits in odd
-	odd[:] = [matrix_times(even, even[n]) for n in range(0, 32)]
-
-	# apply len2 zeros to crc1 (first square will put the operator for one
-	# zero byte, eight zero bits, in even)
-	while len2 != 0:
-		# apply zeros operator for this bit of len2
-		even[:] = [matrix_times(odd, odd[n]) for n in range(0, 32)]
-		if len2 & 1:
-			crc1 = matrix_times(even, crc1)
-		len2 >>= 1
-
-		# if no more bits set, then done
-		if len2 == 0:
-			break
-
-		# another iteration of the loop with odd and even swapped
-		odd[:] = [matrix_times(even, even[n]) for n in range(0, 32)]
-		if len2 & 1:
-			crc1 = matrix_times(odd, crc1)
-		len2 >>= 1
-
-		# if no more bits set, then done
-	# return combined crc
-	crc1 ^= crc2
-	return crc1
+	return _apply_zeros(crc1 & 0xFFFFFFFF, len2) ^ (crc2 & 0xFFFFFFFF)
+
+def crc32_combine_many(parts, crc=0):
+	"""Joins the CRCs of consecutive pieces of data.
+	parts: (crc32, length) pairs in the order of the data
+	crc: CRC of the data before the first part"""
+	crc &= 0xFFFFFFFF
+	for part_crc, length in parts:
+		if length > 0:
+			crc = _apply_zeros(crc, length) ^ (part_crc & 0xFFFFFFFF)
+	return crc
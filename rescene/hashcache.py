@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2026 pyReScene
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+"""Persistent cache of the hashes of files on disk.
+
+Hashing the same multi-gigabyte files again for each tool and each run is
+slow. HashCache keeps the CRC32 and OSO hash of a file in an SQLite
+database in ~/.cache/pyrescene. An entry is keyed by the device, inode,
+size and modification time of the file and is only used while all four
+stay the same. Entries that were not used for MAX_AGE seconds are removed,
+and the least recently used ones when there are more than MAX_ENTRIES.
+
+The command line tools enable one shared cache for the whole run.
+calculate_crc32() and the verification of extracted files use it then:
+
+	hashcache.enable()
+	crc = calculate_crc32("movie.mkv")  # hashed once, then cached
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+MAX_AGE = 180 * 24 * 60 * 60  # seconds an unused entry is kept
+MAX_ENTRIES = 1000000
+CACHE_FILE = "hashes.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hash (
+	dev INTEGER NOT NULL,
+	inode INTEGER NOT NULL,
+	size INTEGER NOT NULL,
+	mtime_ns INTEGER NOT NULL,
+	crc32 INTEGER,
+	oso_hash TEXT,
+	used REAL NOT NULL,
+	PRIMARY KEY (dev, inode, size, mtime_ns)
+);
+CREATE INDEX IF NOT EXISTS hash_used ON hash(used);
+"""
+
+def file_key(stat):
+	"""The file stays the same as long as this key does."""
+	mtime_ns = getattr(stat, "st_mtime_ns", None)
+	if mtime_ns is None:  # Python 2
+		mtime_ns = int(stat.st_mtime * 1000000000)
+	return (stat.st_dev, stat.st_ino, stat.st_size, mtime_ns)
+
+def cache_dir():
+	"""Directory of the cache of the user."""
+	if os.name == "nt" and os.environ.get("LOCALAPPDATA"):
+		base = os.environ["LOCALAPPDATA"]
+	else:
+		base = (os.environ.get("XDG_CACHE_HOME") or
+		        os.path.join(os.path.expanduser("~"), ".cache"))
+	return os.path.join(base, "pyrescene")
+
+class HashCache(object):
+	"""Hashes of files that did not change since they were calculated.
+	The cache can be shared by threads and by processes.
+	Use ":memory:" as cache_file to only cache for the current run."""
+	def __init__(self, cache_file=None):
+		if cache_file is None:
+			directory = cache_dir()
+			if not os.path.isdir(directory):
+				os.makedirs(directory)
+			cache_file = os.path.join(directory, CACHE_FILE)
+		# other processes can hold the write lock for a moment
+		self._db = sqlite3.connect(cache_file, timeout=60,
+		                           check_same_thread=False)
+		self._db.executescript(_SCHEMA)
+		self._lock = threading.Lock()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+	def close(self):
+		with self._lock:
+			if self._db is not None:
+				self._db.close()
+				self._db = None
+
+	def __len__(self):
+		with self._lock:
+			return self._db.execute("SELECT COUNT(*) FROM hash").fetchone()[0]
+
+	def _get(self, column, stat):
+		key = file_key(stat)
+		with self._lock:
+			row = self._db.execute("SELECT %s FROM hash WHERE dev = ? AND "
+				"inode = ? AND size = ? AND mtime_ns = ?" % column,
+				key).fetchone()
+			if row is None or row[0] is None:
+				return None
+			self._db.execute("UPDATE hash SET used = ? WHERE dev = ? AND "
+				"inode = ? AND size = ? AND mtime_ns = ?", (time.time(),) + key)
+			self._db.commit()
+			return row[0]
+
+	def _set(self, column, stat, value):
+		key = file_key(stat)
+		with self._lock:
+			self._db.execute("INSERT OR IGNORE INTO hash "
+				"(dev, inode, size, mtime_ns, used) VALUES (?, ?, ?, ?, ?)",
+				key + (time.time(),))
+			self._db.execute("UPDATE hash SET %s = ?, used = ? WHERE dev = ? "
+				"AND inode = ? AND size = ? AND mtime_ns = ?" % column,
+				(value, time.time()) + key)
+			self._db.commit()
+
+	def lookup(self, stat):
+		"""Returns the CRC32 of the file with this os.stat() result
+		or None when it is not cached."""
+		return self._get("crc32", stat)
+
+	def store(self, stat, crc):
+		"""stat: os.stat() result of the file from before it was hashed"""
+		self._set("crc32", stat, crc & 0xFFFFFFFF)
+
+	def lookup_oso(self, stat):
+		"""Returns the OSO hash of the file as hexadecimal string or None."""
+		return self._get("oso_hash", stat)
+
+	def store_oso(self, stat, oso_hash):
+		self._set("oso_hash", stat, oso_hash)
+
+	def evict(self, max_age=MAX_AGE, max_entries=MAX_ENTRIES):
+		"""Removes the entries not used for max_age seconds and the least
+		recently used ones above max_entries. Returns the amount removed."""
+		with self._lock:
+			removed = self._db.execute("DELETE FROM hash WHERE used < ?",
+				(time.time() - max_age,)).rowcount
+			removed += self._db.execute("DELETE FROM hash WHERE rowid IN "
+				"(SELECT rowid FROM hash ORDER BY used DESC LIMIT -1 "
+				"OFFSET ?)", (max_entries,)).rowcount
+			self._db.commit()
+			return removed
+
+_active = [None]
+
+def enable(cache_file=None):
+	"""Opens the cache shared by calculate_crc32() and the verification
+	of files for the rest of the run. Old entries are evicted first.
+	The cache is optional: returns None when it can't be opened."""
+	if _active[0] is None:
+		try:
+			cache = HashCache(cache_file)
+			cache.evict()
+		except (sqlite3.Error, OSError, IOError):
+			return None
+		_active[0] = cache
+	return _active[0]
+
+def disable():
+	"""Closes the shared cache."""
+	if _active[0] is not None:
+		_active[0].close()
+		_active[0] = None
+
+def active():
+	"""Returns the shared cache or None when it is not enabled."""
+	return _active[0]
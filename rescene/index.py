@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2026 pyReScene
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+"""Persistent index of SRR metadata.
+
+Parsing a large collection of SRR files again on every run is slow.
+SrrIndex keeps what rescene.info() returns in an SQLite database.
+An entry is reused as long as the path, modification time and size of the
+SRR file stay the same. Otherwise the file is parsed again.
+
+	with SrrIndex("srr.index") as index:
+		for srr_file in index.update_tree(["/srrs"]):
+			print(index.info(srr_file)["compression"])
+"""
+
+from __future__ import unicode_literals
+
+import os
+import sqlite3
+
+from rescene.main import info as srr_info, FileInfo, odict
+from rescene.utility import SfvEntry
+
+# entries are written in batches: one transaction per SRR is too slow
+COMMIT_INTERVAL = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS srr (
+	id INTEGER PRIMARY KEY,
+	path TEXT UNIQUE NOT NULL,
+	mtime REAL NOT NULL,
+	size INTEGER NOT NULL,
+	appname TEXT,
+	compression INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS file (
+	srr INTEGER NOT NULL REFERENCES srr(id) ON DELETE CASCADE,
+	kind TEXT NOT NULL,
+	seq INTEGER NOT NULL,
+	name TEXT NOT NULL,
+	size INTEGER,
+	crc32 TEXT,
+	compression INTEGER,
+	orig_name BLOB,
+	offset_start INTEGER,
+	offset_end INTEGER
+);
+CREATE INDEX IF NOT EXISTS file_srr ON file(srr);
+CREATE INDEX IF NOT EXISTS file_crc ON file(crc32);
+CREATE TABLE IF NOT EXISTS oso_hash (
+	srr INTEGER NOT NULL REFERENCES srr(id) ON DELETE CASCADE,
+	seq INTEGER NOT NULL,
+	name TEXT NOT NULL,
+	hash TEXT NOT NULL,
+	size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS oso_hash_srr ON oso_hash(srr);
+CREATE TABLE IF NOT EXISTS sfv_comment (
+	srr INTEGER NOT NULL REFERENCES srr(id) ON DELETE CASCADE,
+	seq INTEGER NOT NULL,
+	line TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sfv_comment_srr ON sfv_comment(srr);
+"""
+
+# values of the "kind" column and the info() keys they belong to
+STORED = "stored"
+RAR = "rar"
+ARCHIVED = "archived"
+RECOVERY = "recovery"
+SFV = "sfv"
+
+class SrrIndex(object):
+	"""On-disk index of the information rescene.info() returns.
+	Use ":memory:" as index_file to only cache for the current run."""
+	def __init__(self, index_file=":memory:"):
+		self._db = sqlite3.connect(index_file)
+		self._db.execute("PRAGMA foreign_keys = ON")
+		self._db.executescript(_SCHEMA)
+		self._pending = 0
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+	def close(self):
+		"""Writes the pending entries and closes the database."""
+		if self._db is not None:
+			self._db.commit()
+			self._db.close()
+			self._db = None
+
+	def commit(self):
+		self._db.commit()
+		self._pending = 0
+
+	def __contains__(self, srr_file):
+		return self._lookup(os.path.abspath(srr_file)) is not None
+
+	def __len__(self):
+		return self._db.execute("SELECT COUNT(*) FROM srr").fetchone()[0]
+
+	def _lookup(self, path):
+		return self._db.execute("SELECT id, mtime, size FROM srr "
+		                        "WHERE path = ?", (path,)).fetchone()
+
+	def update(self, srr_file, known=None):
+		"""Parses the SRR file again when it changed since it was indexed.
+		Returns the id of the entry and whether the file got parsed.
+		known: (id, mtime, size) of the current entry, if already queried"""
+		path = os.path.abspath(srr_file)
+		stat = os.stat(path)
+		if known is None:
+			known = self._lookup(path)
+		if (known is not None and known[1] == stat.st_mtime and
+		    known[2] == stat.st_size):
+			return known[0], False
+
+		data = srr_info(path)
+		if known is not None:
+			self._db.execute("DELETE FROM srr WHERE id = ?", (known[0],))
+		srr_id = self._insert(path, stat, data)
+		self._pending += 1
+		if self._pending >= COMMIT_INTERVAL:
+			self.commit()
+		return srr_id, True
+
+	def update_tree(self, paths):
+		"""Indexes all SRR files in the given files and directories.
+		Yields the path of each SRR file after it is up to date."""
+		known = dict((row[0], row[1:]) for row in self._db.execute(
+			"SELECT path, id, mtime, size FROM srr"))
+		for element in paths:
+			element = os.path.abspath(element)
+			if os.path.isdir(element):
+				for dirpath, _dirnames, filenames in os.walk(element):
+					for fname in sorted(filenames):
+						if fname.lower().endswith(".srr"):
+							path = os.path.join(dirpath, fname)
+							self.update(path, known.get(path))
+							yield path
+			elif os.path.isfile(element):
+				self.update(element, known.get(element))
+				yield element
+		self.commit()
+
+	def prune(self):
+		"""Removes the entries of SRR files that no longer exist.
+		Returns the number of removed entries."""
+		gone = [(row[0],) for row in self._db.execute(
+			"SELECT id, path FROM srr") if not os.path.isfile(row[1])]
+		self._db.executemany("DELETE FROM srr WHERE id = ?", gone)
+		self.commit()
+		return len(gone)
+
+	def srr_files(self):
+		"""Returns the paths of all indexed SRR files."""
+		return [row[0] for row in
+		        self._db.execute("SELECT path FROM srr ORDER BY path")]
+
+	def find_crc(self, crc32):
+		"""Returns (SRR path, archived file name) tuples of the archived
+		files with the given CRC32 hash."""
+		return self._db.execute(
+			"SELECT srr.path, file.name FROM file "
+			"JOIN srr ON srr.id = file.srr "
+			"WHERE file.kind = ? AND file.crc32 = ? ORDER BY srr.path",
+			(ARCHIVED, "%08X" % int(crc32, 16))).fetchall()
+
+	def info(self, srr_file):
+		"""Same dictionary rescene.info() returns. The SRR file is only
+		parsed when the index does not have an up-to-date entry."""
+		srr_id, _parsed = self.update(srr_file)
+		return self._load(srr_id)
+
+	def _insert(self, path, stat, data):
+		cursor = self._db.execute(
+			"INSERT INTO srr (path, mtime, size, appname, compression) "
+			"VALUES (?, ?, ?, ?, ?)", (path, stat.st_mtime, stat.st_size,
+			data["appname"], int(bool(data["compression"]))))
+		srr_id = cursor.lastrowid
+
+		rows = []
+		def add(kind, seq, f, crc32=None, compression=None,
+		        orig_name=None, offsets=(None, None)):
+			rows.append((srr_id, kind, seq, f.file_name, f.file_size,
+			             crc32, compression, orig_name) + offsets)
+		for seq, f in enumerate(data["stored_files"].values()):
+			add(STORED, seq, f)
+		for seq, f in enumerate(data["rar_files"].values()):
+			add(RAR, seq, f, getattr(f, "crc32", None), offsets=(
+			    f.offset_start_rar, getattr(f, "offset_end_rar", None)))
+		for seq, f in enumerate(data["archived_files"].values()):
+			add(ARCHIVED, seq, f, f.crc32, int(f.compression),
+			    sqlite3.Binary(f.orig_filename))
+		if data["recovery"]:
+			add(RECOVERY, 0, data["recovery"])
+		for seq, e in enumerate(data["sfv_entries"]):
+			rows.append((srr_id, SFV, seq, e.file_name, None, e.crc32,
+			             None, None, None, None))
+		self._db.executemany("INSERT INTO file VALUES "
+		                     "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+		self._db.executemany("INSERT INTO oso_hash VALUES (?, ?, ?, ?, ?)",
+			[(srr_id, seq, name, oso_hash, size) for seq, (name, oso_hash, size)
+			 in enumerate(data["oso_hashes"])])
+		self._db.executemany("INSERT INTO sfv_comment VALUES (?, ?, ?)",
+			[(srr_id, seq, line) for seq, line
+			 in enumerate(data["sfv_comments"])])
+		return srr_id
+
+	def _load(self, srr_id):
+		appname, compression = self._db.execute(
+			"SELECT appname, compression FROM srr WHERE id = ?",
+			(srr_id,)).fetchone()
+		result = {"appname": appname,
+		          "stored_files": odict(),
+		          "rar_files": odict(),
+		          "archived_files": odict(),
+		          "recovery": None,
+		          "sfv_entries": [],
+		          "sfv_comments": [],
+		          "compression": bool(compression),
+		          "oso_hashes": []}
+
+		for (kind, name, size, crc32, compr, orig_name, start, end) in \
+			self._db.execute("SELECT kind, name, size, crc32, compression, "
+			"orig_name, offset_start, offset_end FROM file "
+			"WHERE srr = ? ORDER BY kind, seq", (srr_id,)):
+			if kind == SFV:
+				result["sfv_entries"].append(SfvEntry(name, crc32))
+				continue
+			f = FileInfo()
+			f.file_name = name
+			f.file_size = size
+			if kind == STORED:
+				result["stored_files"][name] = f
+			elif kind == RAR:
+				f.key = os.path.basename(name.lower())
+				f.offset_start_rar = start
+				if end is not None:
+					f.offset_end_rar = end
+				if crc32 is not None:
+					f.crc32 = crc32
+				result["rar_files"][f.key] = f
+			elif kind == ARCHIVED:
+				f.unicode_filename = name
+				f.orig_filename = bytes(orig_name)
+				f.compression = bool(compr)
+				f.crc32 = crc32
+				result["archived_files"][name] = f
+			elif kind == RECOVERY:
+				result["recovery"] = f
+
+		result["oso_hashes"] = [tuple(row) for row in self._db.execute(
+			"SELECT name, hash, size FROM oso_hash WHERE srr = ? "
+			"ORDER BY seq", (srr_id,))]
+		result["sfv_comments"] = [row[0] for row in self._db.execute(
+			"SELECT line FROM sfv_comment WHERE srr = ? ORDER BY seq",
+			(srr_id,))]
+		return result
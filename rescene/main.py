@@ -42,10 +42,13 @@ import re
 
 import hashlib
 import collections
+import mmap
+import struct
 
 import time
 import shutil
 import subprocess
+from multiprocessing.pool import ThreadPool
 
 import rescene
 from rescene.rar import (BlockType, RarReader,
@@ -60,6 +63,7 @@ from rescene.utility import basestring, fsunicode
 from rescene.utility import decodetext, encodeerrors
 from rescene.utility import capitalized_fn
 from rescene.osohash import osohash_from
+from rescene.crc32combine import crc32_combine
 from rescene.utility import FileType
 
 # compatibility with 2.x
@@ -125,7 +129,7 @@ class MsgCode(object):
 	MSG, OS_ERROR, NO_OVERWRITE, NO_EXTRACTION, DUPE, STORING, FILE_NOT_FOUND,\
 	NO_FILES, DEL_STORED_FILE, RENAME_FILE, CMT, AV, ACL, AUTHENTCITY, \
 	NO_RAR, BLOCK, FBLOCK, RBLOCK, COMPRESSION, UNSUPPORTED_FLAG, CRC,  \
-	USER_ABORTED, AUTO_LOCATE, UNKNOWN = list(range(24))
+	USER_ABORTED, AUTO_LOCATE, UNKNOWN, VERIFY = list(range(25))
 	
 	# informative messages not printed to stderr
 	informative = [MSG, STORING, DEL_STORED_FILE,
@@ -981,7 +985,7 @@ def info(srr_file):
 	compression = False     # RAR compression on some files
 	oso_hashes = []
 
-	for block in RarReader(srr_file).read_all():
+	for block in RarReader(srr_file, use_mmap=True).read_all():
 		add_size = True
 		if block.rawtype == BlockType.SrrHeader:
 			appname = block.appname
@@ -1141,23 +1145,68 @@ def content_hash(srr_file, algorithm='sha1'):
 	hash is based on the sorted RAR metadata.
 	Exact behavior?
 	 -> sort on lower case RAR names (no paths)
-	Can be used to detect doubles."""
-	rar_files = info(srr_file)["rar_files"]
-	m = hashlib.new(algorithm)
-	with open(srr_file, 'rb') as sfile:
+	Can be used to detect doubles.
+	
+	The SRR file is read only once: the ranges of RAR metadata are
+	collected while iterating the blocks (same ranges as info() uses)
+	and then hashed from the same open file or memory map."""
+	ranges = {}
+	current = None  # [start, end] of the RAR metadata being counted
+	reader = RarReader(srr_file, use_mmap=True)
+	try:
+		for block in reader:
+			if block.rawtype == BlockType.SrrRarFile:
+				key = os.path.basename(block.file_name.lower())
+				current = [block.block_position + block.header_size, None]
+				ranges[key] = current
+			elif block.rawtype in (BlockType.SrrHeader,
+			                       BlockType.SrrStoredFile,
+			                       BlockType.SrrOsoHash):
+				current = None  # end the range
+			if current:
+				current[1] = block.block_position + block.header_size
+		
+		m = hashlib.new(algorithm)
 		# sort based on file name without path
 		# the difference in capitals is ignored
-		for key in sorted(rar_files.keys()):
-			start = rar_files[key].offset_start_rar
-			try:
-				end = rar_files[key].offset_end_rar
-				amount = end - start
-			except AttributeError:
-				amount = -1 # read until EOF
-			sfile.seek(start)
-			data = sfile.read(amount)
-			m.update(data)
-	return m.hexdigest()
+		for key in sorted(ranges.keys()):
+			start, end = ranges[key]
+			m.update(reader.read_range(start, end))
+		return m.hexdigest()
+	finally:
+		reader.close()
+
+def _content_hash_task(args):
+	srr_file, algorithm = args
+	try:
+		return srr_file, content_hash(srr_file, algorithm)
+	except (EnvironmentError, ValueError) as err:
+		return srr_file, err
+
+def content_hashes(srr_files, algorithm='sha1', processes=None):
+	"""Calculates content_hash() for many SRR files in a process pool.
+	Yields (srr_file, hash) tuples in the order of srr_files.
+	The hash is the exception instead when the SRR could not be read.
+	processes: number of worker processes; default: number of CPUs"""
+	import multiprocessing
+	pool = multiprocessing.Pool(processes)
+	try:
+		tasks = ((srr_file, algorithm) for srr_file in srr_files)
+		for result in pool.imap(_content_hash_task, tasks, chunksize=64):
+			yield result
+	finally:
+		pool.terminate()
+		pool.join()
+
+def find_doubles(srr_files, algorithm='sha1', processes=None):
+	"""Groups SRR files with the same content_hash().
+	Returns a list of lists with at least two SRR files each.
+	SRR files that could not be read are left out."""
+	groups = odict()
+	for srr_file, srr_hash in content_hashes(srr_files, algorithm, processes):
+		if isinstance(srr_hash, basestring):
+			groups.setdefault(srr_hash, []).append(srr_file)
+	return [group for group in groups.values() if len(group) > 1]
 	
 def print_details(file_path):
 	"""Prints complete analysis and info to byte level."""
@@ -1184,7 +1233,7 @@ class RarMtSettings(object):
 def reconstruct(srr_file, in_folder, out_folder, extract_paths=True, hints={},
 				skip_rar_crc=False, auto_locate_renamed=False, empty=False,
 				rar_executable_dir=None, tmp_dir=None, extract_files=True,
-				srr_part="", rar_mt=None):
+				srr_part="", rar_mt=None, jobs=1):
 	"""
 	srr_file: SRR file of the archives that need to be rebuild
 	in_folder: root folder in which we start looking for the files
@@ -1200,6 +1249,8 @@ def reconstruct(srr_file, in_folder, out_folder, extract_paths=True, hints={},
 	extract_files: if set, extract additional files stored in the srr
 	srr_part: string with volume(s) to reconstruct
 	rar_mt: object with settings for the rar -mt parameter
+	jobs: amount of RAR volumes to rebuild at the same time
+	      (only for archives with stored files: m0)
 	"""
 	rar_name = ""
 	ofile = ""
@@ -1232,6 +1283,15 @@ def reconstruct(srr_file, in_folder, out_folder, extract_paths=True, hints={},
 			return False
 	
 	blocks = RarReader(srr_file).read_all()
+	if jobs > 1:
+		if not any(b.rawtype == BlockType.RarPackedFile and b.is_compressed()
+		           for b in blocks):
+			return _reconstruct_parallel(blocks, in_folder, out_folder,
+				extract_paths, hints, skip_rar_crc, auto_locate_renamed,
+				empty, extract_files, srr_part, jobs)
+		_fire(MsgCode.MSG, message="Compressed RAR archives are "
+		      "reconstructed one volume at a time.")
+
 	for block in blocks:
 		_fire(MsgCode.BLOCK, message="RAR Block",
 			  type=block.rawtype, size=block.header_size)
@@ -1389,6 +1449,196 @@ def reconstruct(srr_file, in_folder, out_folder, extract_paths=True, hints={},
 		
 	temp_folder_cleanup()
 
+class _VolumePlan(object):
+	"""A RAR volume that can be rebuild independently of the other volumes.
+	
+	ofile: path of the volume to create
+	rebuild_recovery: the recovery records were removed from the SRR
+	blocks: list of (block, source) tuples in the order they are written
+	        source: (path of the archived file, offset) for RarPackedFile
+	        blocks, None otherwise. A path of None means null bytes.
+	crcs: CRC32 of the data of each RarPackedFile block after rebuilding
+	"""
+	def __init__(self, ofile, rebuild_recovery):
+		self.ofile = ofile
+		self.rebuild_recovery = rebuild_recovery
+		self.blocks = []
+		self.crcs = []
+
+def _plan_volumes(blocks, in_folder, out_folder, extract_paths, hints,
+                  auto_locate_renamed, empty, extract_files, srr_part):
+	"""Walks the SRR blocks once and determines for every RAR volume
+	which data needs to come from where. The offset of each piece inside
+	its archived file follows from the packed sizes of the preceding blocks.
+	Returns (plans, file_checks) or None when the user aborted.
+	file_checks: list of (last block, pieces) for the archived files
+	             pieces: (plan, CRC index, data length) for each volume
+	"""
+	plans = []
+	file_checks = []
+	plan = None
+	rar_name = ""
+	skip_volume = False
+	source_name = None
+	source = None  # path of the archived file, None for null bytes
+	source_size = 0
+	offset = 0
+	pieces = []
+	partial_reconstruction = srr_part != "" and srr_part is not None
+
+	for block in blocks:
+		_fire(MsgCode.BLOCK, message="RAR Block",
+			  type=block.rawtype, size=block.header_size)
+		if block.rawtype == BlockType.SrrHeader:
+			_flag_check_srr(block)
+			_fire(MsgCode.MSG, message="SRR file created with %s." %
+				  block.appname)
+		elif block.rawtype == BlockType.SrrStoredFile:
+			_flag_check_srr(block)
+			if extract_files:
+				_extract(block, _opath(block, extract_paths, out_folder))
+		elif block.rawtype == BlockType.SrrRarFile:
+			_flag_check_srr(block)
+			skip_volume = False
+			if partial_reconstruction:
+				if not block.file_name.endswith(srr_part):
+					skip_volume = True
+				if (srr_part.endswith("*") and
+				    block.file_name.startswith(srr_part[:-1])):
+					skip_volume = False
+			if skip_volume:
+				plan = None
+			elif rar_name != block.file_name:
+				rar_name = block.file_name
+				ofile = _opath(block, extract_paths, out_folder)
+				if not can_overwrite(ofile):
+					_fire(MsgCode.USER_ABORTED,
+						message="Operation aborted. Archive already exists.")
+					return None
+				_fire(MsgCode.MSG, message="Re-creating RAR file: %s" %
+					os.path.basename(ofile))
+				if not os.path.isdir(os.path.dirname(ofile)):
+					os.makedirs(os.path.dirname(ofile))
+				plan = _VolumePlan(ofile, (block.flags &
+					SrrRarFileBlock.RECOVERY_BLOCKS_REMOVED) != 0)
+				plans.append(plan)
+		elif block.rawtype == BlockType.RarPackedFile:
+			if source_name != block.file_name:
+				source_name = block.file_name
+				offset = 0
+				pieces = []
+				if block.flags & block.DIRECTORY == block.DIRECTORY:
+					source = None
+					source_size = block.unpacked_size
+				else:
+					try:
+						source = _locate_file(block, in_folder,
+						                      hints, auto_locate_renamed)
+						source_size = os.path.getsize(source)
+					except FileNotFound:
+						if not empty:
+							raise
+						_fire(MsgCode.MSG,
+							message="File not found, using fake file.")
+						source = None
+						source_size = block.unpacked_size
+			# bytes beyond the end of the archived file are null padding
+			length = min(block.packed_size, max(0, source_size - offset))
+			if plan:
+				_fire(MsgCode.BLOCK, message="RAR Packed File Block",
+					  file_name=block.file_name,
+					  packed_size=block.packed_size)
+				plan.blocks.append((block, (source, offset)))
+				pieces.append((plan, len(plan.blocks) - 1, length))
+			else:
+				pieces.append(None)  # the whole file can't be checked
+			offset += block.packed_size
+			if block.flags & RarPackedFileBlock.SPLIT_AFTER == 0:
+				file_checks.append((block, pieces))
+		elif block.rawtype == BlockType.SrrOsoHash:
+			pass
+		elif (BlockType.RarMin <= block.rawtype <= BlockType.RarMax or
+			(block.rawtype == 0x00 and block.header_size == 20) or
+			block.rawtype == BlockType.SrrRarPadding):
+			# includes recovery blocks: those are handled by the worker
+			if plan:
+				plan.blocks.append((block, None))
+		else:
+			_fire(MsgCode.UNKNOWN, message="Warning: Unknown block type "
+				  "%#x encountered in SRR file, consisting of %d bytes. "
+				  "This block will be skipped." %
+				  (block.rawtype, block.header_size))
+	return plans, file_checks
+
+def _rebuild_volume(plan, skip_rar_crc):
+	"""Writes a single planned RAR volume with its own file handles.
+	The CRC of each piece of archived file data is stored in the plan."""
+	with open(plan.ofile, "w+b") as rarfs:
+		for block, source in plan.blocks:
+			if block.rawtype == BlockType.RarPackedFile:
+				rarfs.write(block.block_bytes())
+				src, offset = source
+				if src is None:
+					srcfs = FakeFile(block.unpacked_size)
+				else:
+					srcfs = open(src, "rb")
+				try:
+					if offset:
+						srcfs.seek(offset)
+					crc = _repack(block, rarfs, None, srcfs, 0, skip_rar_crc,
+					              check_file_end=False)
+				finally:
+					srcfs.close()
+				plan.crcs.append(crc)
+			elif _is_recovery(block):
+				if block.recovery_sectors > 0 and plan.rebuild_recovery:
+					_write_recovery_record(block, rarfs)
+				else:
+					rarfs.write(block.block_bytes())
+				plan.crcs.append(None)
+			elif block.rawtype == BlockType.SrrRarPadding:
+				rarfs.write(block.block_bytes()[block.header_size:])
+				plan.crcs.append(None)
+			else:
+				rarfs.write(block.block_bytes())
+				plan.crcs.append(None)
+
+def _reconstruct_parallel(blocks, in_folder, out_folder, extract_paths, hints,
+                          skip_rar_crc, auto_locate_renamed, empty,
+                          extract_files, srr_part, jobs):
+	"""Rebuilds all volumes of a stored RAR set at the same time.
+	See reconstruct() for the parameters."""
+	result = _plan_volumes(blocks, in_folder, out_folder, extract_paths,
+	                       hints, auto_locate_renamed, empty, extract_files,
+	                       srr_part)
+	if result is None:
+		return -1
+	plans, file_checks = result
+	if not plans:
+		return
+
+	pool = ThreadPool(min(jobs, len(plans)))
+	try:
+		pool.map(lambda plan: _rebuild_volume(plan, skip_rar_crc), plans)
+	finally:
+		pool.close()
+		pool.join()
+
+	if skip_rar_crc:
+		return
+	# the CRC of the last block is calculated over the whole archived file
+	for block, pieces in file_checks:
+		if None in pieces or block.is_compressed():
+			continue
+		running_crc = 0
+		for plan, index, length in pieces:
+			running_crc = crc32_combine(running_crc, plan.crcs[index], length)
+		if block.file_crc != running_crc & 0xffffffff:
+			_fire(MsgCode.CRC,
+				message="CRC mismatch in file: %s" % block.file_name)
+			print("%08x %08x" % (block.file_crc, running_crc & 0xffffffff),
+				  block.file_name, pieces[-1][0].ofile)
+
 def _write_recovery_record(block, rarfs):
 	"""block: original rar recovery block from SRR
 	rarfs: partially reconstructed RAR file used for constructing and adding RR
@@ -1410,45 +1660,44 @@ def _write_recovery_record(block, rarfs):
 		  recovery_sectors=block.recovery_sectors,
 		  protected_sectors=block.data_sectors)
 
-	rs_slice = 0
-	current_sector = 0	
-	crc = [0] * (protected_sectors * 2)
-	rs = [0] * recovery_sectors # [0, 0, ..., 0]
-
+	rarfs.flush()
 	rarfs.seek(0, os.SEEK_END) # move relative to end of file
 	rar_length = rarfs.tell()
 	assert rar_length != 0 # you can't calculate stuff on nothing
-	rarfs.seek(0)
-	
-	count = 0
-	while count < rar_length:
-		count += 512
-		
-		# Read data one sector at a time.  Pad the last sector with 0's.
-		sector = rarfs.read(512)
-		if len(sector) != 512:
-			# Before Python 3, crc32() does not accept a
-			# bytearray(), and bytes(int) does not make a string
-			# of zeros
-			sector += bytes(bytearray(512 - len(sector)))
-		# assert len(sector) == 512
-
-		# calculate the crc32 for the sector and store the 2 low-order bytes
-		sector_crc = ~zlib.crc32(sector) & 0xffff # Bitwise Inversion
-		crc[current_sector*2] = sector_crc & 0xff
-		crc[current_sector*2+1] = sector_crc >> 8
-		current_sector += 1
-
-		# update the recovery sector parity data for this slice
-		rs[rs_slice] ^= int_from_bytes_big(sector)
-		rs_slice = rs_slice + 1 if (rs_slice + 1) % recovery_sectors else 0
+	sector_count = (rar_length + 511) // 512
+
+	# Sector i belongs to slice i % recovery_sectors. One row of
+	# recovery_sectors consecutive sectors has one sector of each slice,
+	# so xor-ing all rows as one big number calculates all parity sectors
+	# at once. The last sector and row are padded with 0's.
+	row_size = 512 * recovery_sectors
+	rs = 0
+	crc = []
+	mapped = mmap.mmap(rarfs.fileno(), rar_length, access=mmap.ACCESS_READ)
+	try:
+		for row_start in range(0, rar_length, row_size):
+			row = mapped[row_start:row_start + row_size]
+			if len(row) != row_size:
+				# Before Python 3, bytes(int) does not make a string of zeros
+				row += bytes(bytearray(row_size - len(row)))
+			rs ^= int_from_bytes_big(row)
+
+			# the 2 low-order bytes of the crc32 of each sector
+			for offset in range(0, row_size, 512):
+				if len(crc) == sector_count:
+					break
+				sector_crc = ~zlib.crc32(row[offset:offset + 512]) & 0xffff
+				crc.append(sector_crc)
+	finally:
+		mapped.close()
+	crc.extend([0] * (protected_sectors - len(crc)))
+
 	# https://lists.ubuntu.com/archives/bazaar/2007q1/023524.html
 	rarfs.seek(0, 2) # prevent IOError: [Errno 0] Error on Windows
 	
 	rarfs.write(block.block_bytes())  # write the backed-up block header,
-	rarfs.write(bytearray(crc))	      # CRC data and
-	for sector in rs:                 # recovery sectors
-		rarfs.write(int_to_bytes_big(sector, 512))
+	rarfs.write(struct.pack("<%dH" % len(crc), *crc))  # CRC data and
+	rarfs.write(int_to_bytes_big(rs, row_size))  # recovery sectors
 
 def _locate_file(block, in_folder, hints, auto_locate_renamed):
 	"""
@@ -1505,15 +1754,30 @@ def _auto_locate_renamed(name, size, in_folder):
 				return f
 	return ""
 		
-def _repack(block, rarfs, in_folder, srcfs, running_crc, skip_rar_crc):
+def _repack(block, rarfs, in_folder, srcfs, running_crc, skip_rar_crc,
+            check_file_end=True):
 	"""
 	Adds a file to the RAR archive.
 	running_crc: CRC of the bytes used in packaging the file
 	skip_rar_crc: whether to display CRC warnings
+	check_file_end: compare running_crc with the CRC of the whole file
+	                when the last block of the file is reached
 	"""
 	bytes_copied_inc = 0
 	file_crc = 0  # CRC of the file inside a single RAR volume
 
+	# let the OS copy the data when both are regular files
+	bytes_read = _kernel_copy(srcfs, rarfs, block.packed_size)
+	if bytes_read is not None:
+		if not skip_rar_crc:
+			running_crc, file_crc = _crc32_mapped(srcfs,
+				srcfs.tell() - bytes_read, bytes_read, running_crc)
+		if bytes_read != block.packed_size:
+			rarfs.write(bytearray(block.packed_size - bytes_read))
+			print("Crappy release group. Adding %d zero bytes." %
+			      (block.packed_size - bytes_read))
+		bytes_copied_inc = block.packed_size
+
 	while bytes_copied_inc < block.packed_size:
 		# grab the correct amount of data from the extracted file
 		bytes_to_copy = block.packed_size - bytes_copied_inc
@@ -1549,7 +1813,8 @@ def _repack(block, rarfs, in_folder, srcfs, running_crc, skip_rar_crc):
 			_fire(MsgCode.CRC, message=msg)
 			print("%08x %08x" % (block.file_crc, file_crc & 0xffffffff), 
 				  rarfs.name)
-		elif file_end() and running_crc_fail() and not block.is_compressed():
+		elif (check_file_end and file_end() and running_crc_fail() and
+		      not block.is_compressed()):
 			# running_crc is on compressed data, so not applicable there
 			msg = "CRC mismatch in file: %s" % block.file_name
 			_fire(MsgCode.CRC, message=msg)
@@ -1558,6 +1823,77 @@ def _repack(block, rarfs, in_folder, srcfs, running_crc, skip_rar_crc):
 			
 	return running_crc
 
+def _kernel_copy(srcfs, rarfs, amount):
+	"""Copies amount bytes from the current position of srcfs to rarfs
+	without passing the data through Python. (os.copy_file_range or
+	os.sendfile) The positions of both file objects are moved forward.
+	Returns the number of bytes copied: less than amount when the end of
+	srcfs is reached. Returns None when srcfs or rarfs is not a regular
+	file or when the operating system does not support it."""
+	copy_file_range = getattr(os, "copy_file_range", None)
+	sendfile = getattr(os, "sendfile", None)
+	if not copy_file_range and not sendfile:
+		return None
+	try:
+		src_fd = srcfs.fileno()
+		dest_fd = rarfs.fileno()
+	except (AttributeError, EnvironmentError, ValueError):
+		# io.UnsupportedOperation for FakeFile, CompressedRarFile,...
+		return None
+
+	rarfs.flush()
+	src_offset = srcfs.tell()
+	dest_offset = rarfs.tell()
+	copied = 0
+	while copied < amount:
+		try:
+			if copy_file_range:
+				count = copy_file_range(src_fd, dest_fd, amount - copied,
+				                        src_offset + copied,
+				                        dest_offset + copied)
+			else:
+				os.lseek(dest_fd, dest_offset + copied, os.SEEK_SET)
+				count = sendfile(dest_fd, src_fd, src_offset + copied,
+				                 amount - copied)
+		except OSError:
+			# EXDEV: different file systems on older kernels
+			# EINVAL, ENOSYS: not supported for these files
+			if copy_file_range and sendfile:
+				copy_file_range = None
+				continue
+			if not copied:
+				return None
+			raise
+		if count == 0:
+			break  # end of srcfs reached
+		copied += count
+	srcfs.seek(src_offset + copied)
+	rarfs.seek(dest_offset + copied)
+	return copied
+
+def _crc32_mapped(srcfs, offset, length, running_crc):
+	"""Calculates the CRC32 of a range of srcfs on the memory mapped file.
+	Returns a tuple: (running_crc updated with the range, range CRC)"""
+	crc = 0
+	if length <= 0:
+		return running_crc, crc
+	# the start of a mapping must be a multiple of the allocation granularity
+	start = offset - offset % mmap.ALLOCATIONGRANULARITY
+	mapped = mmap.mmap(srcfs.fileno(), offset + length - start,
+	                   access=mmap.ACCESS_READ, offset=start)
+	try:
+		with memoryview(mapped) as view:
+			position = offset - start
+			end = position + length
+			while position < end:
+				with view[position:min(position + 0x100000, end)] as chunk:
+					running_crc = zlib.crc32(chunk, running_crc)
+					crc = zlib.crc32(chunk, crc)
+				position += 0x100000
+	finally:
+		mapped.close()
+	return running_crc, crc
+
 def _flag_check_srr(block):
 	"""Checks whether or not the given block has flags set that are not
 	supported by this application."""
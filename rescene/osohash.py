@@ -23,8 +23,10 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import os
 import struct
 from rescene.rarstream import RarStream
+from rescene import hashcache
 
 def compute_hash(mfile):
 	"""
@@ -42,11 +44,20 @@ def compute_hash(mfile):
 	if hasattr(mfile, "seek"):  # supplied as a stream/open file handle
 		return _osorg_hash(mfile)
 	else:  # file on hard drive
+		cache = hashcache.active()
+		if cache is not None:
+			stat = os.stat(mfile)
+			oso_hash = cache.lookup_oso(stat)
+			if oso_hash is not None:
+				return (oso_hash, stat.st_size)
 		stream = open(mfile, mode="rb")
 		try:
-			return _osorg_hash(stream)
+			result = _osorg_hash(stream)
 		finally:
 			stream.close()
+		if cache is not None:
+			cache.store_oso(stat, result[0])
+		return result
 
 def osohash_from(rar_archive, enclosed_file=None, middle=False):
 	"""If enclosed_file is not supplied, the srr_hash will be calculated based
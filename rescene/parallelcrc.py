@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2026 pyReScene
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+"""CRC32 of large files calculated on several threads.
+
+The file is split into ranges that are hashed at the same time, each with
+its own file handle. zlib releases the GIL while it calculates, so the
+threads really run in parallel and the reads of the ranges overlap.
+The CRCs of the ranges are joined in file order with crc32_combine().
+
+	crc = crc32_file("movie.mkv")
+	crc = crc32_range("movie.rar", offset=3000, size=15000000)
+"""
+
+import os
+import zlib
+from multiprocessing.pool import ThreadPool
+
+from rescene.crc32combine import crc32_combine
+
+RANGE_SIZE = 64 * 1024 * 1024  # bytes hashed by one task
+READ_SIZE = 1024 * 1024
+THREADS = 4
+
+def _crc32_part(path, offset, size):
+	"""Returns the CRC32 of the range and the number of bytes read."""
+	crc = 0
+	read = 0
+	with open(path, "rb") as part:
+		part.seek(offset)
+		while read < size:
+			data = part.read(min(READ_SIZE, size - read))
+			if not data:
+				break  # the file is shorter than expected
+			crc = zlib.crc32(data, crc)
+			read += len(data)
+	return crc & 0xFFFFFFFF, read
+
+def crc32_range(path, offset=0, size=None, threads=THREADS,
+                range_size=RANGE_SIZE, progress=None):
+	"""Calculates the CRC32 of size bytes of the file starting at offset.
+	size: till the end of the file when None
+	progress: called with the number of bytes hashed so far
+	Raises EOFError when the file ends before offset + size."""
+	if size is None:
+		size = os.path.getsize(path) - offset
+	ranges = [(start, min(range_size, offset + size - start))
+	          for start in range(offset, offset + size, range_size)]
+
+	def part(arange):
+		return _crc32_part(path, *arange)
+
+	pool = None
+	if threads > 1 and len(ranges) > 1:
+		pool = ThreadPool(min(threads, len(ranges)))
+		results = pool.imap(part, ranges)
+	else:
+		results = (part(arange) for arange in ranges)
+	crc = 0
+	done = 0
+	try:
+		for (_start, length), (part_crc, read) in zip(ranges, results):
+			crc = crc32_combine(crc, part_crc, read)
+			done += read
+			if progress:
+				progress(done)
+			if read < length:
+				raise EOFError("%s ends at %d" % (path, offset + done))
+	finally:
+		if pool is not None:
+			pool.terminate()
+			pool.join()
+	return crc & 0xFFFFFFFF
+
+def crc32_file(path, threads=THREADS, progress=None):
+	"""Calculates the CRC32 of a whole file."""
+	return crc32_range(path, threads=threads, progress=progress)
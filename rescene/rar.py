@@ -39,6 +39,7 @@
 
 from __future__ import absolute_import, print_function, division
 import io
+import mmap
 import struct
 import os
 import sys
@@ -90,21 +91,19 @@ def _parse_dos_time(stamp):
 	yr = (stamp & 0x7F) + 1980
 	return (yr, mon, day, hr, mnt, sec * 2)
 
-def _parse_ext_time(block, pos):
-	data = block._rawdata
-
+def _parse_ext_time(data, pos, dostime):
+	"""Returns ((mtime, ctime, atime, arctime), position after the field)"""
 	# flags and rest of data can be missing
 	flags = 0
 	if pos + 2 <= len(data):
 		flags = struct.Struct('<H').unpack_from(data, pos)[0] # short
 		pos += 2
 
-	block.mtime, pos = _parse_xtime(flags >> 3*4, data, pos, 
-	                                block.file_datetime)
-	block.ctime, pos = _parse_xtime(flags >> 2*4, data, pos)
-	block.atime, pos = _parse_xtime(flags >> 1*4, data, pos)
-	block.arctime, pos = _parse_xtime(flags >> 0*4, data, pos)
-	return pos
+	mtime, pos = _parse_xtime(flags >> 3*4, data, pos, dostime)
+	ctime, pos = _parse_xtime(flags >> 2*4, data, pos)
+	atime, pos = _parse_xtime(flags >> 1*4, data, pos)
+	arctime, pos = _parse_xtime(flags >> 0*4, data, pos)
+	return (mtime, ctime, atime, arctime), pos
 
 def _parse_xtime(flag, data, pos, dostime = None):
 	unit = 10000000 # 100 ns units
@@ -313,6 +312,7 @@ class RarBlock(object):
 	rawtype         HEAD_TYPE
 	flags           HEAD_FLAGS
 	_rawdata        All the data (byte string) of this block.
+	                A memoryview when read with a memory mapped RarReader.
 	block_position  Offset of the block in the original file/stream.
 	header_size     The length of the header from this block.
 	
@@ -344,6 +344,10 @@ class RarBlock(object):
 	SKIP_IF_UNKNOWN = 0x4000
 	
 	SUPPORTED_FLAG_MASK = (LONG_BLOCK | SKIP_IF_UNKNOWN)
+
+	# no __dict__ per block: SRR files can have thousands of blocks
+	__slots__ = ("_rawdata", "block_position", "fname", "crc", "rawtype",
+	             "flags", "header_size", "_p", "add_size")
 	
 	def __init__(self, block_bytes, file_position, fname):
 		"""Interprets the first 7 bytes of the header.
@@ -436,13 +440,14 @@ class _SrrFileNameBlock(RarBlock):
 	separator, but apparently the Net version also recognizes the
 	backward slash (\\), and there is a test case for this. File paths in
 	RAR files use backward slashes."""
+	__slots__ = ("file_name",)
 	
 	def _unpack_file_name(self):
 		'''Read in "self.file_name"'''
 		
 		# 2 bytes for name length, then the name (unsigned short)
 		length = struct.unpack_from("<H", self._rawdata, self._p)[0]
-		self.file_name = self._rawdata[self._p+2:self._p+2+length]
+		self.file_name = bytes(self._rawdata[self._p+2:self._p+2+length])
 		self.file_name = self.file_name.decode("utf-8")
 		self._p += 2 + length
 	
@@ -506,6 +511,7 @@ class SrrHeaderBlock(RarBlock):
 	"""
 	SRR_APP_NAME_PRESENT = 0x1
 	SUPPORTED_FLAG_MASK = SRR_APP_NAME_PRESENT
+	__slots__ = ("appname",)
 	
 	def __init__(self, bbytes=None, filepos=None, fname=None, appname=None):
 		if not appname and appname != "": # read block
@@ -516,8 +522,8 @@ class SrrHeaderBlock(RarBlock):
 			if self.flags & self.SRR_APP_NAME_PRESENT:
 				appname_length = struct.unpack_from("<H",
 								self._rawdata, self._p)
-				self.appname = self._rawdata[self._p+2:self._p+2+
-											appname_length[0]] # tuple
+				self.appname = bytes(self._rawdata[self._p+2:self._p+2+
+											appname_length[0]]) # tuple
 				self.appname = self.appname.decode("utf-8")
 				self._p += 2 + appname_length[0]
 			else:
@@ -590,6 +596,7 @@ class SrrStoredFileBlock(_SrrFileNameBlock):
 #	PATH_ONLY = 0x4 -> empty file and name ends on /?
 	
 	SUPPORTED_FLAG_MASK = RarBlock.LONG_BLOCK # | PATHS_SAVED
+	__slots__ = ("file_size",)
 
 	def __init__(self, bbytes=None, filepos=None, fname=None,
 	             file_name=None, file_size=None):
@@ -718,6 +725,7 @@ class SrrRarFileBlock(_SrrFileNameBlock):
 	PATHS_SAVED = 0x2
 	SUPPORTED_FLAG_MASK = (RECOVERY_BLOCKS_REMOVED | PATHS_SAVED |
 						   RarBlock.LONG_BLOCK)
+	__slots__ = ()
 	
 	def __init__(self, bbytes=None, filepos=None, fname=None, file_name=None):
 		if not file_name:
@@ -771,6 +779,7 @@ class SrrOsoHashBlock(_SrrFileNameBlock):
 	    0xFFFF - 7 - 8 - 8 - 2 = 65510 (0xFFE6)
 	File name: must match a stored file name"""
 	SUPPORTED_FLAG_MASK = 0
+	__slots__ = ("file_size", "oso_hash")
 	
 	def __init__(self, bbytes=None, filepos=None, fname=None,
 				file_size=None, file_name=None, oso_hash=None):
@@ -831,6 +840,8 @@ class SrrRarPaddingBlock(RarBlock):
 	HL:     Header Length (2 bytes)
 	        Always 7 + 4 = 11 bytes.
 	"""
+	__slots__ = ("padding_size",)
+
 	def __init__(self, bbytes=None, filepos=None, fname=None,
 				padding_bytes=None):
 		if bbytes != None:
@@ -885,6 +896,8 @@ class RarVolumeHeaderBlock(RarBlock): # 0x73
 	SUPPORTED_FLAG_MASK = (RarBlock.SUPPORTED_FLAG_MASK | VOLUME | COMMENT |
 	                       LOCK | SOLID | NEW_NUMBERING | AUTHENTICITY | 
 	                       PROTECTED | ENCRYPTED | FIRST_VOLUME | ENCRYPTVER)
+	__slots__ = ("reserved1", "reserved2")
+
 	def explain_flags(self):
 		out = super(RarVolumeHeaderBlock, self).explain_flags()
 		if self.flags & self.VOLUME:
@@ -1009,6 +1022,13 @@ class RarPackedFileBlock(RarBlock): # 0x74
 	                       LARGE_FILE | UTF8_FILE_NAME | SALT | VERSION |
 	                       EXT_TIME | EXTFLAGS | RarBlock.SUPPORTED_FLAG_MASK)
 
+	# file names, the salt and the extended times are decoded on first use
+	__slots__ = ("packed_size", "unpacked_size", "os", "file_crc",
+	             "file_datetime", "rar_version", "compression_method",
+	             "file_attributes", "high_pack_size", "high_unpack_size",
+	             "_name_pos", "_name_length", "_file_name", "_salt_pos",
+	             "_xtime_pos", "_xtimes")
+
 	def __init__(self, blockbytes, filepos, fname):
 		super(RarPackedFileBlock, 
 			  self).__init__(blockbytes, filepos, fname)
@@ -1042,36 +1062,73 @@ class RarPackedFileBlock(RarBlock): # 0x74
 		# RR: Recovery Record
 		# AV: Authenticity Verification
 		
-		# Copyright (c) 2005-2010  Marko Kreen <markokr@gmail.com>
 		self.file_datetime = _parse_dos_time(self.file_datetime)
-		self.file_name = self._rawdata[self._p:self._p+filename_length]
+		self._name_pos = self._p
+		self._name_length = filename_length
+		self._file_name = None
 		self._p += filename_length
-		if self.flags & RarPackedFileBlock.UTF8_FILE_NAME:
-			null = self.file_name.find(ZERO) # index zero byte
-			self.orig_filename = self.file_name[:null]
-			u = UnicodeFilename(self.orig_filename, self.file_name[null + 1:])
-			self.unicode_filename = u.decode()
-		else:
-			self.orig_filename = self.file_name
-			self.unicode_filename = self.file_name.decode(DEFAULT_CHARSET, 
-			                                              "replace")
-		self.file_name = self.unicode_filename
 		
+		self._salt_pos = self._p
 		if self.flags & self.SALT:
-			self.salt = self._rawdata[self._p:self._p + 8]
 			self._p += 8
-		else:
-			self.salt = None
 
-		# optional extended time stamps
+		# optional extended time stamps: variable size
+		self._xtime_pos = self._p
+		self._xtimes = None
 		if self.flags & self.EXT_TIME:
-			self._p = _parse_ext_time(self, self._p)
-		else:
-			self.mtime = self.atime = self.ctime = self.arctime = None
+			self._p = None  # unknown until the field is parsed
 			
 		# other new fields may appear here
 		# e.g. recovery fields used in a RarNewSubBlock
 
+	def _decode_file_name(self):
+		"""Returns (orig_filename, unicode_filename)"""
+		# Copyright (c) 2005-2010  Marko Kreen <markokr@gmail.com>
+		if self._file_name is None:
+			name = bytes(self._rawdata[self._name_pos:
+			                           self._name_pos + self._name_length])
+			if self.flags & RarPackedFileBlock.UTF8_FILE_NAME:
+				null = name.find(ZERO) # index zero byte
+				u = UnicodeFilename(name[:null], name[null + 1:])
+				self._file_name = (name[:null], u.decode())
+			else:
+				self._file_name = (name, name.decode(DEFAULT_CHARSET,
+				                                     "replace"))
+		return self._file_name
+
+	@property
+	def orig_filename(self):
+		return self._decode_file_name()[0]
+
+	@property
+	def unicode_filename(self):
+		return self._decode_file_name()[1]
+
+	@property
+	def file_name(self):
+		return self._decode_file_name()[1]
+
+	@property
+	def salt(self):
+		if self.flags & self.SALT:
+			return bytes(self._rawdata[self._salt_pos:self._salt_pos + 8])
+		return None
+
+	def _ext_times(self):
+		"""Returns (mtime, ctime, atime, arctime)"""
+		if self._xtimes is None:
+			if self.flags & self.EXT_TIME:
+				self._xtimes, self._p = _parse_ext_time(self._rawdata,
+					self._xtime_pos, self.file_datetime)
+			else:
+				self._xtimes = (None, None, None, None)
+		return self._xtimes
+
+	mtime = property(lambda self: self._ext_times()[0])
+	ctime = property(lambda self: self._ext_times()[1])
+	atime = property(lambda self: self._ext_times()[2])
+	arctime = property(lambda self: self._ext_times()[3])
+
 	def explain(self):
 		out = super(RarPackedFileBlock, self).explain()
 		out += "+PACK_SIZE: %i bytes (ADD_SIZE + HIGH_PACK_SIZE field)\n" % \
@@ -1230,8 +1287,11 @@ class RarNewSubBlock(RarPackedFileBlock): # 0x7A
 	crc = crc32(data, ~0x0fffffff)
 	"""
 	#(FILE and NEWSUB share the same structure)
+	__slots__ = ("is_recovery", "recovery_sectors", "data_sectors")
+
 	def __init__(self, blockbytes, filepos, fname):
 		super(RarNewSubBlock, self).__init__(blockbytes, filepos, fname)
+		self._ext_times()  # the position of the next fields is needed
 		
 		if self.file_name == "RR":
 			# skip 8 bytes for 'Protect+' (also part of the header)
@@ -1262,6 +1322,9 @@ class RarNewSubBlock(RarPackedFileBlock): # 0x7A
 		return out
 			
 class RarOldRecoveryBlock(RarBlock): # 0x78
+	__slots__ = ("packed_size", "rar_version", "recovery_sectors",
+	             "data_sectors")
+
 	def __init__(self, blockbytes, filepos, fname):
 		super(RarOldRecoveryBlock, self).__init__(blockbytes, filepos, fname)
 		# 2 bytes for packed size
@@ -1307,6 +1370,7 @@ class RarEndArchiveBlock(RarBlock):
 	
 	SUPPORTED_FLAG_MASK = (RarBlock.SUPPORTED_FLAG_MASK | NEXT_VOLUME |
 	                       DATACRC | REVSPACE | VOLNUMBER)
+	__slots__ = ("rarcrc", "volume_number")
 
 	def __init__(self, blockbytes, filepos, fname):
 		super(RarEndArchiveBlock, self).__init__(blockbytes, filepos, fname)
@@ -1380,9 +1444,13 @@ class RarReader(object):
 	"""
 	RAR, SRR, SFX = list(range(3))
 	
-	def __init__(self, rfile, file_length=0, enable_sfx=False):
+	def __init__(self, rfile, file_length=0, enable_sfx=False,
+	             use_mmap=False):
 		"""If the file is a part of a stream, (e.g. RAR in SRR)
-		the file_length must be given."""
+		the file_length must be given.
+		use_mmap: memory map a file on disk instead of reading each block.
+		          The blocks then hold memoryview slices of the mapping.
+		          Not used for streams or before Python 3."""
 		if isinstance(rfile, io.IOBase): 
 			# the file is supplied as a stream
 			self._rarstream = rfile
@@ -1453,6 +1521,10 @@ class RarReader(object):
 		self._current_index = 0
 		self._rar_end_block_encountered = False # for detecting padding
 
+		if (use_mmap and not isinstance(rfile, io.IOBase) and
+		    sys.hexversion >= 0x3000000):
+			self._rarstream = _MappedFile(self._rarstream)
+
 	def __del__(self):
 		try: # close the file/stream
 			self._rarstream.close()
@@ -1521,8 +1593,8 @@ class RarReader(object):
 		
 		# detect padding bytes
 		if self._rar_end_block_encountered and self._readmode == self.RAR:
-			return SrrRarPaddingBlock(
-				padding_bytes=header_buffer + self._rarstream.read())
+			return SrrRarPaddingBlock(padding_bytes=self._append(
+				block_start_position, header_buffer, self._rarstream.read()))
 		if btype == BlockType.RarMax:
 			self._rar_end_block_encountered = True
 		
@@ -1543,8 +1615,8 @@ class RarReader(object):
 							self._rarstream)
 		
 		# read the rest of the block (we already have the basic header)
-		block_buffer = header_buffer + self._rarstream.read(hsize - 
-		                                                    HEADER_LENGTH)
+		block_buffer = self._append(block_start_position, header_buffer,
+		                            self._rarstream.read(hsize - HEADER_LENGTH))
 		
 		# If RAR LONG_BLOCK flag is set -> extra block length
 		# Or if this is a File or NewSub block. -> e.g. BiA Outcasts releases
@@ -1566,7 +1638,7 @@ class RarReader(object):
 				( btype == BlockType.RarNewSub and
 				  hsize > 34 and
 				  struct.unpack_from("<H", block_buffer, 26)[0] == 2 and
-				  block_buffer.startswith(b"RR", 32) )
+				  block_buffer[32:34] == b"RR" )
 				
 		# What if we have a very old SRR with the actual RR stored?
 		if self._readmode == self.SRR:
@@ -1589,7 +1661,8 @@ class RarReader(object):
 			self._rarstream.seek(add_size, 1)
 		elif btype != BlockType.RarPackedFile and  \
 				not is_recovery and add_size > 0:
-			block_buffer += self._rarstream.read(add_size)
+			block_buffer = self._append(block_start_position, block_buffer,
+			                            self._rarstream.read(add_size))
 
 		# If we're not returning the data, skip over it, 
 		# but only for RAR or SFX mode. 
@@ -1615,6 +1688,13 @@ class RarReader(object):
 		
 		return rar_block
 	
+	def _append(self, start, data, more):
+		"""Returns data followed by the bytes that were just read: more.
+		A memory mapped file returns a single slice from start instead."""
+		if isinstance(self._rarstream, _MappedFile):
+			return self._rarstream.view(start, self._rarstream.tell())
+		return data + more
+
 	def read_all(self):
 		"""Parse the whole rar/srr file. The results are cached.
 		Closes the open file."""
@@ -1676,5 +1756,53 @@ class RarReader(object):
 	def __iter__(self):
 		return self
 
+	def read_range(self, start, end):
+		"""Returns the bytes from file offset start up to end.
+		A memoryview of the mapping when memory mapped.
+		Use it after iterating: the read position of the reader changes."""
+		self._rarstream.seek(start)
+		return self._rarstream.read(end - start)
+
 	def close(self):
 		self._rarstream.close()
+
+class _MappedFile(object):
+	"""Read-only file object for RarReader on top of a memory mapped file.
+	read() returns memoryview slices of the mapping instead of copies.
+	The mapping stays alive for as long as blocks reference it. Closing
+	only closes the file: on Windows the file can't be moved before that."""
+	def __init__(self, fileobj):
+		self._file = fileobj
+		self.name = fileobj.name
+		self._view = memoryview(mmap.mmap(fileobj.fileno(), 0,
+		                                  access=mmap.ACCESS_READ))
+		self._position = fileobj.tell()
+
+	def read(self, size=-1):
+		start = self._position
+		if size < 0:
+			self._position = len(self._view)
+		else:
+			self._position = min(start + size, len(self._view))
+		return self._view[start:self._position]
+
+	def view(self, start, end):
+		return self._view[start:end]
+
+	def seek(self, offset, whence=os.SEEK_SET):
+		if whence == os.SEEK_CUR:
+			offset += self._position
+		elif whence == os.SEEK_END:
+			offset += len(self._view)
+		self._position = offset
+		return self._position
+
+	def tell(self):
+		return self._position
+
+	@property
+	def closed(self):
+		return self._file.closed
+
+	def close(self):
+		self._file.close()
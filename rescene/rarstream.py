@@ -33,8 +33,107 @@
 
 import io
 import os
+import collections
+import threading
+from bisect import bisect_right
 from rescene import rar, utility
 
+try:
+	odict = collections.OrderedDict #@UndefinedVariable
+except AttributeError:
+	# Python 2.6 OrderedDict
+	from rescene import ordereddict
+	odict = ordereddict.OrderedDict
+
+# maximum number of idle volume handles kept open for all RarStreams
+MAX_OPEN_VOLUMES = 32
+# maximum number of RAR volumes with a cached layout
+MAX_CACHED_VOLUMES = 4096
+# maximum number of RAR sets with a cached volume table
+MAX_CACHED_SETS = 64
+
+def _file_key(path):
+	"""Identifies the current version of a file on disk: a file replaced
+	or changed at the same path gets a different key."""
+	stat = os.stat(path)
+	return (os.path.abspath(path), stat.st_size, stat.st_mtime, stat.st_ino)
+
+class _HandlePool(object):
+	"""Bounded LRU pool of read-only file handles shared by RarStreams.
+	A handle is taken out of the pool while it is used and put back
+	afterwards, so two streams or threads never share a file position."""
+	def __init__(self, size):
+		self.size = size
+		self._idle = odict()  # file key -> list of idle handles
+		self._count = 0
+		self._lock = threading.Lock()
+
+	def acquire(self, key):
+		with self._lock:
+			handles = self._idle.get(key)
+			if handles:
+				self._count -= 1
+				handle = handles.pop()
+				if not handles:
+					del self._idle[key]
+				return handle
+		return io.open(key[0], "rb")
+
+	def release(self, key, handle):
+		with self._lock:
+			# the most recently used entries are at the end
+			handles = self._idle.pop(key, [])
+			handles.append(handle)
+			self._idle[key] = handles
+			self._count += 1
+			while self._count > self.size:
+				old_key = next(iter(self._idle))
+				old_handles = self._idle[old_key]
+				old_handles.pop(0).close()
+				self._count -= 1
+				if not old_handles:
+					del self._idle[old_key]
+
+	def discard(self, path):
+		"""Closes the idle handles of a file, so it can be removed."""
+		path = os.path.abspath(path)
+		with self._lock:
+			for key in [k for k in self._idle if k[0] == path]:
+				for handle in self._idle.pop(key):
+					handle.close()
+					self._count -= 1
+
+_handle_pool = _HandlePool(MAX_OPEN_VOLUMES)
+
+# (file key, ...) -> result of parsing the headers of a RAR volume
+_layout_cache = odict()
+_layout_lock = threading.Lock()
+
+# (first volume key, packed file name, compressed, middle) ->
+# (_RarVolume list, packed file length, packed file name)
+_set_cache = odict()
+
+def clear_layout_cache():
+	"""Forgets all parsed RAR volume layouts and closes the idle handles."""
+	with _layout_lock:
+		_layout_cache.clear()
+		_set_cache.clear()
+	for path in set(key[0] for key in list(_handle_pool._idle)):
+		_handle_pool.discard(path)
+
+def _cached_layout(cache_key, parse):
+	"""Returns the cached result for cache_key, or calls parse() once.
+	The first item of cache_key must be a _file_key()."""
+	with _layout_lock:
+		layout = _layout_cache.pop(cache_key, None)
+	if layout is None:
+		layout = parse()
+	with _layout_lock:
+		_layout_cache[cache_key] = layout
+		while len(_layout_cache) > MAX_CACHED_VOLUMES:
+			_layout_cache.popitem(last=False)
+	return layout
+
 def _check(first_rar):
 	"""Check if first RAR file is given. 
 	Raises ArchiveNotFoundError or
@@ -66,21 +165,47 @@ class RarStream(io.IOBase):
 		compressed RAR files.
 		"""
 		self._rar_volumes = list()
+		self._volume_starts = list()  # pfile_start of each volume: bisect
 		self._current_volume = None
 		self._packed_file_length = 0
 		self._current_position = 0
 		self._closed = False
 
+		# The whole volume table is cached process-wide, keyed by the path,
+		# size and modification time of the first volume. The following
+		# volumes are then not even looked for again.
+		set_key = None
+		if not isinstance(first_rar, io.IOBase):
+			stat = os.stat(first_rar)
+			set_key = (os.path.abspath(first_rar), stat.st_size,
+			           stat.st_mtime, packed_file_name, compressed, middle)
+			with _layout_lock:
+				cached = _set_cache.get(set_key)
+			if cached is not None:
+				(volumes, self._packed_file_length,
+				 self.packed_file_name) = cached
+				self._rar_volumes = list(volumes)
+				self._volume_starts = [v.pfile_start for v in volumes]
+				self._current_volume = self._rar_volumes[0]
+				return
+
 		# don't do the first RAR check if told not to
 		# this is only when we know that the previous RARs are not needed
-		if not middle and not _check(first_rar):
+		if not middle and not self._check(first_rar):
 			raise AttributeError("Archive without stored files.")
 
 		rar_file = first_rar
 		while os.path.isfile(rar_file):
-			is_old = self._process(rar_file, packed_file_name, compressed)
+			is_old = self._add_volumes(rar_file, packed_file_name, compressed)
 			rar_file = utility.next_archive(rar_file, is_old)
 
+		if set_key is not None and self._rar_volumes:
+			with _layout_lock:
+				_set_cache[set_key] = (tuple(self._rar_volumes),
+					self._packed_file_length, self.packed_file_name)
+				while len(_set_cache) > MAX_CACHED_SETS:
+					_set_cache.popitem(last=False)
+
 		try:
 			# choose the first archive with the rar_file to start with
 			self._current_volume = self._rar_volumes[0]
@@ -88,17 +213,47 @@ class RarStream(io.IOBase):
 			# IndexError: list index out of range
 			raise AttributeError("File not found in the archive.")
 
+	def _check(self, first_rar):
+		"""_check() with the result cached for files on disk."""
+		if isinstance(first_rar, io.IOBase):
+			return _check(first_rar)
+		return _cached_layout((_file_key(first_rar), "check"),
+		                      lambda: _check(first_rar))
+
+	def _add_volumes(self, rar_file, packed_file_name=None, compressed=False):
+		"""Adds the _RarVolumes of rar_file to the list.
+		The layout of each volume is cached: creating another RarStream
+		on the same files does not parse the headers again.
+		Returns true if old style volume naming is used."""
+		file_key = _file_key(rar_file)
+		is_old_style_naming, self.packed_file_name, ranges = _cached_layout(
+			(file_key, packed_file_name, compressed),
+			lambda: self._process(rar_file, packed_file_name, compressed))
+		for pfile_offset, packed_size in ranges:
+			cvol = self._RarVolume()
+			cvol.archive_path = rar_file
+			cvol.file_key = file_key
+			cvol.pfile_start = self._packed_file_length
+			cvol.pfile_end = self._packed_file_length + packed_size - 1
+			cvol.pfile_offset = pfile_offset
+
+			self._rar_volumes.append(cvol)
+			self._volume_starts.append(cvol.pfile_start)
+			self._packed_file_length += packed_size
+		return is_old_style_naming
+
 	def _process(self, rar_file, packed_file_name=None, compressed=False):
-		"""Checks if the rar_file has the packed_file and adds 
-		the _RarVolumes it creates to the list.
+		"""Checks if the rar_file has the packed_file.
 		If packed_file_name is not supplied, the first file will be used.
-		Returns true if old style volume naming is used."""
+		Returns a tuple: (true if old style volume naming is used,
+		packed_file_name, [(offset of the packed data, packed size)])"""
 		if packed_file_name:
 			# / is an illegal character in Windows
 			# We support POSIX paths, but the path structure in RAR files
 			# is always Windows style.
 			packed_file_name = packed_file_name.replace("/", "\\")
 		is_old_style_naming = False
+		ranges = []
 		reader = rar.RarReader(rar_file)
 		for block in reader.read_all():
 			if block.rawtype == rar.BlockType.RarVolumeHeader:
@@ -113,19 +268,10 @@ class RarStream(io.IOBase):
 				if not packed_file_name:
 					packed_file_name = block.file_name
 				if packed_file_name == block.file_name:
-					cvol = self._RarVolume()
-					cvol.archive_path = rar_file
-					cvol.pfile_start = self._packed_file_length
-					cvol.pfile_end = \
-						self._packed_file_length + block.packed_size - 1
-					cvol.pfile_offset = \
-						block.block_position + block.header_size
-
-					self._rar_volumes.append(cvol)
-					self._packed_file_length += block.packed_size
+					ranges.append((block.block_position + block.header_size,
+					               block.packed_size))
 		reader.close()
-		self.packed_file_name = packed_file_name
-		return is_old_style_naming
+		return is_old_style_naming, packed_file_name, ranges
 
 	def length(self):
 		"""Length of the packed file being accessed."""
@@ -152,11 +298,9 @@ class RarStream(io.IOBase):
 
 		As a convenience, it is allowed to call this method more than once; 
 		only the first call, however, will have an effect."""
-		for vol in self._rar_volumes:
-			try:
-				vol.file_stream.close()
-			except:
-				"The rar volume had no file stream yet."
+		if not self._closed:
+			for vol in self._rar_volumes:
+				_handle_pool.discard(vol.archive_path)
 		self._closed = True
 
 	@property
@@ -200,11 +344,14 @@ class RarStream(io.IOBase):
 			self._current_volume = None
 
 			# find the RAR volume that has the current position of the file
-			for vol in self._rar_volumes:
-				if (self._current_position >= vol.pfile_start and
-					self._current_position <= vol.pfile_end):
+			# the last volume starting at or before the position:
+			# empty volumes before a volume with the same start are skipped
+			index = bisect_right(self._volume_starts,
+			                     self._current_position) - 1
+			if index >= 0:
+				vol = self._rar_volumes[index]
+				if self._current_position <= vol.pfile_end:
 					self._current_volume = vol
-					break  # found it: stop iterating
 
 		# return the new absolute position
 		return self._current_position
@@ -220,40 +367,23 @@ class RarStream(io.IOBase):
 		if not self._current_volume:
 			return b""
 
-		file_bytes_read = 0
-		dbuffer = b""
-		size_set = True if size >= 0 else False
-
-		while True:
-			try:
-				self._current_volume.file_stream
-			except:  # no stream defined/opened yet
-				self._current_volume.file_stream = \
-							open(self._current_volume.archive_path, "rb")
+		remaining = self._packed_file_length - self._current_position
+		if size < 0 or size > remaining:
+			size = remaining
 
-			# point to begin of file inside archive
-			self._current_volume.file_stream.seek(
-				self._current_volume.pfile_offset +
-				(self._current_position - self._current_volume.pfile_start), 0)
+		# the common case: everything comes from the current volume
+		if self._current_position + size - 1 <= self._current_volume.pfile_end:
+			data = self._read_volume(size)
+			self.seek(len(data), os.SEEK_CUR)
+			return data
 
-			# check how many bytes we still need to read
-			file_bytes_read = self._current_volume.pfile_end  \
-								 - self._current_position + 1
-			if size_set:  # maybe reaching read size first
-				file_bytes_read = min(size, file_bytes_read)
-				size -= file_bytes_read
-
-			dbuffer += self._current_volume.file_stream.read(file_bytes_read)
-
-			# set global offset further
-			self.seek(file_bytes_read, os.SEEK_CUR)
-
-			# we are at the end of the file to read
-			if file_bytes_read <= 0 or (size <= 0 and size_set)  \
-				or self._current_position >= self._packed_file_length:
-				break
-
-		return dbuffer
+		# crossing volume boundaries: fill one buffer instead of
+		# concatenating the pieces of each volume
+		dbuffer = bytearray(size)
+		read = self.readinto(dbuffer)
+		if read < size:
+			del dbuffer[read:]
+		return bytes(dbuffer)
 
 	def readinto(self, byte_array):
 		"""
@@ -269,7 +399,37 @@ class RarStream(io.IOBase):
 			the number of bytes read. If the object is in non-blocking mode 
 			and no bytes are available, None is returned.
 		"""
-		raise NotImplementedError()
+		view = memoryview(byte_array)
+		total = 0
+		size = len(view)
+		while total < size and self._current_volume:
+			# check how many bytes we can read from this volume
+			amount = min(size - total, self._current_volume.pfile_end
+			                           - self._current_position + 1)
+			read = self._read_volume(view[total:total + amount])
+			if not read:  # volume shorter than its headers tell
+				break
+			total += read
+
+			# set global offset further
+			self.seek(read, os.SEEK_CUR)
+		return total
+
+	def _read_volume(self, size_or_view):
+		"""Reads from the current volume at the current stream position
+		with a handle from the shared pool.
+		Returns the bytes read, or the number of bytes read into a view."""
+		vol = self._current_volume
+		handle = _handle_pool.acquire(vol.file_key)
+		try:
+			# point to begin of file inside archive
+			handle.seek(vol.pfile_offset +
+			            (self._current_position - vol.pfile_start), 0)
+			if isinstance(size_or_view, memoryview):
+				return handle.readinto(size_or_view)
+			return handle.read(size_or_view)
+		finally:
+			_handle_pool.release(vol.file_key, handle)
 
 	def list_files(self):
 		"""Returns a list of files stored in the RAR archive set."""
@@ -291,8 +451,9 @@ class RarStream(io.IOBase):
 			Packed file range start.
 		pfile_end
 			Packed file range end.
-		file_stream
-			A file stream of the archive that has the packed file.
+		file_key
+			Path, size, modification time and inode of the archive:
+			the key of its handles in the shared pool.
 		"""
 
 class SrrStream(io.IOBase):
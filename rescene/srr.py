@@ -41,8 +41,9 @@ from rescene.main import MsgCode, FileNotFound, RarNotFound, EmptyRepository
 from rescene.utility import sep
 from rescene.utility import raw_input
 from rescene.utility import encodeerrors
-from rescene.utility import calculate_crc32
 from rescene.utility import create_temp_file_name, replace_result
+from rescene import verify, hashcache
+from rescene.verify import verify_files
 
 
 o = rescene.Observer()
@@ -150,17 +151,22 @@ def display_info(srr_file):
 			print("\t%s" % encodeerrors(sfvline, sys.stdout))
 		print()
 
-def verify_extracted_files(srr, in_folder, auto_locate):
+def verify_extracted_files(srr, in_folder, auto_locate, threads=None,
+                           cache=None):
 	"""return codes:
 	0: everything verified successfully
 	1: corrupt file detected
 	2: the file was not found
 	10: it was a music release; nothing to verify
+	threads: amount of files hashed at the same time; automatic when None
+	cache: remembers the CRCs of files that did not change
 	"""
 	status = 0
 	archived_files = rescene.info(srr)["archived_files"].values()
 	if len(archived_files) == 0:
 		status = 10  # it's a music release
+	jobs = []
+	missing = []
 	for afile in archived_files:
 		# Replace rar default directory separator with slash when used by OS
 		if os.sep == '/':
@@ -169,39 +175,50 @@ def verify_extracted_files(srr, in_folder, auto_locate):
 		if afile.crc32 != "00000000" and afile.crc32 != "0":
 			name = os.path.join(in_folder, afile.file_name)
 			if not os.path.exists(name):
-				if not auto_locate:
-					print("File %s not found. Skipping." % afile.file_name)
-					status = 2
-				else:  # look for possible renames
-					same_size_list = []
-					for root, _dirnames, filenames in os.walk(in_folder):
-						for fn in fnmatch.filter(filenames,
-									"*" + os.path.splitext(name)[1]):
-							f = os.path.join(root, fn)
-							if os.path.getsize(f) == afile.file_size:
-								same_size_list.append(f)
-					# TODO: see if we can use OSO hash here to speed things up
-					# it happens that multiple episodes have the same size
-					found = False
-					for f in same_size_list:
-						crc = calculate_crc32(f)
-						if afile.crc32 == "%0.8X" % crc:
-							found = True
-							print("File OK: %s matches %s." %
-									(f, afile.file_name))
-							break
-						else:
-							print("%s does not match." % f)
-					if not found:
-						print("File %s not found. Skipping." % name)
-						status = 2
+				missing.append((afile, name))
+			else:
+				jobs.append((afile.file_name, name, afile.crc32))
+
+	for result in verify_files(jobs, threads, cache):
+		if result.status == verify.OK:
+			print("File OK: %s." % result.name)
+		elif result.status == verify.MISSING:
+			# removed or unreadable since the existence check
+			print("File %s not found. Skipping." % result.name)
+			status = 2
+		else:
+			print("File CORRUPT: %s!" % result.name)
+			status = 1
+
+	for afile, name in missing:
+		if not auto_locate:
+			print("File %s not found. Skipping." % afile.file_name)
+			status = 2
+			continue
+		# look for possible renames
+		same_size_list = []
+		for root, _dirnames, filenames in os.walk(in_folder):
+			for fn in fnmatch.filter(filenames,
+						"*" + os.path.splitext(name)[1]):
+				f = os.path.join(root, fn)
+				if os.path.getsize(f) == afile.file_size:
+					same_size_list.append(f)
+		# TODO: see if we can use OSO hash here to speed things up
+		# it happens that multiple episodes have the same size
+		found = False
+		candidates = [(afile.file_name, f, afile.crc32)
+		              for f in same_size_list]
+		for result in verify_files(candidates, threads, cache):
+			if result.status == verify.OK:
+				found = True
+				print("File OK: %s matches %s." %
+						(result.path, afile.file_name))
+				break
 			else:
-				crc = calculate_crc32(name)
-				if afile.crc32 == "%0.8X" % crc:
-					print("File OK: %s." % afile.file_name)
-				else:
-					print("File CORRUPT: %s!" % afile.file_name)
-					status = 1
+				print("%s does not match." % result.path)
+		if not found:
+			print("File %s not found. Skipping." % name)
+			status = 2
 	return status
 
 def manage_srr(options, in_folder, infiles, working_dir):
@@ -220,7 +237,9 @@ def manage_srr(options, in_folder, infiles, working_dir):
 		mthread.set_messages([])
 		rescene.print_details(infiles[0])
 	elif options.verify:  # -q
-		s = verify_extracted_files(infiles[0], in_folder, options.auto_locate)
+		mthread.set_messages([])
+		s = verify_extracted_files(infiles[0], in_folder, options.auto_locate,
+		                           options.jobs, hashcache.active())
 		if s == 0:
 			print("All files OK!")
 		elif s == 10:
@@ -316,7 +335,8 @@ def manage_srr(options, in_folder, infiles, working_dir):
 			                    hints, options.no_auto_crc,
 			                    options.auto_locate, options.fake,
 			                    options.rar_executable_dir, options.temp_dir,
-			                    options.volume is None, options.volume, rar_mt)
+			                    options.volume is None, options.volume, rar_mt,
+			                    options.jobs or 1)
 		except (FileNotFound, RarNotFound) as err:
 			mthread.done = True
 			mthread.join()
@@ -435,6 +455,10 @@ def main(argv=None):
 	parser.add_option("-q", "--verify",
 					  action="store_true", dest="verify", default=False,
 					  help="CRC verify extracted RAR contents")
+	parser.add_option("--no-cache",
+					  action="store_true", dest="no_cache", default=False,
+					  help="do not use or update the cache of file hashes "
+					  "in %s" % hashcache.cache_dir())
 	# TODO: get all the messages in order
 
 	display.add_option("-l", "--list",
@@ -482,6 +506,11 @@ def main(argv=None):
 	recon.add_option("-u", "--no-autocrc",
 					 action="store_true", dest="no_auto_crc", default=False,
 					 help="disable automatic CRC checking during reconstruction")
+	recon.add_option("-j", "--jobs", dest="jobs", default=None,
+					 action="store", type="int", metavar="COUNT",
+					 help="amount of RAR volumes to reconstruct at the same "
+					 "time (only for RARs without compression) or files to "
+					 "verify at the same time with -q")
 	recon.add_option("-H", help="<oldname:newname list>: Specify alternate "
 					"names for extracted files.  ex: srr example.srr -H "
 					"orginal.mkv:renamed.mkv;original.nfo:renamed.nfo",
@@ -562,6 +591,9 @@ def main(argv=None):
 
 	if options.temp_dir and not os.path.isdir(options.temp_dir):
 		report_error(1, "Provided temporary directory not found.\n")
+
+	if not options.no_cache:
+		hashcache.enable()
 		
 	if options.extract and options.extract_regex:
 		report_error(1, "Extract all or follow the regex?\n")
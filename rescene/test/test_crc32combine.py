@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2026 pyReScene
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+from __future__ import (with_statement, unicode_literals, print_function,
+	absolute_import)
+
+import unittest
+import random
+import zlib
+
+from rescene.crc32combine import crc32_combine, crc32_combine_many
+
+def crc32(data, crc=0):
+	return zlib.crc32(data, crc) & 0xFFFFFFFF
+
+class TestCrc32Combine(unittest.TestCase):
+	def setUp(self):
+		rand = random.Random(23)
+		self.pieces = [bytes(bytearray(rand.getrandbits(8)
+		                               for _ in range(rand.randint(0, 700))))
+		               for _ in range(40)]
+
+	def test_combine(self):
+		for first, second in zip(self.pieces, self.pieces[1:]):
+			self.assertEqual(crc32(first + second), crc32_combine(
+				crc32(first), crc32(second), len(second)))
+		self.assertEqual(crc32_combine(0x12345678, 0, 0), 0x12345678)
+
+	def test_long_length(self):
+		"""Lengths beyond 4 GiB use operators for the high bits."""
+		first, second = crc32(b"ab"), crc32(b"cd")
+		# the zeros of the length can be applied in two steps
+		self.assertEqual(crc32_combine(first, second, (1 << 33) + 5),
+			crc32_combine(crc32_combine(first, 0, 1 << 33), second, 5))
+		self.assertEqual(crc32_combine(first, second, 0x1234567890),
+			crc32_combine(crc32_combine(first, 0, 0x1234000000),
+			              second, 0x567890))
+
+	def test_many(self):
+		parts = [(crc32(piece), len(piece)) for piece in self.pieces]
+		self.assertEqual(crc32_combine_many(parts), crc32(b"".join(
+			self.pieces)))
+		self.assertEqual(crc32_combine_many(parts, crc32(b"start")),
+		                 crc32(b"start" + b"".join(self.pieces)))
+		self.assertEqual(crc32_combine_many([]), 0)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2026 pyReScene
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+from __future__ import (with_statement, unicode_literals, print_function,
+	absolute_import)
+
+import unittest
+import os
+import shutil
+import time
+import zlib
+from tempfile import mkdtemp
+
+from rescene import hashcache
+from rescene.hashcache import HashCache
+from rescene.utility import calculate_crc32
+
+class TestHashCache(unittest.TestCase):
+	def setUp(self):
+		self.tmp = mkdtemp(".pyrescene")
+		self.cache_file = os.path.join(self.tmp, "hashes.sqlite")
+		self.path = os.path.join(self.tmp, "file.bin")
+		self.write(b"pyReScene" * 1000)
+
+	def tearDown(self):
+		hashcache.disable()
+		shutil.rmtree(self.tmp)
+
+	def write(self, data, mode="wb"):
+		with open(self.path, mode) as afile:
+			afile.write(data)
+
+	def test_lookup(self):
+		with HashCache(self.cache_file) as cache:
+			stat = os.stat(self.path)
+			self.assertEqual(cache.lookup(stat), None)
+			cache.store(stat, 0xDEADBEEF)
+			cache.store_oso(stat, "0123456789abcdef")
+			self.assertEqual(cache.lookup(stat), 0xDEADBEEF)
+			self.assertEqual(cache.lookup_oso(stat), "0123456789abcdef")
+			self.assertEqual(len(cache), 1)
+
+		# persistent and only valid for the unchanged file
+		with HashCache(self.cache_file) as cache:
+			self.assertEqual(cache.lookup(stat), 0xDEADBEEF)
+			self.write(b"more", "ab")
+			self.assertEqual(cache.lookup(os.stat(self.path)), None)
+
+	def test_evict(self):
+		with HashCache(self.cache_file) as cache:
+			stat = os.stat(self.path)
+			cache.store(stat, 1)
+			self.assertEqual(cache.evict(max_age=3600), 0)
+			time.sleep(0.01)
+			self.assertEqual(cache.evict(max_age=0), 1)
+			self.assertEqual(len(cache), 0)
+
+			for size in range(5):
+				self.write(b"x" * size)
+				cache.store(os.stat(self.path), size)
+				time.sleep(0.01)
+			self.assertEqual(cache.evict(max_entries=2), 3)
+			self.assertEqual(len(cache), 2)
+			# the most recently used entries are kept
+			self.assertEqual(cache.lookup(os.stat(self.path)), 4)
+
+	def test_calculate_crc32(self):
+		crc = zlib.crc32(b"pyReScene" * 1000) & 0xFFFFFFFF
+		cache = hashcache.enable(self.cache_file)
+		self.assertEqual(calculate_crc32(self.path), crc)
+		self.assertEqual(cache.lookup(os.stat(self.path)), crc)
+
+		# the cached value is used instead of the contents
+		cache.store(os.stat(self.path), 0x12345678)
+		self.assertEqual(calculate_crc32(self.path), 0x12345678)
+		hashcache.disable()
+		self.assertEqual(calculate_crc32(self.path), crc)
+
+if __name__ == "__main__":
+	unittest.main()
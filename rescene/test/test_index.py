@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2026 pyReScene
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+from __future__ import (with_statement, unicode_literals, print_function,
+	absolute_import)
+
+import unittest
+import os
+import shutil
+from tempfile import mkdtemp
+
+import rescene
+from rescene.index import SrrIndex
+
+# for running nose tests
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+class TestIndex(unittest.TestCase):
+	def setUp(self):
+		self.files_dir = os.path.join(os.pardir, os.pardir, "test_files")
+		self.tmp = mkdtemp(".pyrescene")
+		self.index_file = os.path.join(self.tmp, "srr.index")
+
+	def tearDown(self):
+		shutil.rmtree(self.tmp)
+
+	def assertSameInfo(self, indexed, parsed):
+		for key in ("stored_files", "rar_files", "archived_files"):
+			self.assertEqual(list(indexed[key].keys()),
+			                 list(parsed[key].keys()))
+			for name in parsed[key]:
+				self.assertEqual(vars(indexed[key][name]),
+				                 vars(parsed[key][name]))
+		self.assertEqual(indexed["recovery"] and vars(indexed["recovery"]),
+		                 parsed["recovery"] and vars(parsed["recovery"]))
+		self.assertEqual([repr(e) for e in indexed["sfv_entries"]],
+		                 [repr(e) for e in parsed["sfv_entries"]])
+		for key in ("appname", "sfv_comments", "compression", "oso_hashes"):
+			self.assertEqual(indexed[key], parsed[key])
+
+	def test_info(self):
+		"""The index returns what info() returns, also after reopening."""
+		with SrrIndex(self.index_file) as index:
+			srrs = list(index.update_tree([self.files_dir]))
+			self.assertTrue(len(srrs) > 10)
+			self.assertEqual(len(index), len(srrs))
+		with SrrIndex(self.index_file) as index:
+			for srr in srrs:
+				self.assertTrue(srr in index)
+				self.assertSameInfo(index.info(srr), rescene.info(srr))
+
+	def test_update(self):
+		srr = os.path.join(self.tmp, "store_little.srr")
+		shutil.copy(os.path.join(self.files_dir, "store_little",
+		                         "store_little.srr"), srr)
+		with SrrIndex(self.index_file) as index:
+			srr_id, parsed = index.update(srr)
+			self.assertTrue(parsed)
+			self.assertEqual(index.update(srr), (srr_id, False))
+			self.assertEqual(index.find_crc("876dbba3"),
+			                 [(os.path.abspath(srr), "little_file.txt")])
+
+			# another file at the same path
+			shutil.copy(os.path.join(self.files_dir, "store_empty",
+			                         "store_empty.srr"), srr)
+			self.assertTrue(index.update(srr)[1])
+			self.assertEqual(index.find_crc("876dbba3"), [])
+			self.assertEqual(list(index.info(srr)["archived_files"]),
+			                 ["empty_file.txt"])
+
+			os.remove(srr)
+			self.assertEqual(index.prune(), 1)
+			self.assertEqual(len(index), 0)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -39,6 +39,8 @@ import struct
 import rescene
 from rescene.main import *
 from rescene.main import _handle_rar, _flag_check_srr, _auto_locate_renamed
+from rescene.main import _kernel_copy, _crc32_mapped
+from rescene.main import _write_recovery_record
 from rescene.rar import ArchiveNotFoundError
 from rescene import rar
 
@@ -274,6 +276,17 @@ class TestHash(TestInit):
 # 		print(hl) # 1baad396af00591a16cd9691f2ff11ccdde1dcb1
 		self.assertEqual(hl, hc)
 
+	def test_content_hashes(self):
+		d = join(os.pardir, os.pardir, "test_files", "hash_capitals")
+		files = sorted(glob(join(d, "*.srr")))
+		files.append(join(d, "not_there.srr"))
+		result = list(content_hashes(files, processes=2))
+		self.assertEqual([f for f, _ in result], files)
+		for srr, srr_hash in result[:-1]:
+			self.assertEqual(srr_hash, content_hash(srr))
+		self.assertTrue(isinstance(result[-1][1], EnvironmentError))
+		self.assertEqual(find_doubles(files, processes=2), [files[:-1]])
+
 class TestDisplayInfo(TestInit):
 	def test_mlkj(self):
 		asap = os.path.join(os.pardir, os.pardir, "test_files", "other",
@@ -554,6 +567,37 @@ class TestRebuild(TmpDirSetup):
 		# self._print_events()
 		self.assertTrue(cmp(new, rar), "Files not equivalent.")
 
+	def test_parallel(self):
+		"""All volumes are rebuild at the same time."""
+		srr = os.path.join(self.newrr, "store_rr_solid_auth.part1.srr")
+		reconstruct(srr, self.files_dir, self.tdir, auto_locate_renamed=True,
+		            jobs=3)
+		for part in ("part1", "part2", "part3"):
+			name = "store_rr_solid_auth.%s.rar" % part
+			self.assertTrue(cmp(os.path.join(self.tdir, name),
+			                    os.path.join(self.newrr, name)),
+			                "Files not equivalent.")
+		self.assertFalse([e for e in self.o.events if e.code == MsgCode.CRC])
+
+		srr = os.path.join(self.oldfolder, "store_split_folder.srr")
+		reconstruct(srr, self.files_dir, self.tdir, jobs=2)
+		for ext in ("rar", "r00", "r01"):
+			name = "store_split_folder." + ext
+			self.assertTrue(cmp(os.path.join(self.tdir, name),
+			                    os.path.join(self.oldfolder, name)),
+			                "Files not equivalent.")
+		self.assertFalse([e for e in self.o.events if e.code == MsgCode.CRC])
+
+	def test_parallel_single_volume(self):
+		srr = os.path.join(self.oldfolder, "store_split_folder.srr")
+		reconstruct(srr, self.files_dir, self.tdir, jobs=2, srr_part="r00")
+		name = "store_split_folder.r00"
+		self.assertTrue(cmp(os.path.join(self.tdir, name),
+		                    os.path.join(self.oldfolder, name)),
+		                "Files not equivalent.")
+		self.assertFalse(os.path.isfile(
+			os.path.join(self.tdir, "store_split_folder.rar")))
+
 	def test_hints(self):
 		pass
 
@@ -612,6 +656,69 @@ class TestHelper(TestInit):
 			expected.append(join(base, "winrar2.80.r%02d" % i))
 		self.assertEqual(result, expected)
 
+	def test_kernel_copy(self):
+		txt = os.path.join(self.txt, "users_manual4.00.txt")
+		with open(txt, "rb") as tfile:
+			data = tfile.read()
+		tdir = mkdtemp(prefix="pyReScene-", dir=self.test_dir)
+		try:
+			with open(txt, "rb") as srcfs:
+				with open(os.path.join(tdir, "copy"), "w+b") as rarfs:
+					rarfs.write(b"head")
+					srcfs.seek(100)
+					copied = _kernel_copy(srcfs, rarfs, 70000)
+					if copied is None:
+						self.skipTest("no kernel copy support")
+					self.assertEqual(copied, 70000)
+					self.assertEqual(srcfs.tell(), 70100)
+					self.assertEqual(rarfs.tell(), 70004)
+					# the end of the source file is reached
+					copied = _kernel_copy(srcfs, rarfs, len(data))
+					self.assertEqual(copied, len(data) - 70100)
+					rarfs.seek(0)
+					self.assertEqual(rarfs.read(), b"head" + data[100:])
+
+				self.assertEqual(_crc32_mapped(srcfs, 70000, 5000, 0),
+				                 (zlib.crc32(data[70000:75000]),
+				                  zlib.crc32(data[70000:75000])))
+				running = zlib.crc32(data[:10])
+				self.assertEqual(_crc32_mapped(srcfs, 10, 10, running)[0],
+				                 zlib.crc32(data[:20]))
+			self.assertEqual(_kernel_copy(FakeFile(10), io.BytesIO(), 5),
+			                 None)
+		finally:
+			shutil.rmtree(tdir)
+
+	def test_write_recovery_record(self):
+		"""Compare with the sector by sector calculation."""
+		class Block(object):
+			recovery_sectors = 7
+			data_sectors = 40
+			def block_bytes(self):
+				return b"header"
+		data = os.urandom(512 * 31 + 100)
+
+		crc = bytearray()
+		rs = [0] * Block.recovery_sectors
+		for i in range(0, len(data), 512):
+			sector = data[i:i + 512]
+			sector += bytes(bytearray(512 - len(sector)))
+			crc += struct.pack("<H", ~zlib.crc32(sector) & 0xffff)
+			rs[i // 512 % Block.recovery_sectors] ^= int_from_bytes_big(sector)
+		crc += bytearray(2 * (Block.data_sectors - len(data) // 512 - 1))
+		expected = data + b"header" + crc + b"".join(
+			int_to_bytes_big(sector, 512) for sector in rs)
+
+		tdir = mkdtemp(prefix="pyReScene-", dir=self.test_dir)
+		try:
+			with open(os.path.join(tdir, "rr.rar"), "w+b") as rarfs:
+				rarfs.write(data)
+				_write_recovery_record(Block(), rarfs)
+				rarfs.seek(0)
+				self.assertEqual(rarfs.read(), expected)
+		finally:
+			shutil.rmtree(tdir)
+
 	def test_locate_file(self):
 		"""_locate_file("""
 
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2026 pyReScene
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+from __future__ import (with_statement, unicode_literals, print_function,
+	absolute_import)
+
+import unittest
+import os
+import random
+import shutil
+import zlib
+from tempfile import mkdtemp
+
+from rescene.parallelcrc import crc32_range, crc32_file
+from rescene.utility import calculate_crc32
+
+class TestParallelCrc(unittest.TestCase):
+	def setUp(self):
+		self.tmp = mkdtemp(".pyrescene")
+		self.data = bytes(bytearray(random.Random(22).getrandbits(8)
+		                            for _ in range(100003)))
+		self.path = os.path.join(self.tmp, "data.bin")
+		with open(self.path, "wb") as data:
+			data.write(self.data)
+
+	def tearDown(self):
+		shutil.rmtree(self.tmp)
+
+	def crc(self, data):
+		return zlib.crc32(data) & 0xFFFFFFFF
+
+	def test_file(self):
+		self.assertEqual(crc32_file(self.path), self.crc(self.data))
+		self.assertEqual(calculate_crc32(self.path), self.crc(self.data))
+
+	def test_ranges(self):
+		for offset, size, range_size in [(0, 100003, 1000), (7, 50000, 999),
+				(100000, 3, 2), (0, 0, 10), (1, 100002, 100002)]:
+			data = self.data[offset:offset + size]
+			for threads in (1, 3):
+				self.assertEqual(crc32_range(self.path, offset, size,
+					threads=threads, range_size=range_size), self.crc(data))
+
+	def test_progress(self):
+		done = []
+		crc32_range(self.path, 3, threads=2, range_size=30000,
+		            progress=done.append)
+		self.assertEqual(done, [30000, 60000, 90000, 100000])
+
+	def test_short_file(self):
+		self.assertRaises(EOFError, crc32_range, self.path, 10, 100000,
+		                  range_size=1000)
+
+if __name__ == "__main__":
+	unittest.main()
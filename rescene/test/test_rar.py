@@ -144,6 +144,33 @@ class TestRarReader(unittest.TestCase):
 				self.assertEqual(r.file_name, "little_file.txt")
 				self.assertEqual(r.file_datetime, (2011, 3, 6, 15, 14, 12))
 
+	def test_read_mmap(self):
+		"""The memory mapped reader returns the same blocks."""
+		files = (("store_little", "store_little_srrfile_with_path.srr"),
+		         ("store_rr_solid_auth_unicode_new",
+		          "store_rr_solid_auth.part1.srr"),
+		         ("store_rr_solid_auth_unicode_new",
+		          "store_rr_solid_auth.part2.rar"),
+		         ("store_utf8_comment", "store_utf8_comment.rar"),
+		         ("best_little", "best_little_sfxgui.exe"),
+		         ("other", "Farscape.S01E01.AC3.DivX.DVDRip.iNTERNAL-AMC"
+		          "_old_style_rr.srr"))
+		for folder, name in files:
+			path = os.path.join(os.pardir, os.pardir, "test_files",
+			                    folder, name)
+			read = RarReader(path, enable_sfx=True).read_all()
+			mapped = RarReader(path, enable_sfx=True, use_mmap=True)
+			mapped = mapped.read_all()
+			self.assertEqual(len(read), len(mapped))
+			for block, mblock in zip(read, mapped):
+				self.assertEqual(type(block), type(mblock))
+				self.assertEqual(bytes(block.block_bytes()),
+				                 bytes(mblock.block_bytes()))
+				self.assertEqual(block.block_position, mblock.block_position)
+				self.assertEqual(getattr(block, "file_name", None),
+				                 getattr(mblock, "file_name", None))
+				self.assertEqual(block.explain(), mblock.explain())
+
 class TestSrrHeaderBlock(unittest.TestCase):  # 0x69
 	def test_srr_header_read(self):
 		data = (b"\x69\x69\x69\x01\x00\x1d\x00"
@@ -333,7 +360,20 @@ class TestRarBlocks(unittest.TestCase):
 
 
 	def test_packed_file(self):
-		pass
+		path = os.path.join(os.pardir, os.pardir, "test_files",
+		                    "store_rr_solid_auth_unicode_new",
+		                    "store_rr_solid_auth.part1.rar")
+		blocks = [b for b in RarReader(path).read_all()
+		          if b.rawtype == BlockType.RarPackedFile]
+		self.assertFalse(hasattr(blocks[0], "__dict__"))
+		self.assertEqual(blocks[0].file_name, "empty_file.txt")
+		self.assertEqual(blocks[0].orig_filename, b"empty_file.txt")
+		self.assertEqual(blocks[0].salt, None)
+		self.assertEqual(blocks[0].mtime, None)
+		# extended time field parsed on first access
+		self.assertEqual(blocks[2].file_name, "users_manual4.00.txt")
+		self.assertEqual(blocks[2].mtime[:5], (2011, 2, 22, 17, 57))
+		self.assertEqual(blocks[2].atime, None)
 
 	def test_newsubblock(self):
 		""" RR, CMT, AV """
@@ -29,6 +29,7 @@ import os
 import io
 import zlib
 
+from rescene import rarstream
 from rescene.rarstream import RarStream, FakeFile
 from rescene.rar import ArchiveNotFoundError
 
@@ -64,7 +65,7 @@ class TestRarStream(unittest.TestCase):
 						  ["txt\\empty_file.txt",
 						   "txt\\little_file.txt",
 						   "txt\\users_manual4.00.txt"])
-		self.assertRaises(NotImplementedError, rs.readinto, "")
+		self.assertEqual(rs.readinto(bytearray(10)), 0)
 
 	def test_file(self):
 		""" Tests if the file in the rar archive is the same as the
@@ -104,6 +105,82 @@ class TestRarStream(unittest.TestCase):
 			rs.seek(333)
 			self.assertEqual(rs.read(), tfile.read())
 
+	def test_readinto(self):
+		"""Reads across the volume boundaries of a split archive."""
+		rs = RarStream(os.path.join(self.path, self.folder,
+		                            "store_split_folder.rar"),
+		                            "txt/users_manual4.00.txt")
+		with open(os.path.join(self.path, "txt", "users_manual4.00.txt"),
+				  "rb") as txt_file:
+			expected = txt_file.read()
+		self.assertTrue(len(rs._rar_volumes) > 2)
+		boundary = rs._rar_volumes[1].pfile_start
+		for start in (0, boundary - 3, boundary, boundary + 5):
+			buf = bytearray(3000)
+			rs.seek(start)
+			self.assertEqual(rs.readinto(buf), 3000)
+			self.assertEqual(bytes(buf), expected[start:start + 3000])
+			self.assertEqual(rs.tell(), start + 3000)
+
+			# the same from the other direction: seek back
+			rs.seek(start + 1)
+			self.assertEqual(rs.read(2999), expected[start + 1:start + 3000])
+
+		rs.seek(-4, os.SEEK_END)
+		buf = bytearray(10)
+		self.assertEqual(rs.readinto(buf), 4)
+		self.assertEqual(bytes(buf[:4]), expected[-4:])
+		rs.close()
+
+	def test_shared_layout_and_handles(self):
+		"""A second stream on the same set reuses the parsed layout and
+		the number of idle open volumes stays bounded."""
+		first = os.path.join(self.path, self.folder, "store_split_folder.rar")
+		txt = "txt/users_manual4.00.txt"
+		rs = RarStream(first, txt)
+		expected = rs.read()
+
+		old_process = RarStream._process
+		old_size = rarstream._handle_pool.size
+		def fail(*args, **kwargs):
+			self.fail("volume headers parsed again")
+		try:
+			RarStream._process = fail
+			rarstream._handle_pool.size = 2
+			streams = [RarStream(first, txt) for _ in range(3)]
+			for stream in streams:
+				self.assertEqual(stream.read(), expected)
+			self.assertTrue(rarstream._handle_pool._count <= 2)
+			for stream in streams:
+				stream.close()
+		finally:
+			RarStream._process = old_process
+			rarstream._handle_pool.size = old_size
+		self.assertEqual(rs.read(), b"")
+		rs.seek(0)
+		self.assertEqual(rs.read(), expected)
+		rs.close()
+
+	def test_set_layout_cache(self):
+		"""The volume table of a set is remembered for the first volume."""
+		first = os.path.join(self.path, self.folder, "store_split_folder.rar")
+		txt = "txt/users_manual4.00.txt"
+		rarstream.clear_layout_cache()
+		expected = RarStream(first, txt).read()
+
+		old_next_archive = rarstream.utility.next_archive
+		def fail(*args, **kwargs):
+			raise AssertionError("volumes looked for again")
+		try:
+			rarstream.utility.next_archive = fail
+			rs = RarStream(first, txt)
+			self.assertEqual(rs.read(), expected)
+			rs.close()
+			rarstream.clear_layout_cache()
+			self.assertRaises(AssertionError, RarStream, first, txt)
+		finally:
+			rarstream.utility.next_archive = old_next_archive
+
 	def test_read_nothing(self):
 		rar_file = os.path.join(self.path, "store_little", "store_little.rar")
 		rs = RarStream(rar_file)
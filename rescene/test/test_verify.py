@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2026 pyReScene
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+from __future__ import (with_statement, unicode_literals, print_function,
+	absolute_import)
+
+import unittest
+import os
+import shutil
+import zlib
+from tempfile import mkdtemp
+
+import rescene
+from rescene import verify
+from rescene.main import MsgCode
+from rescene.verify import verify_files, MemoryCache
+from rescene.utility import order_by_device
+
+class TestVerify(unittest.TestCase):
+	def setUp(self):
+		self.tmp = mkdtemp(".pyrescene")
+		self.jobs = []
+		for i in range(6):
+			data = os.urandom(1000 * i)
+			name = "file%d.bin" % i
+			path = os.path.join(self.tmp, name)
+			with open(path, "wb") as afile:
+				afile.write(data)
+			crc = "%08X" % (zlib.crc32(data) & 0xFFFFFFFF)
+			self.jobs.append((name, path, crc))
+		self.observer = rescene.Observer()
+		rescene.subscribe(self.observer)
+
+	def tearDown(self):
+		rescene.main.callbacks.remove(self.observer)
+		shutil.rmtree(self.tmp)
+
+	def test_status(self):
+		jobs = list(self.jobs)
+		jobs[1] = (jobs[1][0], jobs[1][1], "DEADBEEF")
+		jobs.append(("gone.bin", os.path.join(self.tmp, "gone.bin"), "1"))
+		results = dict((r.name, r.status) for r in verify_files(jobs, 3))
+		self.assertEqual(len(results), 7)
+		self.assertEqual(results.pop("file1.bin"), verify.CORRUPT)
+		self.assertEqual(results.pop("gone.bin"), verify.MISSING)
+		self.assertEqual(set(results.values()), set([verify.OK]))
+
+	def test_events(self):
+		results = list(verify_files(self.jobs))
+		events = [e for e in self.observer.events
+		          if e.code == MsgCode.VERIFY]
+		self.assertEqual([e.result for e in events], results)
+		self.assertEqual([e.done for e in events], list(range(1, 7)))
+		self.assertEqual(set(e.total for e in events), set([6]))
+
+	def test_order(self):
+		ordered, devices = order_by_device(self.jobs, lambda job: job[1])
+		self.assertEqual(devices, 1)
+		self.assertEqual(sorted(ordered), sorted(self.jobs))
+		inodes = [os.stat(job[1]).st_ino for job in ordered]
+		self.assertEqual(inodes, sorted(inodes))
+
+	def test_cache(self):
+		cache = MemoryCache()
+		first = list(verify_files(self.jobs, cache=cache))
+		self.assertFalse(any(r.cached for r in first))
+		second = list(verify_files(self.jobs, cache=cache))
+		self.assertTrue(all(r.cached for r in second))
+		self.assertEqual([r.crc for r in first], [r.crc for r in second])
+
+		# a changed file is hashed again
+		name, path, crc = self.jobs[3]
+		with open(path, "ab") as afile:
+			afile.write(b"more")
+		results = dict((r.name, r) for r in verify_files(self.jobs,
+		                                                 cache=cache))
+		self.assertFalse(results[name].cached)
+		self.assertEqual(results[name].status, verify.CORRUPT)
+
+if __name__ == "__main__":
+	unittest.main()
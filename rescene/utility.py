@@ -37,7 +37,6 @@ import locale
 import os
 import shutil
 import sys
-import zlib
 from io import BytesIO, TextIOBase, TextIOWrapper
 from tempfile import mktemp
 
@@ -515,18 +514,61 @@ def replace_result(src, dest):
 			raise
 
 def calculate_crc32(file_name):
-	"""Calculates crc32 for a given file and show a spinner."""
-	crc = 0
-	count = 0
-	with open(file_name, "rb") as f:
-		x = f.read(65536)
-		while x:
-			count += 1
-			show_spinner(count)
-			crc = zlib.crc32(x, crc)
-			x = f.read(65536)
+	"""Calculates crc32 for a given file and show a spinner.
+	Large files are hashed in ranges on several threads.
+	The hash cache is used when it is enabled."""
+	from rescene.parallelcrc import crc32_file
+	from rescene import hashcache
+	cache = hashcache.active()
+	if cache is not None:
+		stat = os.stat(file_name)
+		crc = cache.lookup(stat)
+		if crc is not None:
+			return crc
+
+	count = [0]
+	def spin(_done):
+		count[0] += 1
+		show_spinner(count[0])
+	try:
+		crc = crc32_file(file_name, progress=spin)
+	finally:
 		remove_spinner()
-	return crc & 0xFFFFFFFF
+	if cache is not None:
+		cache.store(stat, crc)
+	return crc
+
+def order_by_device(items, path=lambda item: item):
+	"""Orders the items so that consecutive files are on other devices
+	where possible and in inode order on the same device. Inode order is
+	close to the order of the data on the disk for most file systems.
+	path: function that returns the file path of an item
+	Returns the items and the number of devices."""
+	per_device = {}
+	for item in items:
+		try:
+			stat = os.stat(path(item))
+			device, inode = stat.st_dev, stat.st_ino
+		except OSError:
+			device, inode = None, 0
+		per_device.setdefault(device, []).append((inode, item))
+	queues = [[item for _inode, item in sorted(queue, key=lambda i: i[0])]
+	          for queue in per_device.values()]
+	ordered = []
+	while queues:
+		for queue in queues:
+			ordered.append(queue.pop(0))
+		queues = [queue for queue in queues if queue]
+	return ordered, len(per_device)
+
+def pool_size(devices, per_device):
+	"""One worker per core, but not more than per_device per device."""
+	try:
+		import multiprocessing
+		cores = multiprocessing.cpu_count()
+	except NotImplementedError:
+		cores = 1
+	return max(1, min(cores, per_device * max(1, devices)))
 
 def capitalized_fn(afile):
 	"""
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2026 pyReScene
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+"""Verifying files against the CRC32 hashes an SRR or SFV lists.
+
+The files are hashed on a pool of threads. Files on different devices
+are interleaved in the queue, so each disk gets its share of the threads.
+On one device the files are queued in inode order, which is close to the
+order of the data on the disk for most file systems. Large files are
+hashed in ranges on several threads of their own by rescene.parallelcrc.
+
+A cache can remember the CRC32 of a file for as long as its size and
+modification time stay the same. Such files are not read again.
+See rescene.hashcache for the cache that is kept between runs.
+
+	for result in verify_files([("a.mkv", "/rls/a.mkv", "1A2B3C4D")]):
+		print(result.name, result.status)
+"""
+
+import os
+import threading
+from multiprocessing.pool import ThreadPool
+
+from rescene.main import _fire, MsgCode
+from rescene.hashcache import file_key
+from rescene.parallelcrc import crc32_file
+from rescene.utility import order_by_device, pool_size
+
+PER_DEVICE = 2  # threads hashing files of the same device
+
+# VerifyResult.status values
+OK = "OK"
+CORRUPT = "CORRUPT"
+MISSING = "MISSING"
+
+class VerifyResult(object):
+	"""Outcome of the verification of a single file.
+	crc: the calculated CRC32 or None when the file could not be read"""
+	def __init__(self, name, path, expected, crc=None, cached=False):
+		self.name = name
+		self.path = path
+		self.expected = expected
+		self.crc = crc
+		self.cached = cached
+
+	@property
+	def status(self):
+		if self.crc is None:
+			return MISSING
+		if int(self.expected, 16) == self.crc:
+			return OK
+		return CORRUPT
+
+class MemoryCache(object):
+	"""Remembers the CRC32 hashes calculated during this run."""
+	def __init__(self):
+		self._crcs = {}
+		self._lock = threading.Lock()
+
+	def lookup(self, stat):
+		"""Returns the CRC32 of the file with this stat result or None."""
+		with self._lock:
+			return self._crcs.get(file_key(stat))
+
+	def store(self, stat, crc):
+		with self._lock:
+			self._crcs[file_key(stat)] = crc
+
+def _verify(job, cache):
+	name, path, expected = job
+	try:
+		stat = os.stat(path)
+		crc = cache.lookup(stat) if cache is not None else None
+		if crc is not None:
+			return VerifyResult(name, path, expected, crc, cached=True)
+		crc = crc32_file(path)
+	except (IOError, OSError):
+		return VerifyResult(name, path, expected)
+	if cache is not None:
+		cache.store(stat, crc)
+	return VerifyResult(name, path, expected, crc)
+
+def verify_files(jobs, threads=None, cache=None):
+	"""Hashes the files of the (name, path, crc32) jobs. crc32 is the
+	expected hash as hexadecimal string. Yields a VerifyResult for each
+	job as soon as it and the jobs queued before it are done.
+	A MsgCode.VERIFY event with the result is fired for each file.
+	threads: size of the thread pool; based on the devices when None
+	cache: MemoryCache, HashCache or an other object with lookup and store
+	       methods"""
+	jobs, devices = order_by_device(jobs, lambda job: job[1])
+	if not jobs:
+		return
+	if not threads:
+		threads = pool_size(devices, PER_DEVICE)
+
+	def verify(job):
+		return _verify(job, cache)
+
+	pool = ThreadPool(min(threads, len(jobs)))
+	try:
+		for count, result in enumerate(pool.imap(verify, jobs), 1):
+			_fire(MsgCode.VERIFY, message="%s: %s" % (result.status,
+			      result.name), result=result, done=count, total=len(jobs))
+			yield result
+	finally:
+		pool.terminate()
+		pool.join()
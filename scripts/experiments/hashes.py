@@ -4,7 +4,7 @@ import pprint
 # for running the script directly from command line
 sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)),
                             '..',))
-from rescene.main import content_hash
+from rescene.main import content_hashes
 
 path = "D:\srrdb.com_2011-10-27"
 path = sys.argv[1]
@@ -17,16 +17,16 @@ path = sys.argv[1]
 # print(rescene.hash_srr(bad))
 
 print(len(os.listdir(path)))
-for srr in os.listdir(path):
-    try:
-        release = srr[:-4]
-        srr_file = os.path.join(path, srr)
-        srr_hash = content_hash(srr_file)
+srr_files = [os.path.join(path, srr) for srr in os.listdir(path)]
+try:
+    for srr_file, srr_hash in content_hashes(srr_files):
+        if isinstance(srr_hash, BaseException):
+            print(srr_hash)
+            continue
+        release = os.path.basename(srr_file)[:-4]
         print(srr_hash + ";" + release)
-    except KeyboardInterrupt:
-        sys.exit()
-    except BaseException as err:
-        print(err)
+except KeyboardInterrupt:
+    sys.exit()
 
 # 3.On.Stage.Rest.Of.Pinkpop.2011.DUTCH.WS.PDTV.XviD-iFH
 # (<type 'exceptions.EnvironmentError'>, EnvironmentError('Invalid RAR block length (20) at offset 0x1c528',), <traceback object at 0x032E5AA8>)
@@ -22,27 +22,25 @@ import os
 curdir = os.path.dirname(os.path.realpath(__file__))
 sys.path.append(os.path.join(curdir, '..'))
 try:
-	from rescene import info
+	from rescene.index import SrrIndex
 except ImportError:
 	print("Can't import the 'rescene' module.")
 
-def list_srr(sfile):
-	for key, value in info(sfile)['archived_files'].items():
+def list_srr(index, sfile):
+	for key, value in index.info(sfile)['archived_files'].items():
 # 		print(os.path.basename(sfile)[:-4]),
 		print("%s\t%s" % (key, value.crc32))
 
 def main(options, args):
-	for element in args:
-		element = os.path.abspath(element)
-		if os.path.isfile(element) and element.endswith(".srr"):
-			list_srr(element)
-		elif os.path.isdir(element):
-			for dirpath, _dirnames, filenames in os.walk(element):
-				for sfile in filenames:
-					if sfile.endswith(".srr"):
-						list_srr(os.path.join(dirpath, sfile))
-		else:
-			print("WTF are you supplying me?")
+	with SrrIndex(options.index or ":memory:") as index:
+		for element in args:
+			element = os.path.abspath(element)
+			if ((os.path.isfile(element) and element.endswith(".srr")) or
+			    os.path.isdir(element)):
+				for sfile in index.update_tree([element]):
+					list_srr(index, sfile)
+			else:
+				print("WTF are you supplying me?")
 
 if __name__ == '__main__':
 	parser = optparse.OptionParser(
@@ -50,6 +48,10 @@ if __name__ == '__main__':
 		"This tool will list the CRCs of the archived files.\n",
 		version="%prog 0.1 (2012-11-01)")  # --help, --version
 
+	parser.add_option("-i", "--index", dest="index", metavar="FILE",
+	                  help="keep the SRR information in this index file: "
+	                  "only new or changed SRRs are parsed again")
+
 	# no arguments given
 	if len(sys.argv) < 2:
 		print(parser.format_help())
@@ -17,6 +17,7 @@
 # Author: Gfy <tsl@yninovg.pbz>
 # version 1.0 2011-12-15 First version
 # version 1.1 2011-12-22 No NFO option
+# version 1.2 2026-10-18 Index file option
 
 import optparse
 import sys
@@ -26,36 +27,43 @@ from os.path import join, dirname, realpath
 # for running the script directly from command line
 sys.path.append(join(dirname(realpath(sys.argv[0])), '..'))
 
-from rescene import info
+from rescene.index import SrrIndex
 
-def main(options, args):
-	for lfile in os.listdir(args[0]):
-		if not lfile.endswith(".srr"):
-			continue
-		srr = info(lfile)
+def check(index, options, lfile):
+	srr = index.info(lfile)
+
+	has_nfo = False
+	for sfile in srr['stored_files']:
+		if sfile.endswith(".nfo"):
+			has_nfo = True
 
+	if not options.nonfo:
 		has_nfo = False
-		for sfile in srr['stored_files']:
-			if sfile.endswith(".nfo"):
-				has_nfo = True
 
-		if not options.nonfo:
-			has_nfo = False
+	# for each stored lfile: max 3 comment lines
+	if (len(srr['sfv_comments']) >
+			3 * len(srr['archived_files']) and not has_nfo):
+		print(lfile)
 
-		# for each stored lfile: max 3 comment lines
-		if (len(srr['sfv_comments']) >
-				3 * len(srr['archived_files']) and not has_nfo):
-			print(lfile)
+def main(options, args):
+	with SrrIndex(options.index or ":memory:") as index:
+		for lfile in os.listdir(args[0]):
+			if not lfile.endswith(".srr"):
+				continue
+			check(index, options, lfile)
 
 if __name__ == '__main__':
 	parser = optparse.OptionParser(
 		usage="Usage: %prog [directory]\n"
 		"This tool will list SRR files with more than three comment lines.\n"
 		"For non foreign series, a lot of those will be repacks.",
-		version="%prog 1.1 (2011-12-22)")  # --help, --version
+		version="%prog 1.2 (2026-10-18)")  # --help, --version
 
 	parser.add_option("-n", "--no-nfo", help="result can not contain nfo",
 					  action="store_true", dest="nonfo", default=False)
+	parser.add_option("-i", "--index", dest="index", metavar="FILE",
+	                  help="keep the SRR information in this index file: "
+	                  "only new or changed SRRs are parsed again")
 
 	# no arguments given
 	if len(sys.argv) < 2: